@@ -1,10 +1,17 @@
 import json
-import requests 
+import time
+
+from attachments import MAX_FILES, MAX_UPLOAD_BYTES, MultipartBody, as_attachment, plan_uploads
+from models import Message, loads
+from purge import PurgeEngine
+from ratelimit import RateLimiter, route_key
+from snowflake import after_cursor, next_id
+from utils import NotFound
 
 class Endpoint:
 
-    def __init__(self, api_version):
-        self.base_url = f'https://discord.com/api/v{api_version}/'
+    def __init__(self, api_version, api_root='https://discord.com/api'):
+        self.base_url = f'{api_root.rstrip("/")}/v{api_version}/'
 
     # Guild
 
@@ -19,9 +26,15 @@ class Endpoint:
 
     # Channel
 
+    def channel(self, channel_id):
+        return self.base_url + f'channels/{channel_id}'
+
     def message(self, channel_id, message_id):
         return self.base_url + f'channels/{channel_id}/messages/{message_id}'
 
+    def bulk_delete(self, channel_id):
+        return self.base_url + f'channels/{channel_id}/messages/bulk-delete'
+
     def message_reactions(self, channel_id, message_id):
         return self.base_url + f'channels/{channel_id}/messages/{message_id}/reactions/'
     
@@ -60,61 +73,156 @@ class Endpoint:
   
 
 class Canopy:
-    def __init__(self, api_version, headers):
-        self.depot = Endpoint(api_version=api_version)
+    def __init__(self, api_version, headers, session=None, limiter=None, max_retries=3, cache=None,
+                 api_root='https://discord.com/api', metrics=None, max_upload_bytes=MAX_UPLOAD_BYTES):
+        self.depot = Endpoint(api_version=api_version, api_root=api_root)
         self.headers = headers
 
         # A special version of headers for attaching files in a message
         self.sendf_headers = {'Authorization': self.headers['Authorization']}
 
+        # One keep-alive connection pool shared by every call
+        if session is None:
+            # Imported here: requests is the slowest import on the start-up path
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+
+        # Per-message upload limits; boosted guilds allow larger uploads
+        self.max_files = MAX_FILES
+        self.max_upload_bytes = max_upload_bytes
+
+        # Optional LookupCache for immutable lookups
+        self.cache = cache
+
+        # Optional Metrics collector for per-request timings
+        self.metrics = metrics
+
     def check_status(self, res):
+        if res.status_code == 404:
+            raise NotFound(f"Status Code: {res.status_code}, JSON: {res.json()}")
         assert (res.status_code >= 200 and res.status_code <= 299), \
                f"Status Code: {res.status_code}, JSON: {res.json()}"
 
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session, waiting on the route's
+        rate-limit bucket first and retrying on 429s.
+        """
+        kwargs.setdefault('headers', self.headers)
+        route = route_key(method, url, self.depot.base_url)
+        start = self.metrics.now() if self.metrics is not None else 0.0
+        waited, latency = 0.0, 0.0
+
+        for attempt in range(self.max_retries + 1):
+            waited += self.limiter.acquire(route)
+
+            sent = time.perf_counter()
+            res = self.session.request(method, url, **kwargs)
+            latency += time.perf_counter() - sent
+
+            if self.limiter.update(route, res) is None:
+                break
+
+        if self.metrics is not None:
+            self.metrics.record_request(method, route, res.status_code, start, latency, attempt, waited)
+        return res
 
     def get_messages(self, channel_id, count=100, params=None):
-        res = requests.get(self.depot.destination_messages(channel_id, message_limit=count), 
-                                      headers=self.headers, 
-                                      params=params)
+        res = self.request('GET', self.depot.destination_messages(channel_id, message_limit=count), 
+                           params=params)
         self.check_status(res)
         return res
     
+    def get_channel(self, channel_id):
+        res = self.request('GET', self.depot.channel(channel_id))
+        self.check_status(res)
+        return res
+
+    def fetch_messages(self, channel_id, count=100, params=None, keep_raw=True):
+        """
+        One page of messages as Message objects, decoded once. Without
+        `keep_raw` only their common fields are kept.
+        """
+        res = self.get_messages(channel_id, count=count, params=params)
+        return Message.page(res.content, keep_raw)
+
+    def get_message(self, channel_id, message_id, keep_raw=True):
+        # Single-message GET is bot-only; fetch the one message right before ID + 1 instead
+        messages = self.fetch_messages(channel_id, count=1, params={'before': next_id(message_id)},
+                                       keep_raw=keep_raw)
+        if not messages or messages[0]['id'] != message_id:
+            raise NotFound(f"Message {message_id} not found in {channel_id}")
+        return messages[0]
+
+    def iter_messages(self, channel_id, before=None, after=None, page_size=100, keep_raw=True):
+        """
+        Walk a channel or thread one Message at a time, fetching a page at a time.
+        Newest first by default (or from `before`); oldest first when `after` is given.
+        """
+        forward = after is not None
+        cursor = after if forward else before
+
+        while True:
+            params = {}
+            if cursor is not None:
+                params['after' if forward else 'before'] = cursor
+
+            page = self.fetch_messages(channel_id, count=page_size, params=params, keep_raw=keep_raw)
+            if forward:
+                page.sort(key=lambda message: int(message.id))
+
+            yield from page
+
+            if len(page) < page_size:
+                return
+            cursor = page[-1].id
+
+    def messages_since(self, channel_id, since, page_size=10, keep_raw=True):
+        """
+        Messages created after `since` (an ID from an earlier call or a
+        datetime), oldest first, fetched in small pages.
+        """
+        return self.iter_messages(channel_id, after=after_cursor(since), page_size=page_size, keep_raw=keep_raw)
+
     def send_message(self, destination_id, message_content=None, files=None, is_thread=False):
+        """
+        `files` are Attachments, paths or (filename, path or buffer) tuples.
+        Uploads over the per-message limits are compressed or split over
+        several messages; the response for the first one is returned.
+        """
         endpoint = self.depot.thread_contents if is_thread else self.depot.destination_messages
 
         message_json = {
             "content": message_content
         }
 
-        message_files = {}
-        if files is not None:
-            for ix, path in enumerate(files):
-                if isinstance(path, tuple):
-                    if len(path) > 2:
-                        if path[2] == 'bytesio':
-                            message_files[f'file{ix + 1}'] = (path[0], path[1])
-                        else:
-                            raise AttributeError('Invalid specified file type.')
-                    else:
-                        message_files[f'file{ix + 1}'] = (path[0], open(path[1], 'rb'))
-                else:
-                    message_files[f'file{ix + 1}'] = open(path, 'rb')
-
-            res = requests.post(endpoint(destination_id),
-                                headers=self.sendf_headers,
-                                data=message_json,
-                                files=message_files)
-        else:
-            res = requests.post(endpoint(destination_id),
-                                headers=self.headers,
-                                data=json.dumps(message_json))
-        
-        self.check_status(res)
-        return res
+        if not files:
+            res = self.request('POST', endpoint(destination_id),
+                               data=json.dumps(message_json))
+            self.check_status(res)
+            return res
+
+        batches = plan_uploads([as_attachment(file) for file in files], self.max_files, self.max_upload_bytes)
+
+        first = None
+        for ix, batch in enumerate(batches):
+            body = MultipartBody(message_json if ix == 0 else {}, batch)
+            try:
+                res = self.request('POST', endpoint(destination_id),
+                                   headers=dict(self.sendf_headers, **{'Content-Type': body.content_type}),
+                                   data=body)
+            finally:
+                body.close()
+            self.check_status(res)
+            first = first if first is not None else res
+
+        return first
 
     def delete_message(self, channel_id, message_id):
-        res = requests.delete(self.depot.message(channel_id, message_id), 
-                        headers=self.headers)
+        res = self.request('DELETE', self.depot.message(channel_id, message_id))
         
         try: 
             # Unknown message, probably attempted to delete a nonexistent message
@@ -126,20 +234,42 @@ class Canopy:
         self.check_status(res)
         return res
 
+    def bulk_delete_messages(self, channel_id, message_ids):
+        # 2-100 messages, none older than 14 days
+        res = self.request('POST', self.depot.bulk_delete(channel_id),
+                           data=json.dumps({'messages': list(message_ids)}))
+        self.check_status(res)
+        return res
+
     def add_reaction(self, channel_id, message_id, reaction):
-        res = requests.put(self.depot.new_reaction(channel_id, message_id, reaction), 
-                           headers=self.headers)
+        res = self.request('PUT', self.depot.new_reaction(channel_id, message_id, reaction))
         self.check_status(res)
         return res
 
-    def get_reaction_info(self, channel_id, message_id, reaction):
-        res = requests.get(self.depot.reaction_info(channel_id, message_id, reaction), 
-                           headers=self.headers)
+    def get_reaction_info(self, channel_id, message_id, reaction, params=None):
+        res = self.request('GET', self.depot.reaction_info(channel_id, message_id, reaction),
+                           params=params)
         self.check_status(res)
         return res
 
+    def iter_reaction_users(self, channel_id, message_id, reaction, page_size=100):
+        # Reaction users are paged by user ID with `after` only
+        after = None
+        while True:
+            params = {'limit': page_size}
+            if after is not None:
+                params['after'] = after
+
+            res = self.get_reaction_info(channel_id, message_id, reaction, params=params)
+            page = loads(res.content)
+            yield from page
+
+            if len(page) < page_size:
+                return
+            after = page[-1]['id']
+
     def pin_message(self, channel_id, message_id):
-        res = requests.put(self.depot.pins(channel_id, message_id), headers=self.headers)
+        res = self.request('PUT', self.depot.pins(channel_id, message_id))
         self.check_status(res)
         return res
 
@@ -149,24 +279,74 @@ class Canopy:
             "type": 11
         }
 
-        res = requests.post(self.depot.threads(channel_id), 
-                      headers=self.headers, 
-                      data=json.dumps(thread_json))
+        res = self.request('POST', self.depot.threads(channel_id), 
+                           data=json.dumps(thread_json))
         self.check_status(res)
         return res
     
     def update_thread(self, thread_id, updates):
 
-        res = requests.patch(self.depot.thread_info(thread_id), headers=self.headers, json=updates)
+        res = self.request('PATCH', self.depot.thread_info(thread_id), json=updates)
         self.check_status(res)
         return res   
 
-    def purge_channel(self, channel_id):
-        res = requests.get(self.depot.destination_messages(channel_id, message_limit=100), headers=self.headers)
+    def get_user(self, user_id):
+        res = self.request('GET', self.depot.user(user_id))
         self.check_status(res)
+        return res
+
+    def get_user_profile(self, user_id):
+        res = self.request('GET', self.depot.user_profile(user_id))
+        self.check_status(res)
+        return res
+
+    # Cached lookups
+
+    def _lookup(self, kind, key, fetch):
+        if self.cache is not None:
+            value = self.cache.get(kind, key)
+            if value is not None:
+                return value
+
+        value = fetch()
+        if self.cache is not None:
+            self.cache.put(kind, key, value)
+        return value
+
+    def lookup_message_author(self, channel_id, message_id):
+        return self._lookup('message_author', message_id,
+                            lambda: self.get_message(channel_id, message_id, keep_raw=False).author)
+
+    def lookup_user(self, user_id):
+        return self._lookup('user', user_id, lambda: self.get_user(user_id).json())
+
+    def lookup_user_profile(self, user_id):
+        return self._lookup('user_profile', user_id, lambda: self.get_user_profile(user_id).json())
+
+    def lookup_channel(self, channel_id):
+        return self._lookup('channel', channel_id, lambda: self.get_channel(channel_id).json())
+
+    def purge_channel(self, channel_id, keep=()):
+        return PurgeEngine(self).purge(channel_id, keep=keep)
+
+
+class AsyncCanopy:
+    """
+    asyncio front for Canopy. Every Canopy method becomes a coroutine that
+    runs on a worker thread, sharing the same session and rate limiter.
+    """
+
+    def __init__(self, cano):
+        self.cano = cano
+
+    def __getattr__(self, name):
+        attr = getattr(self.cano, name)
+        if not callable(attr):
+            return attr
 
-        messages = res.json()
-        for message in messages:
-            self.delete_message(channel_id, message['id'])
+        async def call(*args, **kwargs):
+            import asyncio
+            return await asyncio.to_thread(attr, *args, **kwargs)
 
-        return res
\ No newline at end of file
+        call.__name__ = name
+        return call
@@ -0,0 +1,127 @@
+import os
+import re
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    message_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    author_id TEXT NOT NULL,
+    created_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applications_author ON applications (author_id);
+
+CREATE TABLE IF NOT EXISTS names (
+    name TEXT NOT NULL,
+    message_id TEXT NOT NULL REFERENCES applications (message_id),
+    PRIMARY KEY (name, message_id)
+);
+
+CREATE TABLE IF NOT EXISTS sync (
+    channel_id TEXT PRIMARY KEY,
+    last_id TEXT NOT NULL,
+    tail_author TEXT,
+    tail_head TEXT
+);
+"""
+
+# Bumped when indexing changes; older index files are rebuilt from scratch
+SCHEMA_VERSION = 2
+
+# 'IGN: name' style lines in an application
+NAME_PATTERN = r'^\s*(?:ign|in-game name|name|username)\s*:\s*(\S+)'
+
+class ApplicationIndex:
+    """
+    Local index of the applicant channel: applications by author ID and by
+    name (username, display name and the name given in the application).
+    Synced incrementally, walking forward from the last message seen.
+
+    An application is a run of consecutive messages by one member; it is
+    indexed under its first message, which APPLICATION_LINK points at.
+    Operator, bot & system messages in between do not end the run.
+    """
+
+    def __init__(self, path, name_pattern=NAME_PATTERN):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.name_pattern = re.compile(name_pattern, re.IGNORECASE | re.MULTILINE)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript('DROP TABLE IF EXISTS names; DROP TABLE IF EXISTS applications; '
+                                    'DROP TABLE IF EXISTS sync;')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def is_application(self, message, ignore_ids):
+        # Regular messages by members; skips system messages, bots, results & commands
+        return (message.type == 0
+                and not message['author'].get('bot')
+                and message.author_id not in ignore_ids
+                and bool(message.content.strip()))
+
+    def names(self, message):
+        author = message['author']
+        names = {author.get('username'), author.get('global_name')}
+        names.update(self.name_pattern.findall(message.content))
+        return {name.lower() for name in names if name}
+
+    def sync(self, cano, channel_id, ignore_ids=()):
+        """
+        Index messages of `channel_id` posted since the last sync. Returns the
+        number of applications added.
+        """
+        with self._lock:
+            row = self.conn.execute('SELECT last_id, tail_author, tail_head FROM sync WHERE channel_id = ?',
+                                    (channel_id,)).fetchone()
+        # The run of messages the last sync ended in may continue
+        last_id, tail_author, tail_head = row if row else ('0', None, None)
+
+        added = 0
+        for message in cano.iter_messages(channel_id, after=last_id, keep_raw=False):
+            last_id = message.id
+            if not self.is_application(message, ignore_ids):
+                continue
+
+            with self._lock, self.conn:
+                if message.author_id != tail_author:
+                    tail_author, tail_head = message.author_id, message.id
+                    self.conn.execute('INSERT OR IGNORE INTO applications '
+                                      '(message_id, channel_id, author_id, created_ms) VALUES (?, ?, ?, ?)',
+                                      (message.id, channel_id, message.author_id, message.created_ms))
+                    added += 1
+
+                # Names from follow-up messages belong to the application they continue
+                self.conn.executemany('INSERT OR IGNORE INTO names (name, message_id) VALUES (?, ?)',
+                                      [(name, tail_head) for name in self.names(message)])
+
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO sync (channel_id, last_id, tail_author, tail_head) '
+                              'VALUES (?, ?, ?, ?)', (channel_id, last_id, tail_author, tail_head))
+        return added
+
+    def find(self, applicant, channel_id=None):
+        """
+        Applications matching an author ID or a name (case-insensitive),
+        newest first, as (message_id, channel_id, author_id) tuples.
+        """
+        query = ('SELECT DISTINCT a.message_id, a.channel_id, a.author_id, a.created_ms FROM applications a '
+                 'LEFT JOIN names n ON n.message_id = a.message_id '
+                 'WHERE (a.author_id = ? OR n.name = ?)')
+        params = [str(applicant), str(applicant).lower()]
+        if channel_id is not None:
+            query += ' AND a.channel_id = ?'
+            params.append(channel_id)
+
+        with self._lock:
+            # IDs break ties between messages of the same millisecond
+            rows = self.conn.execute(query + ' ORDER BY a.created_ms DESC, CAST(a.message_id AS INTEGER) DESC',
+                                     params).fetchall()
+        return [row[:3] for row in rows]
+
+    def close(self):
+        self.conn.close()
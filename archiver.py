@@ -0,0 +1,84 @@
+import itertools
+import json
+import os
+
+from models import Message, dumps_line, loads
+
+class ThreadArchiver:
+    """
+    Streams a channel's or thread's history, oldest first, into a JSONL file.
+    An interrupted archive resumes after the last message written. With a
+    `mirror`, attachments are downloaded alongside, while the walk goes on.
+    """
+
+    def __init__(self, cano, convers_path, mirror=None):
+        self.cano = cano
+        self.convers_path = convers_path
+        self.mirror = mirror
+        self.mirror_report = None
+
+    def last_archived_id(self, path):
+        """
+        ID of the last complete line in `path`, dropping a partially written one.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb+') as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+
+            # Read backwards only as far as needed to find the last two newlines
+            block, tail = 4096, b''
+            while size > 0 and tail.count(b'\n') < 2:
+                step = min(block, size)
+                size -= step
+                file.seek(size)
+                tail = file.read(step) + tail
+
+            if tail and not tail.endswith(b'\n'):
+                cut = tail.rfind(b'\n')
+                file.truncate(size + cut + 1 if cut >= 0 else 0)
+                tail = tail[:cut + 1] if cut >= 0 else b''
+
+        lines = tail.splitlines()
+        if not lines:
+            return None
+        return json.loads(lines[-1])['id']
+
+    def archive(self, channel_id, file_name):
+        """
+        Archive every message of `channel_id` into `file_name`. Returns the
+        path and the number of messages newly written.
+        """
+        os.makedirs(self.convers_path, exist_ok=True)
+        path = os.path.join(self.convers_path, file_name)
+
+        # '0' walks forward from the start of the channel
+        after = self.last_archived_id(path) or '0'
+        count = 0
+
+        def walk():
+            nonlocal count
+            with open(path, 'ab') as file:
+                for message in self.cano.iter_messages(channel_id, after=after):
+                    file.write(dumps_line(message.raw))
+                    count += 1
+                    yield message
+
+        if self.mirror is None:
+            for _ in walk():
+                pass
+            return path, count
+
+        # Messages archived by an earlier, interrupted run may still miss attachments
+        archived = self.archived_messages(path) if after != '0' else []
+        self.mirror_report = self.mirror.mirror(itertools.chain(archived, walk()), f'{path}.attachments.jsonl')
+        return path, count
+
+    def archived_messages(self, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                message = Message(loads(line), keep_raw=False)
+                if message.attachments:
+                    yield message
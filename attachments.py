@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+import uuid
+
+# Discord's per-message upload limits (guilds without boosts)
+MAX_FILES = 10
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Room left in each request for payload_json and multipart framing
+FRAME_RESERVE = 16 * 1024
+CHUNK_SIZE = 64 * 1024
+
+class Attachment:
+    """
+    One file to upload. `source` is bytes, a path, a binary file object or
+    an iterable of byte chunks (read into memory once). Paths are opened
+    only while their part is being sent.
+    """
+
+    def __init__(self, filename, source):
+        self.filename = filename
+        self.path = None
+        self.file = None
+        self.data = None
+
+        if isinstance(source, str):
+            self.path = source
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.data = memoryview(source)
+        elif hasattr(source, 'getbuffer'):
+            # BytesIO: share its buffer instead of copying it
+            self.data = source.getbuffer()
+        elif hasattr(source, 'read'):
+            self.file = source
+        else:
+            self.data = memoryview(b''.join(source))
+
+    @property
+    def size(self):
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        if self.file is not None:
+            position = self.file.seek(0, os.SEEK_END)
+            self.file.seek(0)
+            return position
+        return self.data.nbytes
+
+    def chunks(self):
+        if self.data is not None:
+            for start in range(0, self.data.nbytes, CHUNK_SIZE):
+                yield self.data[start:start + CHUNK_SIZE]
+            return
+
+        if self.path is not None:
+            with open(self.path, 'rb') as file:
+                yield from iter(lambda: file.read(CHUNK_SIZE), b'')
+            return
+
+        self.file.seek(0)
+        yield from iter(lambda: self.file.read(CHUNK_SIZE), b'')
+
+    def read(self):
+        return b''.join(self.chunks())
+
+def as_attachment(file):
+    """
+    Accepts an Attachment, a path, or a (filename, path or buffer) tuple.
+    """
+    if isinstance(file, Attachment):
+        return file
+    if isinstance(file, tuple):
+        return Attachment(file[0], file[1])
+    return Attachment(os.path.basename(file), file)
+
+def fit(attachment, max_bytes):
+    """
+    Attachments carrying `attachment` within `max_bytes` each: itself if it
+    fits, else gzip-compressed, else the compressed stream split into
+    numbered parts (rejoin with `cat name.gz.* | gunzip`).
+    """
+    if attachment.size <= max_bytes:
+        return [attachment]
+
+    compressed = gzip.compress(attachment.read(), mtime=0)
+    name = f'{attachment.filename}.gz'
+    if len(compressed) <= max_bytes:
+        return [Attachment(name, compressed)]
+
+    view = memoryview(compressed)
+    return [Attachment(f'{name}.{ix + 1:03d}', view[start:start + max_bytes])
+            for ix, start in enumerate(range(0, len(view), max_bytes))]
+
+def plan_uploads(attachments, max_files=MAX_FILES, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Group attachments into batches that each fit in one message.
+    """
+    limit = max_bytes - FRAME_RESERVE
+    batches, batch, batch_size = [], [], 0
+
+    for attachment in attachments:
+        for part in fit(attachment, limit):
+            size = part.size
+            if batch and (len(batch) == max_files or batch_size + size > limit):
+                batches.append(batch)
+                batch, batch_size = [], 0
+            batch.append(part)
+            batch_size += size
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+class MultipartBody:
+    """
+    multipart/form-data body streamed part by part. Its length is known up
+    front, so it is sent with a Content-Length rather than chunked, and it
+    can be iterated again when a request is retried.
+    """
+
+    def __init__(self, payload, attachments):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.payload = json.dumps(payload).encode()
+        self.attachments = attachments
+        self._active = None
+
+    def _file_header(self, ix, attachment):
+        filename = attachment.filename.replace('\\', '\\\\').replace('"', '\\"')
+        return (f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="files[{ix}]"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n').encode()
+
+    def _payload_part(self):
+        return (f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="payload_json"\r\n'
+                f'Content-Type: application/json\r\n\r\n').encode() + self.payload + b'\r\n'
+
+    def __len__(self):
+        total = len(self._payload_part()) + len(f'--{self.boundary}--\r\n')
+        for ix, attachment in enumerate(self.attachments):
+            total += len(self._file_header(ix, attachment)) + attachment.size + 2
+        return total
+
+    def __iter__(self):
+        self.close()
+        self._active = self._parts()
+        return self._active
+
+    def _parts(self):
+        yield self._payload_part()
+        for ix, attachment in enumerate(self.attachments):
+            yield self._file_header(ix, attachment)
+            yield from attachment.chunks()
+            yield b'\r\n'
+        yield f'--{self.boundary}--\r\n'.encode()
+
+    def close(self):
+        # Closes the file of a part left half-sent by a failed request
+        if self._active is not None:
+            self._active.close()
+            self._active = None
@@ -0,0 +1,209 @@
+"""
+End-to-end benchmark of Actions against the local fake Discord server.
+
+python3 bench.py
+python3 bench.py --latency 0.05 --discussion 400 --save bench_baseline.json
+python3 bench.py --baseline bench_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ruamel.yaml
+
+from fake_discord import FakeDiscord
+from gateway import FakeGateway
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_option(args=None):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake server latency per request (s)")
+    parser.add_argument('--bucket_limit', type=int, default=5, help="Requests per route bucket per window")
+    parser.add_argument('--bucket_window', type=float, default=1.0, help="Rate-limit window (s)")
+    parser.add_argument('--inject_429', type=float, default=0.0, help="Probability of an injected 429")
+    parser.add_argument('--bot_delay', type=float, default=0.05, help="Delay before the fake bot acts (s)")
+    parser.add_argument('--discussion', type=int, default=150, help="Members' channel messages during the vote")
+    parser.add_argument('--old_messages', type=int, default=3, help="Members' channel messages older than 14 days")
+    parser.add_argument('--thread_messages', type=int, default=60, help="Interview thread messages")
+    parser.add_argument('--attachments', type=int, default=12, help="Interview thread images (every third is a repost)")
+    parser.add_argument('--attachment_kb', type=int, default=256, help="Size of each thread image (KiB)")
+    parser.add_argument('--voters', type=int, default=40, help="Members voting")
+    parser.add_argument('--gateway', action='store_true', help="Deliver fake gateway events instead of polling")
+    parser.add_argument('--save', type=str, help="Write results to this JSON file")
+    parser.add_argument('--baseline', type=str, help="Fail if slower than this saved JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression")
+
+    return parser.parse_args(args)
+
+class Sandbox:
+    """
+    Fake guild plus a temporary working directory holding a config.yaml
+    that points Actions at it.
+    """
+
+    def __init__(self, opt):
+        self.opt = opt
+        self.fake = FakeDiscord(latency=opt.latency, bucket_limit=opt.bucket_limit,
+                                bucket_window=opt.bucket_window, inject_429=opt.inject_429,
+                                bot_delay=opt.bot_delay).start()
+
+        fake = self.fake
+        self.applicant_ch = fake.add_channel('applications')['id']
+        self.member_ch = fake.add_channel('members')['id']
+        self.applicant = fake.add_user('applicant')
+        self.members = [fake.add_user(f'member{ix}') for ix in range(max(opt.voters, 1))]
+
+        app_message = fake.add_message(self.applicant_ch, self.applicant, 'IGN: applicant\nWhy: building', age_s=3600)
+        for ix in range(opt.old_messages):
+            fake.add_message(self.member_ch, self.members[0], f'old {ix}', age_s=20 * 24 * 3600 + ix)
+
+        self.workdir = tempfile.mkdtemp(prefix='dm_bench_')
+        shutil.copy(os.path.join(REPO_DIR, 'result_options.ini'), self.workdir)
+
+        yaml = ruamel.yaml.YAML()
+        with open(os.path.join(REPO_DIR, 'config.yaml'), 'r') as file:
+            config = yaml.load(file)
+
+        config.update({
+            'API_ROOT': fake.api_root,
+            'OPERATOR_TOKEN': 'fake-token',
+            'OPERATOR_ID': fake.operator['id'],
+            'GUILD': fake.guild_id,
+            'PING_ROLE': '2',
+            'APPLICANT_CHANNEL': self.applicant_ch,
+            'MEMBER_CHANNEL': self.member_ch,
+            'APPLICANT_NAME': 'Bench Applicant',
+            'APPLICATION_LINK': f'https://discord.com/channels/1/{self.applicant_ch}/{app_message["id"]}',
+            'USE_GATEWAY': False,
+        })
+        for key in ('META_PATH', 'CONVERS_PATH', 'JOURNAL_PATH', 'CACHE_PATH', 'ATTACHMENTS_PATH', 'VOTE_SERIES_PATH'):
+            config[key] = os.path.join(self.workdir, config[key])
+        os.makedirs(config['META_PATH'], exist_ok=True)
+
+        self.config = config
+        self.config_path = os.path.join(self.workdir, 'config.yaml')
+        with open(self.config_path, 'w') as file:
+            yaml.dump(config, file)
+
+    def close(self):
+        self.fake.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def simulate_vote(self, vote_message_id, thread_id):
+        fake, opt = self.fake, self.opt
+        for ix, member in enumerate(self.members[:opt.voters]):
+            emoji = self.config['ACCEPT_EMOJI'] if ix % 3 else self.config['DENY_EMOJI']
+            fake.add_reaction(self.member_ch, vote_message_id, emoji, member)
+        for ix in range(opt.discussion):
+            fake.add_message(self.member_ch, self.members[ix % len(self.members)], f'discussion {ix}')
+        for ix in range(opt.thread_messages):
+            author = self.applicant if ix % 2 else self.members[ix % len(self.members)]
+            fake.add_message(thread_id, author, f'interview {ix}')
+        for ix in range(opt.attachments):
+            # Every third image re-posts an earlier one
+            seed = ix - 1 if ix % 3 == 2 else ix
+            data = bytes([seed % 256]) * (opt.attachment_kb * 1024)
+            attachment = fake.add_attachment(thread_id, f'build_{ix}.png', data)
+            fake.add_message(thread_id, self.applicant, f'screenshot {ix}', attachments=[attachment])
+
+def measure(sandbox, act, name, func):
+    fake = sandbox.fake
+    fake.reset_counters()
+    limiter_wait, waiter_wait, polls = act.cano.limiter.total_wait, act.waiter.total_wait, act.waiter.polls
+
+    start = time.perf_counter()
+    func()
+    wall = time.perf_counter() - start
+    polls = act.waiter.polls - polls
+
+    return {
+        'action': name,
+        'wall_s': round(wall, 3),
+        'requests': fake.request_count,
+        # Requests the action itself makes: polls & 429'd attempts depend on timing
+        'api_calls': fake.request_count - polls - fake.rate_limited_count,
+        'polls': polls,
+        'connections': fake.connection_count,
+        'rate_limited': fake.rate_limited_count,
+        'downloads': fake.download_count,
+        'rate_limit_wait_s': round(act.cano.limiter.total_wait - limiter_wait, 3),
+        'condition_wait_s': round(act.waiter.total_wait - waiter_wait, 3),
+        'routes': dict(sorted(fake.route_counts.items(), key=lambda item: -item[1])),
+    }
+
+def run(opt):
+    sandbox = Sandbox(opt)
+    cwd = os.getcwd()
+    os.chdir(sandbox.workdir)
+    try:
+        # Imported here so module-level paths resolve inside the sandbox
+        from main import Actions
+
+        results = []
+        act = Actions(False, config_path=sandbox.config_path)
+        if opt.gateway:
+            sandbox.fake.gateway = FakeGateway(act.hub)
+            sandbox.fake.gateway.start()
+
+        results.append(measure(sandbox, act, 'start_app', act.start_app))
+
+        state = act.journal.load_state(act.app['APPLICATION_LINK'].split('/')[-1])
+        sandbox.simulate_vote(state['VOTE_MESSAGE_ID'], state['APP_THREAD_ID'])
+
+        results.append(measure(sandbox, act, 'end_app', lambda: act.end_app('accept-default')))
+        results.append(measure(sandbox, act, 'result_only', lambda: act.send_result('deny-default')))
+        return results
+    finally:
+        os.chdir(cwd)
+        sandbox.close()
+
+def compare(results, baseline, tolerance, metrics=('wall_s', 'api_calls')):
+    """
+    Names of `metrics` that regressed beyond `tolerance` relative to `baseline`.
+    """
+    previous = {entry['action']: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get(entry['action'])
+        if before is None:
+            continue
+        for metric in metrics:
+            # Absolute slack keeps tiny timings from flapping
+            allowed = before[metric] * (1 + tolerance) + (0.05 if metric == 'wall_s' else 0)
+            if entry[metric] > allowed:
+                regressions.append(f"{entry['action']}.{metric}: {before[metric]} -> {entry[metric]}")
+    return regressions
+
+def main(opt):
+    results = run(opt)
+
+    print(f"{'action':<12} {'wall_s':>8} {'requests':>9} {'conns':>6} {'429s':>5} {'downloads':>9} "
+          f"{'rl_wait_s':>10} {'cond_wait_s':>12}")
+    for entry in results:
+        print(f"{entry['action']:<12} {entry['wall_s']:>8.3f} {entry['requests']:>9} {entry['connections']:>6} "
+              f"{entry['rate_limited']:>5} {entry['downloads']:>9} {entry['rate_limit_wait_s']:>10.3f} "
+              f"{entry['condition_wait_s']:>12.3f}")
+
+    if opt.save:
+        with open(opt.save, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if opt.baseline:
+        with open(opt.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), opt.tolerance)
+        if regressions:
+            print('Regressions:\n  ' + '\n  '.join(regressions))
+            return 1
+        print('No regressions against baseline')
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(parse_option()))
@@ -0,0 +1,63 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS lookups_used_at ON lookups (used_at);
+"""
+
+class LookupCache:
+    """
+    Persistent cache for lookups that do not change, keyed by kind
+    (e.g. 'message_author', 'user') and snowflake. Least recently used
+    entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._count = self.conn.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+
+    def get(self, kind, key):
+        with self._lock, self.conn:
+            row = self.conn.execute('SELECT value FROM lookups WHERE kind = ? AND key = ?',
+                                    (kind, str(key))).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE lookups SET used_at = ? WHERE kind = ? AND key = ?',
+                              (time.time(), kind, str(key)))
+        return json.loads(row[0])
+
+    def put(self, kind, key, value):
+        with self._lock, self.conn:
+            cursor = self.conn.execute('INSERT OR IGNORE INTO lookups (kind, key, value, used_at) VALUES (?, ?, ?, ?)',
+                                       (kind, str(key), json.dumps(value), time.time()))
+            if cursor.rowcount:
+                self._count += 1
+            else:
+                self.conn.execute('UPDATE lookups SET value = ?, used_at = ? WHERE kind = ? AND key = ?',
+                                  (json.dumps(value), time.time(), kind, str(key)))
+
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self.conn.execute('DELETE FROM lookups WHERE rowid IN '
+                                  '(SELECT rowid FROM lookups ORDER BY used_at LIMIT ?)', (excess,))
+                self._count -= excess
+
+    def close(self):
+        self.conn.close()
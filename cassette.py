@@ -0,0 +1,165 @@
+"""
+Record and replay of HTTP traffic, for profiling real workflows offline.
+
+A cassette is a gzip-compressed JSONL file: a header line, then one line
+per request with its method, path (relative to the API root, so a
+cassette replays against any root), query, response status, headers,
+body and latency. The operator token is never written.
+"""
+
+import base64
+import gzip
+import io
+import json
+import threading
+import time
+
+from collections import deque
+from urllib.parse import parse_qsl, urlsplit
+
+from ratelimit import route_key
+
+CASSETTE_VERSION = 1
+KEPT_HEADERS = ('content-type', 'retry-after', 'x-ratelimit-limit', 'x-ratelimit-remaining',
+                'x-ratelimit-reset', 'x-ratelimit-reset-after', 'x-ratelimit-bucket', 'x-ratelimit-global')
+REDACTED = '<redacted>'
+
+def request_key(method, path, params=None):
+    url = urlsplit(path)
+    query = parse_qsl(url.query) + [(key, str(value)) for key, value in (params or {}).items()]
+    return f'{method} {url.path}?' + '&'.join(f'{key}={value}' for key, value in sorted(query))
+
+class RecordingSession:
+    """
+    Wraps a requests session and writes every exchange to a cassette.
+    """
+
+    def __init__(self, session, path, api_root, secrets=()):
+        self.session = session
+        self.api_root = api_root
+        self.secrets = [secret for secret in secrets if secret]
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._write({'version': CASSETTE_VERSION, 'recorded_at': time.time()})
+
+    def _write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        for secret in self.secrets:
+            line = line.replace(secret, REDACTED)
+        with self._lock:
+            self.file.write(line + '\n')
+
+    def relative(self, url):
+        return url[len(self.api_root):] if url.startswith(self.api_root) else url
+
+    def request(self, method, url, **kwargs):
+        if not url.startswith(self.api_root):
+            # Attachment downloads from the CDN are not API traffic: passed through,
+            # still streamed to disk and never held in memory or the cassette
+            return self.session.request(method, url, **kwargs)
+
+        start = time.perf_counter()
+        res = self.session.request(method, url, **kwargs)
+        body = res.content
+        latency = time.perf_counter() - start
+
+        entry = {
+            'method': method,
+            'path': self.relative(url),
+            'params': {key: str(value) for key, value in (kwargs.get('params') or {}).items()},
+            'status': res.status_code,
+            'headers': {key: value for key, value in res.headers.items() if key.lower() in KEPT_HEADERS},
+            'latency': round(latency, 6)
+        }
+        if 'json' in res.headers.get('Content-Type', '') or not body:
+            entry['text'] = body.decode('utf-8')
+        else:
+            entry['base64'] = base64.b64encode(body).decode('ascii')
+        self._write(entry)
+        return res
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+        self.session.close()
+
+class ReplaySession:
+    """
+    Serves responses from a cassette in place of the network, after their
+    recorded latency times `scale`. Repeated requests get the recorded
+    responses in order (then the last one again); a request never seen
+    exactly is answered from the same route, e.g. a poll with a newer
+    cursor.
+    """
+
+    def __init__(self, path, api_root, scale=1.0, sleep=time.sleep):
+        self.api_root = api_root
+        self.scale = scale
+        self.sleep = sleep
+        self.by_request = {}
+        self.by_route = {}
+        self.served = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            header = json.loads(file.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f'{path}: unsupported cassette version {header.get("version")}')
+            for line in file:
+                entry = json.loads(line)
+                self.by_request.setdefault(self.key(entry['method'], entry['path'], entry['params']), deque()) \
+                    .append(entry)
+                self.by_route.setdefault(route_key(entry['method'], entry['path']), deque()).append(entry)
+
+    def key(self, method, path, params):
+        return request_key(method, path, params)
+
+    def take(self, queue):
+        # Keep the last response around for requests repeated more often than recorded
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def find(self, method, url, params):
+        path = url[len(self.api_root):] if url.startswith(self.api_root) else url
+        with self._lock:
+            queue = self.by_request.get(self.key(method, path, params))
+            if queue is None:
+                queue = self.by_route.get(route_key(method, urlsplit(path).path))
+            if queue is None:
+                self.missed += 1
+                return None
+            self.served += 1
+            return self.take(queue)
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        entry = self.find(method, url, kwargs.get('params'))
+        res = requests.Response()
+        res.url = url
+        res.encoding = 'utf-8'
+
+        if entry is None:
+            res.status_code = 404
+            res.headers['Content-Type'] = 'application/json'
+            res._content = json.dumps({'message': f'Not in cassette: {method} {url}', 'code': 0}).encode()
+            res.raw = io.BytesIO(res._content)
+            return res
+
+        self.sleep(entry['latency'] * self.scale)
+        res.status_code = entry['status']
+        res.headers.update(entry['headers'])
+        res._content = entry['text'].encode('utf-8') if 'text' in entry else base64.b64decode(entry['base64'])
+        # Streamed reads & `with` blocks expect a raw body to close
+        res.raw = io.BytesIO(res._content)
+        return res
+
+    def get(self, url, **kwargs):
+        # Bodies come from the cassette, so `stream` makes no difference
+        return self.request('GET', url, **kwargs)
+
+    def close(self):
+        return None
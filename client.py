@@ -0,0 +1,68 @@
+"""
+Thin client for the daemon (python3 main.py -act daemon). Only uses the
+standard library, so commands start without loading the Discord stack.
+
+python3 client.py -act start
+python3 client.py -act end -result accept-default
+python3 client.py -act result_only -result deny-default --link <application_link> --name "Applicant Name"
+python3 client.py -act tally
+python3 client.py -act metrics
+"""
+
+import argparse
+import json
+import socket
+import sys
+
+SOCKET_PATH = 'archive/daemon.sock'
+
+def parse_option():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-act', '--action', type=str, required=True,
+                        help="start, end, result_only, tally, metrics, ping or shutdown")
+    parser.add_argument('-result', '--app_result', type=str, default='none-default',
+                        help="Application result (for end & result_only)")
+    parser.add_argument('--link', type=str, help="Application link (default: APPLICATION_LINK in config.yaml)")
+    parser.add_argument('--name', type=str, help="Applicant name (default: APPLICANT_NAME in config.yaml)")
+    parser.add_argument('-socket', '--socket_path', type=str, default=SOCKET_PATH, help="Daemon socket")
+
+    return parser.parse_args()
+
+def send_command(request, socket_path=SOCKET_PATH, out=sys.stdout):
+    """
+    Send one command and relay the daemon's log lines to `out`. Returns the
+    final reply.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+
+        with sock.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                reply = json.loads(line)
+                if 'log' in reply:
+                    print(reply['log'], file=out)
+                    continue
+                return reply
+
+    return {'ok': False, 'error': 'Daemon closed the connection'}
+
+def main(opt):
+    request = {'action': opt.action, 'app_result': opt.app_result, 'link': opt.link, 'name': opt.name}
+    try:
+        reply = send_command(request, opt.socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f'No daemon listening on {opt.socket_path} (start one with: python3 main.py -act daemon)',
+              file=sys.stderr)
+        return 2
+
+    if reply.get('output'):
+        print(reply['output'], end='')
+    if not reply.get('ok'):
+        print(reply.get('error', 'Command failed'), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(parse_option()))
@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from client import SOCKET_PATH
+from pipeline import QueueEntry, Pipeline
+from snapshot import load_snapshot
+from utils import app_key
+from vote_watch import NoVoteRecorded
+
+COMMANDS = {'start': 'start', 'end': 'end', 'result_only': 'result'}
+
+# Connection whose command is running in the current task / worker thread
+current_client = contextvars.ContextVar('current_client', default=None)
+
+class ClientLogHandler(logging.Handler):
+    """
+    Relays log records emitted on behalf of one client connection back to
+    that client, including records from worker threads its steps run on.
+    """
+
+    def __init__(self, loop, writer):
+        super().__init__(logging.INFO)
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.writer = writer
+        self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    def emit(self, record):
+        if current_client.get() is not self:
+            return
+        line = json.dumps({'log': self.format(record)}).encode() + b'\n'
+        if threading.get_ident() == self.loop_thread:
+            # Written in order with the reply, which would otherwise overtake it
+            self.writer.write(line)
+        else:
+            self.loop.call_soon_threadsafe(self.writer.write, line)
+
+class Daemon:
+    """
+    Keeps one Actions context (HTTP connections, caches, gateway session)
+    alive and runs start/end/result commands received on a Unix socket.
+    Commands for one application run one at a time; different
+    applications run concurrently, as in a queue.
+    """
+
+    def __init__(self, act, socket_path=SOCKET_PATH):
+        self.act = act
+        self.socket_path = socket_path
+        self.pipeline = Pipeline(act)
+        self._app_locks = {}
+        self._stopped = None
+
+    async def serve(self):
+        self._stopped = asyncio.Event()
+        self.clear_stale_socket()
+
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.act.logging.info(f'Daemon listening on {self.socket_path}')
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.act.logging.info('Daemon stopped')
+        return None
+
+    def clear_stale_socket(self):
+        """
+        Remove a socket file left behind by a daemon that did not exit
+        cleanly; refuse to start if another daemon is still listening.
+        """
+        if not os.path.exists(self.socket_path):
+            os.makedirs(os.path.dirname(self.socket_path) or '.', exist_ok=True)
+            return None
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.remove(self.socket_path)
+                return None
+        raise RuntimeError(f'A daemon is already listening on {self.socket_path}')
+
+    def refresh_config(self):
+        """
+        Pick up edits to config.yaml / result_options.ini since the last
+        command, e.g. the next APPLICATION_LINK / APPLICANT_NAME. Token and
+        paths are bound at start-up; changing them needs a restart.
+        """
+        config, result_opt, reused = load_snapshot(self.act.config_path, self.act.result_opt_path)
+        if not reused:
+            config.update(self.act.overrides)
+            self.act.config, self.act.result_opt = config, result_opt
+            self.act.logging.debug('[SUCCESS] Reloaded general configurations')
+        return None
+
+    async def handle(self, reader, writer):
+        handler = ClientLogHandler(asyncio.get_running_loop(), writer)
+        current_client.set(handler)
+        logging.getLogger('').addHandler(handler)
+        start = time.perf_counter()
+        try:
+            request = json.loads(await reader.readline())
+            reply = await self.run_command(request)
+        except Exception as error:
+            self.act.logging.error(f'[DAEMON] {error!r}')
+            reply = {'ok': False, 'error': repr(error)}
+        finally:
+            logging.getLogger('').removeHandler(handler)
+
+        reply['elapsed_s'] = round(time.perf_counter() - start, 3)
+        writer.write(json.dumps(reply).encode() + b'\n')
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+        return None
+
+    async def run_command(self, request):
+        action = request.get('action')
+
+        if action == 'ping':
+            return {'ok': True}
+
+        if action == 'metrics':
+            return {'ok': True, 'output': self.act.metrics.prometheus()}
+
+        if action == 'tally':
+            self.refresh_config()
+            link = request.get('link') or self.act.config['APPLICATION_LINK']
+            try:
+                return {'ok': True, 'output': self.act.tally(app=self.act.journal.load_state(app_key(link))) + '\n'}
+            except NoVoteRecorded as error:
+                return {'ok': False, 'error': str(error)}
+
+        if action == 'shutdown':
+            self._stopped.set()
+            return {'ok': True}
+
+        if action not in COMMANDS:
+            return {'ok': False, 'error': f'Invalid action: {action}'}
+
+        # 1. Resolve the application (explicit link, else config.yaml)
+        self.refresh_config()
+        link = request.get('link') or self.act.config['APPLICATION_LINK']
+        name = request.get('name') or (None if request.get('link') else str(self.act.config['APPLICANT_NAME']))
+
+        if action == 'start':
+            argument = name
+        elif action == 'end' or name is None:
+            argument = request.get('app_result') or 'none-default'
+        else:
+            argument = f"{request.get('app_result') or 'none-default'} {name}"
+        if argument is None:
+            return {'ok': False, 'error': 'start needs an applicant name'}
+
+        # 2. Run it, one command at a time per application
+        key = app_key(link)
+        entry = QueueEntry(COMMANDS[action], link, argument, 0)
+        lock = self._app_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            ok = await self.pipeline.run_app(key, [entry])
+
+        return {'ok': ok} if ok else {'ok': False, 'error': f'{action} failed, see log above'}
@@ -0,0 +1,518 @@
+"""
+Local stand-in for the Discord REST endpoints built by `Endpoint`, for
+offline runs and benchmarks. Simulates rate-limit buckets, latency, 429
+injection and the server's moderation bot (1lock, 1unlock, 2purge, 2embed).
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from attachments import MAX_FILES, MAX_UPLOAD_BYTES
+from ratelimit import route_key, split_major
+from snowflake import from_timestamp_ms, to_datetime
+from utils import SEND_MESSAGES
+
+API_PREFIX = '/api/v10/'
+
+
+class FakeDiscord:
+    """
+    In-memory guild served over HTTP on localhost.
+
+    latency:          seconds added to every response
+    bucket_limit:     requests allowed per route bucket per `bucket_window`
+    inject_429:       probability of answering any request with a 429
+    bot_delay:        seconds before the bot reacts to a command
+    guild_id:         ID of the guild, and so of its @everyone role
+    """
+
+    def __init__(self, latency=0.0, bucket_limit=5, bucket_window=1.0, inject_429=0.0,
+                 bot_delay=0.05, seed=0, gateway=None, guild_id='1'):
+        self.latency = latency
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.inject_429 = inject_429
+        self.bot_delay = bot_delay
+        self.guild_id = guild_id
+        self.random = random.Random(seed)
+
+        # Optional FakeGateway receiving the events the server would dispatch
+        self.gateway = gateway
+
+        self.lock = threading.RLock()
+        self.channels = {}
+        self.users = {}
+        self.files = {}
+        self._sequence = 0
+
+        self.buckets = {}
+        self.request_count = 0
+        self.route_counts = {}
+        self.connection_count = 0
+        self.rate_limited_count = 0
+        self.download_count = 0
+
+        self.operator = self.add_user('operator')
+        self.bot = self.add_user('modbot', bot=True)
+
+        self.server = None
+        self.thread = None
+
+    # Setup
+
+    def next_id(self, at_ms=None):
+        with self.lock:
+            self._sequence += 1
+            return from_timestamp_ms(at_ms if at_ms is not None else time.time() * 1000, self._sequence)
+
+    def add_user(self, username, bot=False):
+        user = {'id': self.next_id(), 'username': username, 'global_name': username, 'bot': bot}
+        self.users[user['id']] = user
+        return user
+
+    def add_channel(self, name, channel_type=0, parent_id=None):
+        channel = {
+            'id': self.next_id(), 'name': name, 'type': channel_type, 'parent_id': parent_id, 'guild_id': self.guild_id,
+            'permission_overwrites': [], 'locked': False, 'archived': False,
+            'messages': {}, 'pins': []
+        }
+        self.channels[channel['id']] = channel
+        return channel
+
+    def add_message(self, channel_id, author, content='', message_type=0, age_s=0.0, attachments=(), embeds=()):
+        at_ms = time.time() * 1000 - age_s * 1000
+        message_id = self.next_id(at_ms)
+        message = {
+            'id': message_id,
+            'channel_id': channel_id,
+            'type': message_type,
+            'content': content,
+            'author': dict(author),
+            'timestamp': to_datetime(message_id).isoformat(),
+            'attachments': list(attachments),
+            'embeds': list(embeds),
+            'reactions': [],
+            'pinned': False,
+            '_reactors': {}
+        }
+        with self.lock:
+            self.channels[channel_id]['messages'][message_id] = message
+        self.emit('MESSAGE_CREATE', self.public(message))
+        return message
+
+    def add_attachment(self, channel_id, filename, data):
+        """
+        Attachment object for `data`, downloadable from the fake CDN.
+        """
+        attachment_id = self.next_id()
+        with self.lock:
+            self.files[attachment_id] = bytes(data)
+        return {
+            'id': attachment_id,
+            'filename': filename,
+            'size': len(data),
+            'url': f'{self.cdn_root}/{channel_id}/{attachment_id}/{filename}',
+            'content_type': 'application/octet-stream'
+        }
+
+    def add_reaction(self, channel_id, message_id, emoji, user):
+        with self.lock:
+            message = self.channels[channel_id]['messages'][message_id]
+            reactors = message['_reactors'].setdefault(emoji, [])
+            if user['id'] in reactors:
+                return
+            reactors.append(user['id'])
+        self.emit('MESSAGE_REACTION_ADD', {'channel_id': channel_id, 'message_id': message_id,
+                                           'user_id': user['id'], 'emoji': self.emoji_object(emoji)})
+
+    def remove_reaction(self, channel_id, message_id, emoji, user):
+        with self.lock:
+            message = self.channels[channel_id]['messages'][message_id]
+            reactors = message['_reactors'].get(emoji, [])
+            if user['id'] not in reactors:
+                return
+            reactors.remove(user['id'])
+        self.emit('MESSAGE_REACTION_REMOVE', {'channel_id': channel_id, 'message_id': message_id,
+                                              'user_id': user['id'], 'emoji': self.emoji_object(emoji)})
+
+    @staticmethod
+    def emoji_object(emoji):
+        if ':' in emoji:
+            name, emoji_id = emoji.split(':', 1)
+            return {'id': emoji_id, 'name': name}
+        return {'id': None, 'name': emoji}
+
+    def public(self, message):
+        reactors = message.get('_reactors', {})
+        public = {key: value for key, value in message.items() if not key.startswith('_')}
+        public['reactions'] = [
+            {'count': len(users), 'me': self.operator['id'] in users, 'emoji': self.emoji_object(emoji)}
+            for emoji, users in reactors.items() if users
+        ]
+        return public
+
+    def emit(self, event, data):
+        if self.gateway is not None:
+            self.gateway.emit(event, data)
+
+    # Server lifecycle
+
+    def start(self):
+        fake = self
+
+        class Handler(FakeHandler):
+            pass
+        Handler.fake = fake
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    @property
+    def api_root(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/api'
+
+    @property
+    def cdn_root(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/attachments'
+
+    def reset_counters(self):
+        with self.lock:
+            self.request_count = 0
+            self.route_counts = {}
+            self.connection_count = 0
+            self.rate_limited_count = 0
+            self.download_count = 0
+
+    # Rate limits
+
+    def check_rate_limit(self, method, path):
+        """
+        Returns (status, headers, body) for a throttled request, else the
+        headers to attach to the normal response.
+        """
+        route = route_key(method, path)
+        now = time.monotonic()
+
+        with self.lock:
+            self.request_count += 1
+            self.route_counts[route] = self.route_counts.get(route, 0) + 1
+
+            window_start, used = self.buckets.get(route, (now, 0))
+            if now - window_start >= self.bucket_window:
+                window_start, used = now, 0
+
+            reset_after = self.bucket_window - (now - window_start)
+            # Like Discord, one hash per route template; the window is per major parameter
+            bucket_hash = f'{abs(hash(split_major(route)[0])) % 10 ** 8:08x}'
+
+            injected = self.inject_429 and self.random.random() < self.inject_429
+            if used >= self.bucket_limit or injected:
+                self.rate_limited_count += 1
+                retry_after = reset_after if not injected else 0.05
+                headers = {
+                    'X-RateLimit-Bucket': bucket_hash,
+                    'X-RateLimit-Limit': str(self.bucket_limit),
+                    'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset-After': f'{retry_after:.3f}',
+                    'Retry-After': f'{retry_after:.3f}'
+                }
+                body = {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': False}
+                return 429, headers, body
+
+            used += 1
+            self.buckets[route] = (window_start, used)
+            headers = {
+                'X-RateLimit-Bucket': bucket_hash,
+                'X-RateLimit-Limit': str(self.bucket_limit),
+                'X-RateLimit-Remaining': str(self.bucket_limit - used),
+                'X-RateLimit-Reset-After': f'{reset_after:.3f}'
+            }
+            return None, headers, None
+
+    # Bot
+
+    def bot_command(self, channel_id, content):
+        command = content.split(' ', 1)
+        if command[0] not in ('1lock', '1unlock', '2purge', '2embed'):
+            return
+
+        def act():
+            time.sleep(self.bot_delay)
+            channel = self.channels[channel_id]
+
+            if command[0] in ('1lock', '1unlock'):
+                # Like the real bot, only the @everyone overwrite is toggled
+                with self.lock:
+                    deny = SEND_MESSAGES if command[0] == '1lock' else 0
+                    overwrites = [overwrite for overwrite in channel['permission_overwrites']
+                                  if overwrite['id'] != self.guild_id]
+                    overwrites.append({'id': self.guild_id, 'type': 0, 'allow': '0', 'deny': str(deny)})
+                    channel['permission_overwrites'] = overwrites
+                self.emit('CHANNEL_UPDATE', self.channel_object(channel))
+
+            elif command[0] == '2purge':
+                limit = int(command[1]) if len(command) > 1 else 100
+                with self.lock:
+                    ids = sorted((message_id for message_id, message in channel['messages'].items()
+                                  if not message['pinned']), key=int, reverse=True)[:limit]
+                    for message_id in ids:
+                        del channel['messages'][message_id]
+                self.emit('MESSAGE_DELETE_BULK', {'ids': ids, 'channel_id': channel_id})
+
+            elif command[0] == '2embed':
+                # Part of the message when created, as in the gateway event
+                embed = {'description': command[1] if len(command) > 1 else ''}
+                self.add_message(channel_id, self.bot, '', embeds=[embed])
+
+        threading.Thread(target=act, daemon=True).start()
+
+    def channel_object(self, channel):
+        return {key: value for key, value in channel.items() if key not in ('messages', 'pins')}
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    ROUTES = [
+        ('GET', r'channels/(\d+)', 'get_channel'),
+        ('PATCH', r'channels/(\d+)', 'patch_channel'),
+        ('GET', r'channels/(\d+)/messages', 'get_messages'),
+        ('POST', r'channels/(\d+)/messages', 'post_message'),
+        ('POST', r'channels/(\d+)/messages/bulk-delete', 'bulk_delete'),
+        ('GET', r'channels/(\d+)/messages/(\d+)', 'get_message'),
+        ('DELETE', r'channels/(\d+)/messages/(\d+)', 'delete_message'),
+        ('PUT', r'channels/(\d+)/messages/(\d+)/reactions/([^/]+)/%40me', 'put_reaction'),
+        ('PUT', r'channels/(\d+)/messages/(\d+)/reactions/([^/]+)/@me', 'put_reaction'),
+        ('GET', r'channels/(\d+)/messages/(\d+)/reactions/([^/]+)', 'get_reactions'),
+        ('PUT', r'channels/(\d+)/pins/(\d+)', 'put_pin'),
+        ('POST', r'channels/(\d+)/threads', 'post_thread'),
+        ('GET', r'users/(\d+)', 'get_user'),
+        ('GET', r'users/(\d+)/profile', 'get_user'),
+    ]
+
+    def setup(self):
+        super().setup()
+        with self.fake.lock:
+            self.fake.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def reply(self, status, body=None, headers=None):
+        payload = b'' if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def serve_attachment(self, path):
+        # CDN downloads need no token and are not rate limited
+        match = re.fullmatch(r'/attachments/(\d+)/(\d+)/[^/]+', path)
+        data = self.fake.files.get(match.group(2)) if match else None
+        if data is None:
+            return self.reply(404, {'message': '404: Not Found', 'code': 0})
+
+        with self.fake.lock:
+            self.fake.download_count += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def dispatch(self, method):
+        fake = self.fake
+        url = urlsplit(self.path)
+        body = self.read_body()
+
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if method == 'GET' and url.path.startswith('/attachments/'):
+            return self.serve_attachment(url.path)
+
+        if not self.headers.get('Authorization'):
+            return self.reply(401, {'message': '401: Unauthorized', 'code': 0})
+
+        if not url.path.startswith(API_PREFIX):
+            return self.reply(404, {'message': '404: Not Found', 'code': 0})
+        path = url.path[len(API_PREFIX):]
+
+        status, headers, limited = fake.check_rate_limit(method, path)
+        if status is not None:
+            return self.reply(status, limited, headers)
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    status, result = getattr(self, name)(*match.groups(), query=query, body=body)
+                except KeyError:
+                    status, result = 404, {'message': 'Unknown Message', 'code': 10008}
+                return self.reply(status, result, headers)
+
+        return self.reply(404, {'message': '404: Not Found', 'code': 0}, headers)
+
+    # Routes
+
+    def get_channel(self, channel_id, query, body):
+        return 200, self.fake.channel_object(self.fake.channels[channel_id])
+
+    def patch_channel(self, channel_id, query, body):
+        channel = self.fake.channels[channel_id]
+        updates = json.loads(body or b'{}')
+        with self.fake.lock:
+            channel.update({key: value for key, value in updates.items() if key in ('locked', 'archived', 'name')})
+        self.fake.emit('THREAD_UPDATE', self.fake.channel_object(channel))
+        return 200, self.fake.channel_object(channel)
+
+    def get_messages(self, channel_id, query, body):
+        fake = self.fake
+        limit = min(int(query.get('limit', 50)), 100)
+        with fake.lock:
+            ids = sorted(fake.channels[channel_id]['messages'], key=int)
+
+            if 'after' in query:
+                after = int(query['after'])
+                selected = [message_id for message_id in ids if int(message_id) > after][:limit]
+            else:
+                before = int(query['before']) if 'before' in query else None
+                selected = [message_id for message_id in ids if before is None or int(message_id) < before][-limit:]
+
+            messages = [fake.public(fake.channels[channel_id]['messages'][message_id]) for message_id in reversed(selected)]
+        return 200, messages
+
+    def post_message(self, channel_id, query, body):
+        fake = self.fake
+        content_type = self.headers.get('Content-Type', '')
+        attachments = []
+
+        if content_type.startswith('multipart/form-data'):
+            if len(body) > MAX_UPLOAD_BYTES:
+                return 413, {'message': 'Request entity too large', 'code': 40005}
+            parsed = BytesParser().parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+            content = ''
+            for part in parsed.get_payload():
+                name = part.get_param('name', header='content-disposition')
+                filename = part.get_filename()
+                payload = part.get_payload(decode=True) or b''
+                if filename:
+                    attachments.append(fake.add_attachment(channel_id, filename, payload))
+                elif name == 'content':
+                    content = payload.decode()
+                elif name == 'payload_json':
+                    content = json.loads(payload).get('content') or ''
+            if len(attachments) > MAX_FILES:
+                return 400, {'message': 'Invalid Form Body', 'code': 50035}
+        else:
+            content = json.loads(body or b'{}').get('content') or ''
+
+        message = fake.add_message(channel_id, fake.operator, content, attachments=attachments)
+        fake.bot_command(channel_id, content)
+        return 200, fake.public(message)
+
+    def bulk_delete(self, channel_id, query, body):
+        fake = self.fake
+        ids = json.loads(body)['messages']
+        if not 2 <= len(ids) <= 100:
+            return 400, {'message': 'Invalid Form Body', 'code': 50035}
+
+        cutoff = time.time() * 1000 - 14 * 24 * 3600 * 1000
+        with fake.lock:
+            messages = fake.channels[channel_id]['messages']
+            if any(to_datetime(message_id).timestamp() * 1000 < cutoff for message_id in ids):
+                return 400, {'message': 'You can only bulk delete messages that are under 14 days old.', 'code': 50034}
+            for message_id in ids:
+                messages.pop(message_id, None)
+        fake.emit('MESSAGE_DELETE_BULK', {'ids': ids, 'channel_id': channel_id})
+        return 204, None
+
+    def get_message(self, channel_id, message_id, query, body):
+        return 200, self.fake.public(self.fake.channels[channel_id]['messages'][message_id])
+
+    def delete_message(self, channel_id, message_id, query, body):
+        fake = self.fake
+        with fake.lock:
+            channel = fake.channels[channel_id]
+            if message_id not in channel['messages']:
+                return 404, {'message': 'Unknown Message', 'code': 10008}
+            del channel['messages'][message_id]
+        fake.emit('MESSAGE_DELETE', {'id': message_id, 'channel_id': channel_id})
+        return 204, None
+
+    def put_reaction(self, channel_id, message_id, emoji, query, body):
+        self.fake.add_reaction(channel_id, message_id, unquote(emoji), self.fake.operator)
+        return 204, None
+
+    def get_reactions(self, channel_id, message_id, emoji, query, body):
+        fake = self.fake
+        limit = min(int(query.get('limit', 25)), 100)
+        after = int(query.get('after', 0))
+        with fake.lock:
+            reactors = fake.channels[channel_id]['messages'][message_id]['_reactors'].get(unquote(emoji), [])
+            user_ids = sorted((user_id for user_id in reactors if int(user_id) > after), key=int)[:limit]
+        return 200, [fake.users[user_id] for user_id in user_ids]
+
+    def put_pin(self, channel_id, message_id, query, body):
+        fake = self.fake
+        with fake.lock:
+            channel = fake.channels[channel_id]
+            channel['messages'][message_id]['pinned'] = True
+            channel['pins'].append(message_id)
+        fake.add_message(channel_id, fake.operator, '', message_type=6)
+        fake.emit('CHANNEL_PINS_UPDATE', {'channel_id': channel_id,
+                                          'last_pin_timestamp': datetime.now(timezone.utc).isoformat()})
+        return 204, None
+
+    def post_thread(self, channel_id, query, body):
+        fake = self.fake
+        name = json.loads(body)['name']
+        thread = fake.add_channel(name, channel_type=11, parent_id=channel_id)
+        # Thread-created system message, echoing the thread name
+        fake.add_message(channel_id, fake.operator, name, message_type=18)
+        return 201, fake.channel_object(thread)
+
+    def get_user(self, user_id, query, body):
+        return 200, self.fake.users[user_id]
@@ -0,0 +1,107 @@
+import json
+import threading
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+GATEWAY_URL = 'wss://gateway.discord.gg/?v={}&encoding=json'
+
+# GUILDS | GUILD_MESSAGES | GUILD_MESSAGE_REACTIONS | MESSAGE_CONTENT
+DEFAULT_INTENTS = (1 << 0) | (1 << 9) | (1 << 10) | (1 << 15)
+
+# Opcodes
+DISPATCH, HEARTBEAT, IDENTIFY, HELLO = 0, 1, 2, 10
+
+class GatewayClient:
+    """
+    Minimal Discord Gateway session feeding dispatch events into an EventHub.
+    Needs the optional `websocket-client` package.
+    """
+
+    def __init__(self, token, hub, api_version=10, intents=DEFAULT_INTENTS):
+        if websocket is None:
+            raise ImportError('GatewayClient requires the websocket-client package')
+
+        self.token = token
+        self.hub = hub
+        self.url = GATEWAY_URL.format(api_version)
+        self.intents = intents
+
+        self.sequence = None
+        self.ws = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+
+    def start(self, timeout=10.0):
+        """
+        Connect on a background thread; returns whether READY arrived in time.
+        """
+        threading.Thread(target=self._run, daemon=True).start()
+        return self._ready.wait(timeout)
+
+    def close(self):
+        self._stop.set()
+        self.hub.connected = False
+        if self.ws is not None:
+            self.ws.close()
+
+    def _send(self, op, d):
+        self.ws.send(json.dumps({'op': op, 'd': d}))
+
+    def _heartbeat(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self._send(HEARTBEAT, self.sequence)
+            except Exception:
+                return
+
+    def _run(self):
+        try:
+            self.ws = websocket.create_connection(self.url)
+            while not self._stop.is_set():
+                payload = json.loads(self.ws.recv())
+
+                if payload.get('s') is not None:
+                    self.sequence = payload['s']
+
+                if payload['op'] == HELLO:
+                    interval = payload['d']['heartbeat_interval'] / 1000
+                    threading.Thread(target=self._heartbeat, args=(interval,), daemon=True).start()
+                    self._send(IDENTIFY, {
+                        'token': self.token,
+                        'intents': self.intents,
+                        'properties': {'os': 'linux', 'browser': 'discord-manager', 'device': 'discord-manager'}
+                    })
+
+                elif payload['op'] == DISPATCH:
+                    if payload['t'] == 'READY':
+                        self.hub.connected = True
+                        self._ready.set()
+                    self.hub.dispatch(payload['t'], payload['d'])
+
+        except Exception:
+            # Waiters fall back to polling once the session is gone
+            pass
+        finally:
+            self.hub.connected = False
+
+class FakeGateway:
+    """
+    Stand-in gateway for local runs: events are emitted by hand (or by a
+    fake server) instead of arriving over a websocket.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self, timeout=None):
+        self.hub.connected = True
+        return True
+
+    def close(self):
+        self.hub.connected = False
+
+    def emit(self, event, data):
+        self.hub.dispatch(event, data)
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_key TEXT NOT NULL,
+    action TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS runs_app_action ON runs (app_key, action, status);
+
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    step TEXT NOT NULL,
+    output TEXT,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (run_id, step)
+);
+
+CREATE TABLE IF NOT EXISTS apps (
+    app_key TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS votes (
+    member_channel TEXT PRIMARY KEY,
+    app_key TEXT NOT NULL,
+    opened_at REAL NOT NULL
+);
+"""
+
+class VoteInProgress(RuntimeError):
+    """
+    The members' channel already holds the vote of another application.
+    """
+
+    def __init__(self, member_channel, app_key):
+        super().__init__(f"Members' channel {member_channel} has an open vote for application {app_key}; "
+                         f"end it before starting another")
+        self.member_channel = member_channel
+        self.app_key = app_key
+
+class Run:
+    """
+    One execution of an action for one application. Finished steps and
+    their outputs are recorded so an interrupted run can be resumed.
+    """
+
+    def __init__(self, journal, run_id, completed):
+        self.journal = journal
+        self.run_id = run_id
+        self.completed = completed
+
+    @property
+    def resumed(self):
+        return bool(self.completed)
+
+    def record(self, step, output):
+        self.completed[step] = output
+        self.journal.execute('INSERT OR REPLACE INTO steps (run_id, step, output, finished_at) VALUES (?, ?, ?, ?)',
+                             (self.run_id, step, json.dumps(output), time.time()))
+
+    def finish(self):
+        self.journal.execute("UPDATE runs SET status = 'done', finished_at = ? WHERE id = ?",
+                             (time.time(), self.run_id))
+
+class Journal:
+    """
+    SQLite-backed record of workflow runs and per-application state.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def execute(self, sql, params=()):
+        with self._lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    def open_run(self, app_key, action):
+        """
+        Resume the unfinished run of `action` for `app_key`, or start a new one.
+        """
+        rows = self.execute("SELECT id FROM runs WHERE app_key = ? AND action = ? AND status = 'running' "
+                            "ORDER BY id DESC LIMIT 1", (app_key, action))
+        if rows:
+            run_id = rows[0][0]
+            steps = self.execute('SELECT step, output FROM steps WHERE run_id = ?', (run_id,))
+            return Run(self, run_id, {step: json.loads(output) for step, output in steps})
+
+        with self._lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (app_key, action, status, started_at) VALUES (?, ?, 'running', ?)",
+                                       (app_key, action, time.time()))
+        return Run(self, cursor.lastrowid, {})
+
+    def load_state(self, app_key):
+        rows = self.execute('SELECT state FROM apps WHERE app_key = ?', (app_key,))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def save_state(self, app_key, state):
+        self.execute('INSERT OR REPLACE INTO apps (app_key, state, updated_at) VALUES (?, ?, ?)',
+                     (app_key, json.dumps(dict(state)), time.time()))
+
+    def claim_vote(self, member_channel, app_key):
+        """
+        Reserve `member_channel` for the vote of `app_key`. Returns the
+        application holding it afterwards: `app_key` unless another vote is
+        still open there.
+        """
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO votes (member_channel, app_key, opened_at) VALUES (?, ?, ?)',
+                              (member_channel, app_key, time.time()))
+            return self.conn.execute('SELECT app_key FROM votes WHERE member_channel = ?',
+                                     (member_channel,)).fetchone()[0]
+
+    def vote_holder(self, member_channel):
+        rows = self.execute('SELECT app_key FROM votes WHERE member_channel = ?', (member_channel,))
+        return rows[0][0] if rows else None
+
+    def has_progress(self, app_key, action):
+        """
+        Whether any step of `action` has been recorded for `app_key`.
+        """
+        return bool(self.execute('SELECT 1 FROM steps JOIN runs ON runs.id = steps.run_id '
+                                 'WHERE runs.app_key = ? AND runs.action = ? LIMIT 1', (app_key, action)))
+
+    def release_vote(self, member_channel, app_key):
+        self.execute('DELETE FROM votes WHERE member_channel = ? AND app_key = ?', (member_channel, app_key))
+
+    def close(self):
+        self.conn.close()
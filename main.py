@@ -1,42 +1,84 @@
+import time
+LAUNCHED = time.perf_counter()
+
 import argparse
-import configparser
 import json
 import logging
-import os 
-import ruamel.yaml
-import time
+import sys
+import threading
+import weakref
 
 
+from collections import ChainMap
 from datetime import datetime, timezone
-from api_depot import Canopy
-from utils import add_one, format_timedelta
+from app_index import ApplicationIndex
+from archiver import ThreadArchiver
+from attachments import MAX_UPLOAD_BYTES, Attachment
+from cache import LookupCache
+from client import SOCKET_PATH
+from journal import Journal, VoteInProgress
+from meta_store import MetaStore
+from metrics import Metrics, StartupProfile
+from snapshot import load_snapshot
+from utils import app_key, format_timedelta, is_locked
+from vote_watch import NoVoteRecorded, VoteSeries, VoteWatcher, format_tally
+from votes import tally_votes
+from waiter import EventHub, Waiter
 
 API_VERSION = 10
 CONFIG_PATH = 'config.yaml'
 RESULT_OPT_PATH = 'result_options.ini'
+ACTIONS = ('start', 'end', 'result_only', 'query', 'stats', 'watch', 'tally', 'queue', 'daemon', 'shards')
 
 """
 python3 main.py -act start -d
+python3 main.py -act start -applicant "Applicant Name"
 python3 main.py -act end
+python3 main.py -act queue -queue queue.txt
+python3 main.py -act query -applicant 123456789012345678
+python3 main.py -act watch
+python3 main.py -act tally
+python3 main.py -act daemon
+python3 main.py -act shards -guilds guilds.yaml
 """
 
 def parse_option():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument('-act', '--action', type=str, help="Action to perform")
+    parser.add_argument('-act', '--action', type=str, choices=ACTIONS, help="Action to perform")
     parser.add_argument('-d', '--debug', action='store_true', help="Show debug messages")
+    parser.add_argument('--profile_startup', action='store_true',
+                        help="Print time spent in each start-up phase and until the first API request")
     parser.add_argument('-result', '--app_result', type=str, default='none-default',
                         help="Application result (for end_app & send_result)")
+    parser.add_argument('-applicant', '--applicant', type=str,
+                        help="Applicant ID or name (for query; for start/end/result_only instead of APPLICATION_LINK)")
+    parser.add_argument('--since', type=str, help="Earliest start date, YYYY-MM-DD (for query)")
+    parser.add_argument('--until', type=str, help="Latest start date, YYYY-MM-DD (for query)")
+    parser.add_argument('--decision', type=str, help="accept, deny or reject (for query)")
+    parser.add_argument('--min_accept', type=int, help="At least this many accept votes (for query)")
+    parser.add_argument('--min_deny', type=int, help="At least this many deny votes (for query)")
+    parser.add_argument('--duration', type=float, help="Seconds to watch before stopping (for watch)")
+    parser.add_argument('--history', action='store_true', help="Print every recorded change (for tally)")
+    parser.add_argument('--metrics_out', type=str, help="Write Prometheus text metrics to this file")
+    parser.add_argument('--trace_out', type=str, help="Write a Chrome/Perfetto JSON trace to this file")
+    parser.add_argument('--record', type=str, help="Record every API request & response to this cassette")
+    parser.add_argument('--replay', type=str, help="Serve API responses from this cassette instead of Discord")
+    parser.add_argument('--replay_scale', type=float, default=1.0,
+                        help="Multiply the recorded latencies by this when replaying (0 for none)")
+    parser.add_argument('-queue', '--queue_file', type=str,
+                        help="File of start/end/result entries (for queue)")
+    parser.add_argument('-guilds', '--guilds_file', type=str, help="Guild profiles file (for shards)")
+    parser.add_argument('-processes', '--processes', type=int,
+                        help="Worker processes (for shards, default: one per guild)")
+    parser.add_argument('-socket', '--socket_path', type=str, default=SOCKET_PATH,
+                        help="Unix socket to listen on (for daemon)")
+    parser.add_argument('-jobs', '--max_concurrent', type=int, default=4,
+                        help="Applications processed at once (for queue)")
 
     opt = parser.parse_args()
     return opt
 
-def load_config(yaml_obj):
-    with open(CONFIG_PATH, 'r') as file:
-        config = yaml_obj.load(file)
-
-    return config
-
 def create_log(debug):
 
     logging.basicConfig(filename='app_manager.log', level=logging.DEBUG,
@@ -59,55 +101,242 @@ def create_log(debug):
     return logging 
     
 class Actions:
-    def __init__(self, debug):
+    def __init__(self, debug, resolve_applicant=True, config_path=CONFIG_PATH, overrides=None,
+                 record=None, replay=None, replay_scale=1.0):
         self.debug = debug
         self.logging = create_log(self.debug)
+        self.startup = StartupProfile(LAUNCHED)
+        self.startup.mark('imports')
+
+        # General configs & app results, from the snapshot while both files are unchanged
+        self.config_path, self.result_opt_path = config_path, RESULT_OPT_PATH
+        self.config, self.result_opt, reused = load_snapshot(config_path, RESULT_OPT_PATH)
+        self.overrides = overrides or {}
+        self.config.update(self.overrides)
+        self.logging.debug(f"[SUCCESS] Loaded general configurations{' (snapshot)' if reused else ''}")
+        self.startup.mark('config' + (' (snapshot)' if reused else ' (parsed)'))
+
+        # Workflow journal & state of the application named in config.yaml
+        self.journal = Journal(self.config.get('JOURNAL_PATH') or 'archive/journal.sqlite3')
+        self.app = self.journal.load_state(app_key(self.config['APPLICATION_LINK']))
+        self.app['APPLICATION_LINK'] = self.config['APPLICATION_LINK']
+        self.app['APPLICANT_NAME'] = str(self.config['APPLICANT_NAME'])
+        self.logging.debug('[SUCCESS] Opened workflow journal')
+
+        # Archive of past applications' metadata
+        self.meta_store = MetaStore(self.config['META_PATH'])
+        self.logging.debug('[SUCCESS] Opened application archive')
+        self.startup.mark('journal & archive')
+
+        # Discord API, created on first use: offline actions never import requests
+        self.metrics = Metrics()
+        self._cano, self._acano = None, None
+        self.cassette = None
+        self._cassette_options = (record, replay, replay_scale)
+
+        # Gateway events, used to continue as soon as the bot has acted
+        self.hub = EventHub()
+        self.waiter = Waiter(self.hub)
+        self.gateway = None
+        self._channel_locks = weakref.WeakKeyDictionary()
+        if self.config.get('USE_GATEWAY') and replay is None:
+            from gateway import GatewayClient
+            self.gateway = GatewayClient(self.config['OPERATOR_TOKEN'], self.hub, api_version=API_VERSION)
+            if self.gateway.start():
+                self.logging.debug('[SUCCESS] Connected to gateway')
+            else:
+                self.logging.warning('Gateway not ready, falling back to polling')
+            self.startup.mark('gateway')
 
-        # General configs
-        self.yaml = ruamel.yaml.YAML()
-        self.yaml.preserve_quotes = True
+        # Other 
+        if resolve_applicant:
+            self.get_applicant_id()
+            self.logging.debug('[SUCCESS] Retrieved applicant ID')
+            self.startup.mark('applicant id')
+
+    @property
+    def cano(self):
+        if self._cano is None:
+            from api_depot import Canopy
+
+            headers = {
+                "Authorization": self.config['OPERATOR_TOKEN'],
+                "Content-Type": "application/json"
+            }
+            cache = LookupCache(self.config.get('CACHE_PATH') or 'archive/cache.sqlite3',
+                                max_entries=self.config.get('CACHE_SIZE', 10000))
+            api_root = self.config.get('API_ROOT') or 'https://discord.com/api'
+            self.cassette = self.open_cassette(api_root, *self._cassette_options)
+            self._cano = Canopy(api_version=API_VERSION, headers=headers, cache=cache, api_root=api_root,
+                                session=self.cassette,
+                                metrics=self.metrics,
+                                max_upload_bytes=self.config.get('MAX_UPLOAD_BYTES') or MAX_UPLOAD_BYTES)
+            self.logging.debug('[SUCCESS] Initialized Discord API')
+            self.startup.mark('api client')
+        return self._cano
+
+    @property
+    def acano(self):
+        if self._acano is None:
+            from api_depot import AsyncCanopy
+            self._acano = AsyncCanopy(self.cano)
+        return self._acano
+
+    def open_cassette(self, api_root, record=None, replay=None, replay_scale=1.0):
+        """
+        HTTP session for the API client: one recording every exchange to
+        `record`, one serving the responses recorded in `replay`, or None
+        for the network as usual.
+        """
+        if record is None and replay is None:
+            return None
 
-        self.config = load_config(self.yaml)
-        self.logging.debug('[SUCCESS] Loaded general configurations')
+        from cassette import RecordingSession, ReplaySession
+        if replay is not None:
+            self.logging.info(f'[REPLAY] Serving responses from {replay} (latency x{replay_scale})')
+            return ReplaySession(replay, api_root, scale=replay_scale)
 
-        # App results
-        self.result_opt = configparser.ConfigParser()
-        self.result_opt.read(RESULT_OPT_PATH)
-        self.logging.debug('[SUCCESS] Loaded application results')
+        import requests
+        self.logging.info(f'[RECORD] Recording requests to {record}')
+        return RecordingSession(requests.Session(), record, api_root, secrets=[self.config['OPERATOR_TOKEN']])
 
-        # Discord API
-        headers = {
-            "Authorization": self.config['OPERATOR_TOKEN'],
-            "Content-Type": "application/json"
-        }
-        self.cano = Canopy(api_version=API_VERSION, headers=headers)
-        self.logging.debug('[SUCCESS] Initialized Discord API')
+    def app_config(self, app=None):
+        """
+        Config as seen by one application: its own state (applicant, link,
+        thread & vote message IDs) layered over the shared config. Without
+        `app` the application named in config.yaml is used.
+        """
+        if app is None:
+            app = self.app
+        return ChainMap(app, self.config)
 
-        # Other 
-        self.get_applicant_id()
-        self.logging.debug('[SUCCESS] Retrieved applicant ID')
+    def channel_lock(self, channel_id):
+        """
+        asyncio lock serializing concurrent workflows on one channel.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        locks = self._channel_locks.setdefault(loop, {})
+        if channel_id not in locks:
+            locks[channel_id] = asyncio.Lock()
+        return locks[channel_id]
+
+    def get_applicant_id(self, app=None):
+        if app is None:
+            app = self.app
+        channel_id = app['APPLICATION_LINK'].split('/')[-2]
+        message_id = app['APPLICATION_LINK'].split('/')[-1]
+
+        # Authors never change, so repeat runs are served from the lookup cache
+        author = self.cano.lookup_message_author(channel_id, message_id)
+
+        app['APPLICANT_ID'] = author['id']
+        # Never config.yaml's APPLICANT_NAME: it names the applicant of APPLICATION_LINK only
+        app['APPLICANT_NAME'] = str(app['APPLICANT_NAME']) if 'APPLICANT_NAME' in app else author['username']
+        return None
+    
+    def use_application(self, applicant, started=False):
+        """
+        Act on the newest application posted by `applicant` (an author ID or
+        a name), found in the local index of the applicant channel instead
+        of APPLICATION_LINK. The index is brought up to date first.
 
-    def get_applicant_id(self):
-        channel_id = self.config['APPLICATION_LINK'].split('/')[-2]
-        message_id = self.config['APPLICATION_LINK'].split('/')[-1]
-        search_cutoff = add_one(message_id)
+        With `started` (for end & result_only), the newest application that
+        was started is preferred, so later messages by the applicant do not
+        redirect the command to an application without a vote.
+        """
+        config = self.config
+        channel_id = config['APPLICANT_CHANNEL']
+        index = ApplicationIndex(config.get('APP_INDEX_PATH') or 'archive/app_index.sqlite3')
+        try:
+            added = index.sync(self.cano, channel_id, ignore_ids={config['OPERATOR_ID']})
+            matches = index.find(applicant, channel_id)
+        finally:
+            index.close()
+        self.logging.debug(f'[SUCCESS] Synced application index ({added} new)')
+
+        if not matches:
+            raise LookupError(f'No application by {applicant!r} in channel {channel_id}')
+        if started:
+            states = [self.journal.load_state(message_id) for message_id, _, _ in matches]
+            matches = [match for match, state in zip(matches, states) if state.get('VOTE_MESSAGE_ID')] or matches
+        if len(matches) > 1:
+            self.logging.info(f'{len(matches)} applications by {applicant!r}, using the newest')
+
+        message_id, _, author_id = matches[0]
+        link = f"https://discord.com/channels/{config['GUILD']}/{channel_id}/{message_id}"
+
+        self.app = self.journal.load_state(app_key(link))
+        self.app['APPLICATION_LINK'] = link
+        self.app['APPLICANT_ID'] = author_id
+        if not str(applicant).isdigit():
+            self.app['APPLICANT_NAME'] = str(applicant)
+        elif 'APPLICANT_NAME' not in self.app:
+            self.app['APPLICANT_NAME'] = self.cano.lookup_user(author_id)['username']
+
+        self.logging.info(f'Application of {self.app["APPLICANT_NAME"]}: {link}')
+        return None
 
-        params = {
-            'before': search_cutoff
-        }
-        res = self.cano.get_messages(channel_id, count=1, params=params)
-        messages = res.json()
-        app_message = messages[0]
-        assert app_message['id'] == message_id
+    def expect_message(self, channel_id, match, since=None, timeout=None):
+        """
+        Wait for a message in `channel_id` satisfying `match`. Call before
+        triggering it; `.wait()` on the result returns the message or None.
+        When polling, only messages after `since` (an ID or datetime, or a
+        callable returning one once known) are fetched, in small pages.
+        """
+        def predicate(message):
+            return message['channel_id'] == channel_id and match(message)
+
+        def poll():
+            cursor = since() if callable(since) else since
+            if cursor is None:
+                messages = self.cano.fetch_messages(channel_id, keep_raw=False)
+            else:
+                messages = self.cano.messages_since(channel_id, cursor, keep_raw=False)
+            return next((message for message in messages if match(message)), None)
+
+        return self.waiter.expect('MESSAGE_CREATE', predicate, poll=poll, timeout=timeout)
+
+    def expect_channel_lock(self, channel_id, locked, timeout=None):
+        """
+        Wait for `channel_id` to become locked (or unlocked), e.g. after a
+        lock/unlock bot command. Returns None when the channel is already in
+        that state, as the command then changes nothing to wait for.
+        """
+        # The bot toggles @everyone, whose role ID is the guild's, unless LOCK_ROLE says otherwise
+        role_id = str(self.config.get('LOCK_ROLE') or self.config['GUILD'])
+        if is_locked(self.cano.get_channel(channel_id).json(), role_id) == locked:
+            return None
+
+        def poll():
+            return is_locked(self.cano.get_channel(channel_id).json(), role_id) == locked
+
+        return self.waiter.expect('CHANNEL_UPDATE',
+                                  lambda channel: channel['id'] == channel_id and is_locked(channel, role_id) == locked,
+                                  poll=poll, timeout=timeout)
+
+    async def wait_for(self, pending, what):
+        if pending is None:
+            return None
+
+        import asyncio
+        result = await asyncio.to_thread(pending.wait)
+        if not result:
+            self.logging.warning(f'Timed out waiting for {what}')
+        return result
 
-        self.config['APPLICANT_ID'] = app_message['author']['id']
-        self.config['APPLICANT_NAME'] = str(self.config['APPLICANT_NAME'])
-        return None
-    
     def start_app(self):
+        import asyncio
+        asyncio.run(self.start_app_async())
+        return None
+
+    async def start_app_async(self, app=None):
         """
         # Start App
         # Description: Start an application.
+        # Steps 1-4 (applicant thread) and 5-10 (members' channel) run concurrently.
+        # The members' channel holds one vote at a time: starting another
+        # application before this one is ended raises VoteInProgress.
 
         1. [S] Create thread
         2. [S] Delete thread creation message
@@ -121,199 +350,274 @@ class Actions:
         10. [M] Delete pin notification
 
         """
+        # Imported here, like the API client: offline actions need neither
+        import asyncio
+        from steps import Step, run_steps
+
+        config = self.app_config(app)
         applicant_ch, member_ch = \
-            self.config['APPLICANT_CHANNEL'], self.config['MEMBER_CHANNEL']
-        self.logging.info('Start application process')
+            config['APPLICANT_CHANNEL'], config['MEMBER_CHANNEL']
+        key = app_key(config['APPLICATION_LINK'])
+
+        # Purging the members' channel would delete another open vote
+        holder = self.journal.claim_vote(member_ch, key)
+        if holder != key:
+            raise VoteInProgress(member_ch, holder)
+
+        run = self.journal.open_run(key, 'start')
+        self.logging.info('Resume application process' if run.resumed else 'Start application process')
+
+        # The thread-created message is posted right after the thread, so its ID follows the thread's
+        thread = {}
+        creation_message = self.expect_message(applicant_ch, lambda message:
+            message['content'] == str(config['APPLICANT_NAME'])
+            and message['author']['id'] == config['OPERATOR_ID'], since=lambda: thread.get('id'))
         
         # 1. Create thread
-        res = self.cano.create_thread(applicant_ch, self.config['APPLICANT_NAME'])
-        thread_data = res.json()
-        app_thread_id = thread_data['id']
-        time.sleep(1)
-        self.logging.info('[SUCCESS] 1. Create thread')
+        async def create_thread(results):
+            res = await self.acano.create_thread(applicant_ch, config['APPLICANT_NAME'])
+            thread_data = res.json()
+            return thread_data['id']
 
         # 2. Delete creation message
-        res = self.cano.get_messages(applicant_ch) 
-        messages = res.json()
-
-        for message in messages:
-            if (message['content'] == str(self.config['APPLICANT_NAME'])) \
-                and (message['author']['id'] == self.config['OPERATOR_ID']):
-                self.cano.delete_message(applicant_ch, message['id'])
-                break
-        self.logging.info('[SUCCESS] 2. Delete creation message')
+        async def delete_creation_message(results):
+            thread['id'] = results['1']
+            message = await self.wait_for(creation_message, 'thread creation message')
+            if message:
+                await self.acano.delete_message(applicant_ch, message['id'])
 
         # 3. Send interview initiator
-        message_content = self.config['THREAD_M1'].replace('[APPLICANT_ID]', self.config['APPLICANT_ID']).replace('[PING_ROLE]', self.config['PING_ROLE'])
-        self.cano.send_message(app_thread_id, message_content, is_thread=True)
-        self.logging.info('[SUCCESS] 3. Send interview initiator')
+        async def send_interview_initiator(results):
+            message_content = config['THREAD_M1'].replace('[APPLICANT_ID]', config['APPLICANT_ID']).replace('[PING_ROLE]', config['PING_ROLE'])
+            await self.acano.send_message(results['1'], message_content, is_thread=True)
 
         # 4. Send reference link
-        message_content = self.config['THREAD_M2'].replace('[APPLICATION_LINK]', self.config['APPLICATION_LINK'])
-        self.cano.send_message(app_thread_id, message_content, is_thread=True)
-        self.logging.info('[SUCCESS] 4. Send reference link')
+        async def send_reference_link(results):
+            message_content = config['THREAD_M2'].replace('[APPLICATION_LINK]', config['APPLICATION_LINK'])
+            await self.acano.send_message(results['1'], message_content, is_thread=True)
 
         # 5. Unlock members' channel
-        self.cano.send_message(member_ch, '1unlock')
-        time.sleep(1)
-        self.logging.info('[SUCCESS] 5. Unlock members\' channel')
+        async def unlock_member_channel(results):
+            unlocked = await asyncio.to_thread(self.expect_channel_lock, member_ch, False)
+            await self.acano.send_message(member_ch, '1unlock')
+            await self.wait_for(unlocked, 'members\' channel unlock')
 
         # 6. Purge members' channel
-        self.cano.purge_channel(member_ch)
-        self.logging.info('[SUCCESS] 6. Purge members\' channel')
+        async def purge_member_channel(results):
+            report = await self.acano.purge_channel(member_ch)
+            self.logging.debug(f'[PURGE] {report}')
 
         # 7. Send app vote initiator
-        message_content = self.config['MEMBER_M1'] \
-            .replace('[PING_ROLE]', self.config['PING_ROLE']) \
-            .replace('[APPLICATION_LINK]', self.config['APPLICATION_LINK']) \
-            .replace('[GUILD]', self.config['GUILD']) \
-            .replace('[THREAD_ID]', app_thread_id) \
-            .replace(' ', '\n')
-        res = self.cano.send_message(member_ch, message_content)
-        message_data = res.json()
-        vote_message_id = message_data['id']
-        self.logging.info('[SUCCESS] 7. Send app vote initiator')
+        async def send_vote_initiator(results):
+            message_content = config['MEMBER_M1'] \
+                .replace('[PING_ROLE]', config['PING_ROLE']) \
+                .replace('[APPLICATION_LINK]', config['APPLICATION_LINK']) \
+                .replace('[GUILD]', config['GUILD']) \
+                .replace('[THREAD_ID]', results['1']) \
+                .replace(' ', '\n')
+            res = await self.acano.send_message(member_ch, message_content)
+            message_data = res.json()
+            return message_data['id']
 
         # 8. Add accept/deny reactions
-        self.cano.add_reaction(member_ch, vote_message_id, self.config['ACCEPT_EMOJI'])
-        self.cano.add_reaction(member_ch, vote_message_id, self.config['DENY_EMOJI'])
-        self.logging.info('[SUCCESS] 8. Add accept/deny reactions')
+        async def add_vote_reactions(results):
+            await self.acano.add_reaction(member_ch, results['7'], config['ACCEPT_EMOJI'])
+            await self.acano.add_reaction(member_ch, results['7'], config['DENY_EMOJI'])
 
         # 9. Pin message
-        self.cano.pin_message(member_ch, vote_message_id)
-        time.sleep(1)
-        self.logging.info('[SUCCESS] 9. Pin message')
+        async def pin_vote_message(results):
+            pin_notification = self.expect_message(member_ch, lambda message: message['type'] == 6,
+                                                   since=results['7'])
+            await self.acano.pin_message(member_ch, results['7'])
 
-        # 10. Delete pin notification
-        res = self.cano.get_messages(member_ch) 
-        messages = res.json()
+            message = await self.wait_for(pin_notification, 'pin notification')
+            return message['id'] if message else None
 
-        for message in messages:
-            if message['type'] == 6:
-                self.cano.delete_message(member_ch, message['id'])
-                break
-        self.logging.info('[SUCCESS] 10. Delete pin notification')
+        # 10. Delete pin notification
+        async def delete_pin_notification(results):
+            if results['9'] is not None:
+                await self.acano.delete_message(member_ch, results['9'])
+
+        steps = [
+            Step(1, 'Create thread', create_thread),
+            Step(2, 'Delete creation message', delete_creation_message, deps=[1]),
+            Step(3, 'Send interview initiator', send_interview_initiator, deps=[1]),
+            Step(4, 'Send reference link', send_reference_link, deps=[3]),
+            Step(5, 'Unlock members\' channel', unlock_member_channel, lock=member_ch),
+            Step(6, 'Purge members\' channel', purge_member_channel, deps=[5], lock=member_ch),
+            Step(7, 'Send app vote initiator', send_vote_initiator, deps=[1, 6], lock=member_ch),
+            Step(8, 'Add accept/deny reactions', add_vote_reactions, deps=[7], lock=member_ch),
+            Step(9, 'Pin message', pin_vote_message, deps=[7], lock=member_ch),
+            Step(10, 'Delete pin notification', delete_pin_notification, deps=[9], lock=member_ch),
+        ]
+        try:
+            results = await run_steps(steps, self.logging, locks=self.channel_lock, journal=run,
+                                      metrics=self.metrics, action='start_app')
+        except BaseException:
+            if not run.completed:
+                # Nothing was posted yet, so the members' channel stays free
+                self.journal.release_vote(member_ch, key)
+            raise
 
         self.logging.info('Successfully started application process')
-        self.config['APP_THREAD_ID'] = app_thread_id
-        self.config['VOTE_MESSAGE_ID'] = vote_message_id
+        config['APP_THREAD_ID'] = results['1']
+        config['VOTE_MESSAGE_ID'] = results['7']
 
-        with open(CONFIG_PATH, 'w') as file:
-            self.yaml.dump(self.config, file)
+        self.journal.save_state(key, config.maps[0])
+        run.finish()
         return None
 
     def end_app(self, app_result):
+        import asyncio
+        asyncio.run(self.end_app_async(app_result))
+        return None
+
+    async def end_app_async(self, app_result, app=None):
         """
         # End App
         # Description: End the previously initiated application.
+        # Thread steps (4, 6) run alongside the members' channel steps.
 
         1. Lock members' channel
-        2. Purge members' channel with bot command
+        2. Bulk purge members' channel (vote message is kept)
         3. Retrieve & pack application metadata 
         4. Retrieve & pack application thread message history
-        5. Manual iteration purge for exceptional messages
+        5. Purge remaining messages incl. vote message
         6. Lock & archive thread 
         7. Informing of channel locking & send public metadata
         8. Inform application result
 
         """
-        member_ch = self.config['MEMBER_CHANNEL']
-        app_meta = {}
+        import asyncio
+        from steps import Step, run_steps
+
+        config = self.app_config(app)
+        applicant_ch, member_ch = \
+            config['APPLICANT_CHANNEL'], config['MEMBER_CHANNEL']
+        key = app_key(config['APPLICATION_LINK'])
+        run = self.journal.open_run(key, 'end')
         
-        self.logging.info('Start application closing process')
+        self.logging.info('Resume application closing process' if run.resumed else 'Start application closing process')
 
         # 1. Lock members' channel
-        self.cano.send_message(member_ch, '1lock')
-        time.sleep(1)
-        self.logging.info('[SUCCESS] 1. Lock members\' channel')
-
-        # 2. Purge members' channel with bot command 
-        res = self.cano.get_messages(member_ch)
+        async def lock_member_channel(results):
+            locked = await asyncio.to_thread(self.expect_channel_lock, member_ch, True)
+            await self.acano.send_message(member_ch, '1lock')
+            await self.wait_for(locked, 'members\' channel lock')
 
-        while len(res.json()) > 10:
-            self.cano.send_message(member_ch, '2purge 1000')
-            time.sleep(1)
-            res = self.cano.get_messages(member_ch)
-        self.logging.info('[SUCCESS] 2.1. Command-based mass purge for discussion messages')
+        # 2. Bulk purge members' channel
+        async def bulk_purge(results):
+            report = await self.acano.purge_channel(member_ch, keep=[config['VOTE_MESSAGE_ID']])
+            self.logging.debug(f'[PURGE] {report}')
 
         # 3. Retrieve & pack application metadata
-        res = self.cano.get_messages(member_ch)
-        messages = res.json()
-        vote_message = messages[-1]
-
-        # applicant info
-        app_meta['applicant_name'] = self.config['APPLICANT_NAME']
-        app_meta['applicant_id'] = self.config['APPLICANT_ID']
-
-        # time elapsed
-        iso_stamp1 = vote_message['timestamp']
-        dt_obj = datetime.fromisoformat(iso_stamp1)
-        app_meta['start_date'] = str(dt_obj.date())
-
-        dt_stamp1 = datetime.fromisoformat(iso_stamp1)
-        dt_stamp1 = dt_stamp1.replace(tzinfo=timezone.utc)
-        dt_stamp2 = datetime.now(timezone.utc)
-        app_meta['time_elapsed'] = format_timedelta(dt_stamp2 - dt_stamp1)
-
-        # votes
-        res = self.cano.get_reaction_info(member_ch, self.config['VOTE_MESSAGE_ID'], self.config['ACCEPT_EMOJI'])
-        app_meta['accept_votes'] = len(res.json())
-        res = self.cano.get_reaction_info(member_ch, self.config['VOTE_MESSAGE_ID'], self.config['DENY_EMOJI'])
-        app_meta['deny_votes'] = len(res.json())
-
-        # result
-        app_meta['app_result'] = app_result
-        decision, mtype = app_result.split('-')
-        app_meta['result_message'] = self.result_opt[decision][mtype]
-
-        # misc
-        app_meta['application_link'] = self.config['APPLICATION_LINK']
-        app_meta['operator_id'] = self.config['OPERATOR_ID']
-
-        # app_meta_string = json.dumps(app_meta, indent=4)
-        # app_meta_bytesio = io.BytesIO(app_meta_string.encode())
-        app_meta_name = '{}_{}_{}.json'\
-                        .format(self.config['FILE_PREFIX'], app_meta["start_date"], app_meta["applicant_id"])
-        with open(os.path.join(self.config['META_PATH'], app_meta_name), 'w') as file:
-            json.dump(app_meta, file, indent=4)
-
-        self.logging.info('[SUCCESS] 3. Retrieve & pack application metadata')
+        async def pack_metadata(results):
+            app_meta = {}
+
+            # Vote counts come from the vote message's own reactions array
+            vote_message = await self.acano.get_message(member_ch, config['VOTE_MESSAGE_ID'])
+
+            # applicant info
+            app_meta['applicant_name'] = config['APPLICANT_NAME']
+            app_meta['applicant_id'] = config['APPLICANT_ID']
+
+            # time elapsed
+            iso_stamp1 = vote_message['timestamp']
+            dt_obj = datetime.fromisoformat(iso_stamp1)
+            app_meta['start_date'] = str(dt_obj.date())
+
+            dt_stamp1 = datetime.fromisoformat(iso_stamp1)
+            dt_stamp1 = dt_stamp1.replace(tzinfo=timezone.utc)
+            dt_stamp2 = datetime.now(timezone.utc)
+            app_meta['time_elapsed'] = format_timedelta(dt_stamp2 - dt_stamp1)
+            app_meta['time_elapsed_s'] = int((dt_stamp2 - dt_stamp1).total_seconds())
+
+            # votes
+            votes = tally_votes(vote_message, [config['ACCEPT_EMOJI'], config['DENY_EMOJI']])
+            app_meta['accept_votes'] = votes[config['ACCEPT_EMOJI']]
+            app_meta['deny_votes'] = votes[config['DENY_EMOJI']]
+
+            # result
+            app_meta['app_result'] = app_result
+            decision, mtype = app_result.split('-')
+            app_meta['result_message'] = self.result_opt[decision][mtype]
+
+            # misc
+            app_meta['application_link'] = config['APPLICATION_LINK']
+            app_meta['operator_id'] = config['OPERATOR_ID']
+
+            # Kept in the archive; the public copy is uploaded straight from memory
+            app_meta_name = '{}_{}_{}.json'\
+                            .format(config['FILE_PREFIX'], app_meta["start_date"], app_meta["applicant_id"])
+            await asyncio.to_thread(self.meta_store.append, app_meta)
+
+            return {
+                'app_meta': app_meta,
+                'app_meta_name': app_meta_name
+            }
 
         # 4. Retrieve & pack application thread message history
-
-        self.logging.info('[SUCCESS] 4. Retrieve & pack application thread message history')
-
-        # 5. Manual iteration purge for exceptional messages
-        
-        for message in messages:
-            self.cano.delete_message(member_ch, message['id'])
-        self.logging.info('[SUCCESS] 5. Manual iteration purge for exceptional messages')
+        async def pack_thread_history(results):
+            mirror = None
+            # CDN downloads are not in cassettes, so a replay skips them
+            if config.get('MIRROR_ATTACHMENTS', True) and self._cassette_options[1] is None:
+                from mirror import AttachmentMirror
+                mirror = AttachmentMirror(self.cano.session, config.get('ATTACHMENTS_PATH') or 'archive/attachments',
+                                          max_workers=config.get('MIRROR_WORKERS', 4), logging=self.logging)
+            archiver = ThreadArchiver(self.cano, config['CONVERS_PATH'], mirror=mirror)
+            convers_name = '{}_{}_{}.jsonl'\
+                           .format(config['FILE_PREFIX'], config['APPLICANT_ID'], config['APP_THREAD_ID'])
+            path, count = await asyncio.to_thread(archiver.archive, config['APP_THREAD_ID'], convers_name)
+            self.logging.debug(f'[ARCHIVE] {count} messages written to {path}')
+            if archiver.mirror_report is not None:
+                self.logging.debug(f'[MIRROR] {archiver.mirror_report}')
+            return path
+
+        # 5. Purge remaining messages incl. vote message
+        async def final_purge(results):
+            report = await self.acano.purge_channel(member_ch)
+            self.logging.debug(f'[PURGE] {report}')
 
         # 6. Lock & archive thread 
-        message_content = self.config['THREAD_MLOCK']
-        self.cano.send_message(self.config['APP_THREAD_ID'], message_content, is_thread=True)
-        self.cano.update_thread(self.config['APP_THREAD_ID'], updates={'locked': True, 'archived': True})
-        self.logging.info('[SUCCESS] 6. Lock & archive thread')
+        async def lock_thread(results):
+            message_content = config['THREAD_MLOCK']
+            await self.acano.send_message(config['APP_THREAD_ID'], message_content, is_thread=True)
+            await self.acano.update_thread(config['APP_THREAD_ID'], updates={'locked': True, 'archived': True})
 
         # 7. Inform of channel locking & send public metadata
-        lock_message = self.config['MEMBER_MLOCK'] \
-                           .replace('[APPLICANT_NAME]', str(app_meta['applicant_name'])) \
-                           .replace('[ACCEPT_VOTES]', str(app_meta['accept_votes'])) \
-                           .replace('[DENY_VOTES]', str(app_meta['deny_votes'])) \
-                           .replace('[APP_RESULT]', app_meta['app_result'])
-        self.cano.send_message(member_ch, message_content=lock_message)
-        self.cano.send_message(member_ch, message_content=self.config['MEMBER_MMETA'], files=[(app_meta_name, os.path.join(self.config['META_PATH'], app_meta_name))])
-
-        self.logging.info('[SUCCESS] 7. Inform of channel locking & send public metadata')
+        async def send_public_metadata(results):
+            app_meta, app_meta_name = results['3']['app_meta'], results['3']['app_meta_name']
+            lock_message = config['MEMBER_MLOCK'] \
+                               .replace('[APPLICANT_NAME]', str(app_meta['applicant_name'])) \
+                               .replace('[ACCEPT_VOTES]', str(app_meta['accept_votes'])) \
+                               .replace('[DENY_VOTES]', str(app_meta['deny_votes'])) \
+                               .replace('[APP_RESULT]', app_meta['app_result'])
+            await self.acano.send_message(member_ch, message_content=lock_message)
+            app_meta_file = Attachment(app_meta_name, json.dumps(app_meta, indent=4).encode())
+            await self.acano.send_message(member_ch, message_content=config['MEMBER_MMETA'], files=[app_meta_file])
 
         # 8. Inform application result
-        self.send_result(app_result)
-        self.logging.info('[SUCCESS] 8. Inform application result')
+        async def inform_result(results):
+            await asyncio.to_thread(self.send_result, app_result, app)
+
+        await run_steps([
+            Step(1, 'Lock members\' channel', lock_member_channel, lock=member_ch),
+            Step(2, 'Bulk purge for discussion messages', bulk_purge, deps=[1], lock=member_ch),
+            Step(3, 'Retrieve & pack application metadata', pack_metadata, deps=[2], lock=member_ch),
+            Step(4, 'Retrieve & pack application thread message history', pack_thread_history),
+            Step(5, 'Purge remaining messages incl. vote message', final_purge, deps=[3], lock=member_ch),
+            Step(6, 'Lock & archive thread', lock_thread, deps=[4]),
+            Step(7, 'Inform of channel locking & send public metadata', send_public_metadata, deps=[5], lock=member_ch),
+            # The result is irreversible: only sent once the vote is counted & closed
+            Step(8, 'Inform application result', inform_result, deps=[6, 7], lock=applicant_ch),
+        ], self.logging, locks=self.channel_lock, journal=run, metrics=self.metrics, action='end_app')
 
         self.logging.info('Successfully closed application')
+        run.finish()
+        self.journal.release_vote(member_ch, key)
         return None
 
-    def send_result(self, app_result):
+    def send_result(self, app_result, app=None):
         """
         # Send result
         # Description: Send an application result to the applicant.
@@ -322,7 +626,8 @@ class Actions:
         2. Delete result creation message
 
         """
-        applicant_ch = self.config['APPLICANT_CHANNEL']
+        config = self.app_config(app)
+        applicant_ch = config['APPLICANT_CHANNEL']
         app_result = app_result.split('-')
         format = {
             'accept': '#9fec97 Accepted',
@@ -335,43 +640,182 @@ class Actions:
 
         decision, mtype = app_result
         message_header = '2embed {}|<@{}> [{}]'\
-                         .format(format[decision], self.config["APPLICANT_ID"], str(self.config["APPLICANT_NAME"]))
+                         .format(format[decision], config["APPLICANT_ID"], str(config["APPLICANT_NAME"]))
         app_response = self.result_opt[decision][mtype]
 
         message_content = f'{message_header} {app_response}'
-        self.cano.send_message(applicant_ch, message_content)
-        time.sleep(1)
+        # The bot's embed, not any message (e.g. by the applicant) posted after the command
+        sent, early, lock = {}, [], threading.Lock()
+
+        def is_reply(message):
+            return (int(message['id']) > int(sent['id'])
+                    and message['author'].get('bot') and bool(message.get('embeds')))
+
+        def match(message):
+            # Events arriving before the command's ID is known are judged once it is
+            with lock:
+                if 'id' not in sent:
+                    early.append(message)
+                    return False
+            return is_reply(message)
+
+        bot_reply = self.expect_message(applicant_ch, match, since=lambda: sent.get('id'))
+
+        res = self.cano.send_message(applicant_ch, message_content)
+        with lock:
+            sent['id'] = res.json()['id']
+            reply = next((message for message in early if is_reply(message)), None)
+        if reply is not None:
+            bot_reply.cancel()
+        elif not bot_reply.wait():
+            self.logging.warning('Timed out waiting for result embed')
         self.logging.info('[SUCCESS] 1. Send application result message')
 
         # 2. Delete result creation message 
-        res = self.cano.get_messages(applicant_ch)
-        messages = res.json()
-
-        for message in messages:
-            if message['author']['id'] == self.config['OPERATOR_ID']:
-                self.cano.delete_message(applicant_ch, message['id'])
-                break
+        self.cano.delete_message(applicant_ch, sent['id'])
         self.logging.info('[SUCCESS] 2. Delete result creation message')
         
         self.logging.info('Successfully sent result')
         return None
 
+    def vote_series(self, app=None):
+        config = self.app_config(app)
+        if not config.get('VOTE_MESSAGE_ID'):
+            raise NoVoteRecorded(f"No vote recorded for application {app_key(config['APPLICATION_LINK'])}; "
+                                 f"start it first (-act start)")
+        return VoteSeries(config.get('VOTE_SERIES_PATH') or 'archive/votes', config['VOTE_MESSAGE_ID'],
+                          [config['ACCEPT_EMOJI'], config['DENY_EMOJI']])
+
+    def watch_votes(self, duration=None, app=None):
+        """
+        Record the vote tally as it changes, until the vote message is gone
+        or `duration` seconds have passed.
+        """
+        config = self.app_config(app)
+        series = self.vote_series(app)
+        watcher = VoteWatcher(self.cano, series, config['MEMBER_CHANNEL'], config['VOTE_MESSAGE_ID'],
+                              hub=self.hub, poll_interval=config.get('VOTE_POLL_INTERVAL', 30.0), logging=self.logging)
+
+        self.logging.info(f'Watching votes on {config["VOTE_MESSAGE_ID"]}')
+        try:
+            watcher.run(duration)
+        except KeyboardInterrupt:
+            pass
+        self.logging.info(f'Stopped watching votes: {format_tally(series)}')
+        return None
+
+    def tally(self, history=False, app=None):
+        """
+        Last recorded vote tally, read from the local series only.
+        """
+        series = self.vote_series(app)
+        if not history:
+            return format_tally(series)
+
+        lines = []
+        for at_ms, counts in series.history():
+            when = datetime.fromtimestamp(at_ms / 1000, tz=timezone.utc).isoformat()
+            lines.append(f"{when} {' '.join(str(count) for count in counts)}")
+        return '\n'.join(lines)
+
+    def query(self, applicant=None, since=None, until=None, decision=None, min_accept=None, min_deny=None):
+        """
+        # Query
+        # Description: Look up past applications in the archive.
+
+        """
+        records = self.meta_store.query(applicant=applicant, since=since, until=until, decision=decision,
+                                        min_accept=min_accept, min_deny=min_deny)
+
+        for record in records:
+            print(json.dumps(record))
+        self.logging.info(f'Found {len(records)} matching applications')
+        return records
+
+    def stats(self):
+        """
+        # Stats
+        # Description: Aggregate recruitment statistics over the archive.
+
+        """
+        # numpy is only needed here, so it is imported on demand
+        from stats import compute_stats, format_report, load_columns
+
+        result_types = [f'{decision}-{mtype}'
+                        for decision in self.result_opt for mtype in self.result_opt[decision]]
+        report = compute_stats(load_columns(self.meta_store), result_types)
+
+        print(format_report(report))
+        return report
+
 def main(opt):
 
-    act = Actions(opt.debug)
+    if opt.action == 'shards':
+        # Each guild gets its own Actions in a worker process
+        from shard import load_profiles, run_shards
+        summaries = run_shards(load_profiles(opt.guilds_file), CONFIG_PATH, processes=opt.processes,
+                               max_concurrent=opt.max_concurrent, debug=opt.debug, logging=create_log(opt.debug))
+        print(json.dumps(summaries, indent=4))
+        return None
+
+    # With -applicant, start/end/result_only find the application in the local index
+    by_applicant = opt.applicant is not None and opt.action in ('start', 'end', 'result_only')
+    act = Actions(opt.debug, resolve_applicant=not by_applicant and opt.action not in
+                  ('queue', 'query', 'stats', 'watch', 'tally', 'daemon'),
+                  record=opt.record, replay=opt.replay, replay_scale=opt.replay_scale)
+    if by_applicant:
+        act.use_application(opt.applicant, started=opt.action != 'start')
 
     if opt.action == 'start':
-        act.start_app()
+        try:
+            act.start_app()
+        except VoteInProgress as error:
+            act.logging.error(f'[FAILED] {error}')
+            return 1
 
     elif opt.action == 'end':
         act.end_app(opt.app_result)
     
     elif opt.action == 'result_only':
         act.send_result(opt.app_result)
+
+    elif opt.action == 'query':
+        act.query(applicant=opt.applicant, since=opt.since, until=opt.until, decision=opt.decision,
+                  min_accept=opt.min_accept, min_deny=opt.min_deny)
+
+    elif opt.action == 'stats':
+        act.stats()
+
+    elif opt.action in ('watch', 'tally'):
+        try:
+            if opt.action == 'watch':
+                act.watch_votes(duration=opt.duration)
+            else:
+                print(act.tally(history=opt.history))
+        except NoVoteRecorded as error:
+            act.logging.error(f'[FAILED] {error}')
+            return 1
+
+    elif opt.action == 'queue':
+        import asyncio
+        from pipeline import Pipeline, load_queue
+        pipeline = Pipeline(act, max_concurrent=opt.max_concurrent)
+        asyncio.run(pipeline.run(load_queue(opt.queue_file)))
+
+    elif opt.action == 'daemon':
+        import asyncio
+        from daemon import Daemon
+        asyncio.run(Daemon(act, socket_path=opt.socket_path).serve())
     
     else:
         raise AttributeError('Invalid action')
+
+    act.metrics.write(prometheus_path=opt.metrics_out, trace_path=opt.trace_out)
+    if act.cassette is not None:
+        act.cassette.close()
+    if opt.profile_startup:
+        print(act.startup.report(act.metrics))
     
 if __name__ == "__main__":
     opt = parse_option()
-    main(opt)
+    sys.exit(main(opt))
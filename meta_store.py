@@ -0,0 +1,168 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    applicant_id TEXT,
+    applicant_name TEXT COLLATE NOCASE,
+    start_date TEXT,
+    app_result TEXT,
+    accept_votes INTEGER,
+    deny_votes INTEGER,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_applicant_id ON records (applicant_id);
+CREATE INDEX IF NOT EXISTS records_applicant_name ON records (applicant_name);
+CREATE INDEX IF NOT EXISTS records_start_date ON records (start_date);
+CREATE INDEX IF NOT EXISTS records_app_result ON records (app_result);
+CREATE INDEX IF NOT EXISTS records_accept_votes ON records (accept_votes);
+CREATE INDEX IF NOT EXISTS records_deny_votes ON records (deny_votes);
+"""
+
+# Preset dictionary: individual records are small, so prime zlib with the
+# keys and values every record shares
+ZDICT = (b'"application_link": "https://discord.com/channels/", "operator_id": '
+         b'"result_message": "", "app_result": "accept-default", "deny-default", "reject-default", '
+         b'"accept_votes": , "deny_votes": , "time_elapsed": "d h m s", "time_elapsed_s": '
+         b'"start_date": "20", "applicant_id": "", "applicant_name": "')
+
+SEGMENT_SIZE = 4 * 1024 * 1024
+
+INDEXED = ('applicant_id', 'applicant_name', 'start_date', 'app_result', 'accept_votes', 'deny_votes')
+
+def compress(record):
+    compressor = zlib.compressobj(level=9, zdict=ZDICT)
+    return compressor.compress(json.dumps(record).encode()) + compressor.flush()
+
+def decompress(blob):
+    decompressor = zlib.decompressobj(zdict=ZDICT)
+    return json.loads(decompressor.decompress(blob) + decompressor.flush())
+
+class MetaStore:
+    """
+    Append-only archive of application metadata. Records are compressed
+    individually into size-capped segment files under `root`; a SQLite
+    index on applicant, date, result and votes points at their offsets.
+    """
+
+    def __init__(self, root, segment_size=SEGMENT_SIZE):
+        self.root = root
+        self.segment_dir = os.path.join(root, 'segments')
+        self.segment_size = segment_size
+        os.makedirs(self.segment_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite3'), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+        if self.count() == 0:
+            self.import_legacy()
+
+    def segment_path(self, segment):
+        return os.path.join(self.segment_dir, f'seg_{segment:05d}.bin')
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def _current_segment(self):
+        row = self.conn.execute('SELECT MAX(segment) FROM records').fetchone()
+        segment = row[0] or 1
+        if os.path.exists(self.segment_path(segment)) \
+            and os.path.getsize(self.segment_path(segment)) >= self.segment_size:
+            segment += 1
+        return segment
+
+    def append(self, record):
+        blob = compress(record)
+
+        with self._lock:
+            segment = self._current_segment()
+            with open(self.segment_path(segment), 'ab') as file:
+                offset = file.tell()
+                file.write(blob)
+                file.flush()
+                os.fsync(file.fileno())
+
+            with self.conn:
+                self.conn.execute(f'INSERT INTO records ({", ".join(INDEXED)}, segment, offset, length) '
+                                  f'VALUES ({", ".join("?" * len(INDEXED))}, ?, ?, ?)',
+                                  (*(record.get(key) for key in INDEXED), segment, offset, len(blob)))
+        return None
+
+    def import_legacy(self):
+        """
+        Pull in the one-file-per-application JSON metadata written by older versions.
+        """
+        paths = sorted(glob.glob(os.path.join(self.root, '*.json')))
+        for path in paths:
+            with open(path, 'r') as file:
+                self.append(json.load(file))
+        return len(paths)
+
+    def read(self, segment, offset, length):
+        with open(self.segment_path(segment), 'rb') as file:
+            file.seek(offset)
+            return decompress(file.read(length))
+
+    def query(self, applicant=None, since=None, until=None, decision=None, min_accept=None, min_deny=None,
+              limit=None):
+        """
+        Records matching every given filter, oldest first. `applicant` matches
+        an applicant ID or (case-insensitively) a name; dates are YYYY-MM-DD;
+        `min_accept` / `min_deny` are lower bounds on the vote counts.
+        """
+        clauses, params = [], []
+        if applicant is not None:
+            clauses.append('(applicant_id = ? OR applicant_name = ?)')
+            params += [str(applicant), str(applicant)]
+        if since is not None:
+            clauses.append('start_date >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('start_date <= ?')
+            params.append(until)
+        if decision is not None:
+            clauses.append('app_result LIKE ?')
+            params.append(f'{decision}-%')
+        if min_accept is not None:
+            clauses.append('accept_votes >= ?')
+            params.append(int(min_accept))
+        if min_deny is not None:
+            clauses.append('deny_votes >= ?')
+            params.append(int(min_deny))
+
+        sql = 'SELECT segment, offset, length FROM records'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY start_date, id'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+
+        return [self.read(*row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def scan(self, start=0):
+        """
+        Every record from the `start`-th on, segment by segment, in append order.
+        """
+        rows = self.conn.execute('SELECT segment, offset, length FROM records ORDER BY segment, offset '
+                                 'LIMIT -1 OFFSET ?', (start,)).fetchall()
+        handles = {}
+        try:
+            for segment, offset, length in rows:
+                if segment not in handles:
+                    handles[segment] = open(self.segment_path(segment), 'rb')
+                handles[segment].seek(offset)
+                yield decompress(handles[segment].read(length))
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def close(self):
+        self.conn.close()
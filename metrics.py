@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STEP_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Metrics:
+    """
+    Collects per-request timings from Canopy and per-step spans from
+    run_steps. Exportable as Prometheus text or a Chrome/Perfetto trace.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.requests = []
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self.clock() - self.origin
+
+    def record_request(self, method, route, status, start, latency, retries, rate_limit_wait):
+        with self._lock:
+            self.requests.append({
+                'method': method,
+                'route': route,
+                'status': status,
+                'start': start,
+                'latency_s': latency,
+                'retries': retries,
+                'rate_limit_wait_s': rate_limit_wait,
+                'thread': threading.get_ident()
+            })
+
+    def record_span(self, action, step, description, start, duration, skipped=False):
+        with self._lock:
+            self.spans.append({
+                'action': action,
+                'step': step,
+                'description': description,
+                'start': start,
+                'duration_s': duration,
+                'skipped': skipped
+            })
+
+    # Export
+
+    def prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(**values):
+            return '{' + ','.join(f'{key}="{value}"' for key, value in values.items()) + '}'
+
+        def histogram(name, buckets, values, **series):
+            for bound in buckets:
+                count = sum(1 for value in values if value <= bound)
+                lines.append(f'{name}_bucket{labels(**series, le=bound)} {count}')
+            lines.append(f'{name}_bucket{labels(**series, le="+Inf")} {len(values)}')
+            lines.append(f'{name}_sum{labels(**series)} {sum(values):.6f}')
+            lines.append(f'{name}_count{labels(**series)} {len(values)}')
+
+        with self._lock:
+            requests, spans = list(self.requests), list(self.spans)
+
+        by_route = {}
+        for request in requests:
+            by_route.setdefault(request['route'], []).append(request)
+
+        metric('discord_requests_total', 'counter', 'Requests sent per route and final status')
+        counts = {}
+        for request in requests:
+            key = (request['route'], request['status'])
+            counts[key] = counts.get(key, 0) + 1
+        for (route, status), count in sorted(counts.items()):
+            lines.append(f'discord_requests_total{labels(route=route, status=status)} {count}')
+
+        metric('discord_request_latency_seconds', 'histogram', 'Time on the wire per request, retries included')
+        for route, entries in sorted(by_route.items()):
+            histogram('discord_request_latency_seconds', LATENCY_BUCKETS,
+                      [entry['latency_s'] for entry in entries], route=route)
+
+        metric('discord_request_retries_total', 'counter', 'Retries after 429 responses per route')
+        for route, entries in sorted(by_route.items()):
+            lines.append(f'discord_request_retries_total{labels(route=route)} {sum(entry["retries"] for entry in entries)}')
+
+        metric('discord_rate_limit_wait_seconds_total', 'counter', 'Time spent waiting on rate-limit buckets per route')
+        for route, entries in sorted(by_route.items()):
+            waited = sum(entry['rate_limit_wait_s'] for entry in entries)
+            lines.append(f'discord_rate_limit_wait_seconds_total{labels(route=route)} {waited:.6f}')
+
+        # Queues & the daemon run the same steps many times: one series per step
+        by_step = {}
+        for span in spans:
+            if not span['skipped']:
+                by_step.setdefault((span['action'], span['step']), []).append(span['duration_s'])
+
+        metric('action_step_duration_seconds', 'histogram', 'Duration of each action step, over every run')
+        for (action, step), durations in sorted(by_step.items(), key=lambda item: (item[0][0], int(item[0][1]))):
+            histogram('action_step_duration_seconds', STEP_BUCKETS, durations, action=action, step=step)
+
+        return '\n'.join(lines) + '\n'
+
+    def trace(self):
+        """
+        Chrome trace event format: steps on one track each, requests on the
+        worker thread that sent them.
+        """
+        with self._lock:
+            requests, spans = list(self.requests), list(self.spans)
+
+        events = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'steps'}},
+            {'name': 'process_name', 'ph': 'M', 'pid': 2, 'args': {'name': 'requests'}},
+        ]
+
+        tracks = {}
+        for span in spans:
+            track = tracks.setdefault((span['action'], span['step']), len(tracks) + 1)
+            events.append({
+                'name': f"{span['step']}. {span['description']}",
+                'cat': span['action'], 'ph': 'X', 'pid': 1, 'tid': track,
+                'ts': span['start'] * 1e6, 'dur': span['duration_s'] * 1e6,
+                'args': {'skipped': span['skipped']}
+            })
+
+        for request in requests:
+            events.append({
+                'name': f"{request['method']} {request['route']}",
+                'cat': 'http', 'ph': 'X', 'pid': 2, 'tid': request['thread'],
+                'ts': request['start'] * 1e6, 'dur': (request['latency_s'] + request['rate_limit_wait_s']) * 1e6,
+                'args': {key: request[key] for key in ('status', 'retries', 'rate_limit_wait_s')}
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, prometheus_path=None, trace_path=None):
+        for path, content in ((prometheus_path, self.prometheus), (trace_path, lambda: json.dumps(self.trace()))):
+            if path is None:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(content())
+
+class StartupProfile:
+    """
+    Time from launch to each start-up phase, and to the first API request.
+    """
+
+    def __init__(self, launched, clock=time.perf_counter):
+        self.launched = launched
+        self.clock = clock
+        self.phases = []
+        self._last = launched
+
+    def mark(self, phase):
+        now = self.clock()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, metrics=None):
+        lines = [f'{phase:<24} {seconds * 1000:>8.1f} ms' for phase, seconds in self.phases]
+        lines.append(f"{'ready':<24} {(self._last - self.launched) * 1000:>8.1f} ms after launch")
+
+        if metrics is not None and metrics.requests:
+            first = metrics.origin + min(request['start'] for request in metrics.requests)
+            lines.append(f"{'first request':<24} {(first - self.launched) * 1000:>8.1f} ms after launch")
+        return '\n'.join(lines)
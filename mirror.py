@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 256 * 1024
+
+class MirrorReport:
+    def __init__(self):
+        self.downloaded = 0
+        self.deduplicated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def __str__(self):
+        return (f'{self.downloaded} downloaded ({self.bytes} bytes), {self.deduplicated} already stored, '
+                f'{self.skipped} already mirrored, {self.failed} failed')
+
+class AttachmentMirror:
+    """
+    Downloads message attachments into a content-addressed store:
+    `root/<sha256[:2]>/<sha256>`, so an image posted twice is kept once.
+    Files are streamed to disk while hashed, `max_workers` at a time.
+
+    Each archive gets a manifest (`<archive>.attachments.jsonl`) mapping
+    attachment IDs to their stored hash; attachments already in it are
+    not downloaded again.
+    """
+
+    def __init__(self, session, root, max_workers=4, logging=None):
+        self.session = session
+        self.root = root
+        self.max_workers = max_workers
+        self.logging = logging
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def download(self, url):
+        """
+        Stream `url` into the store. Returns (sha256, size, newly stored).
+        """
+        temp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, f'{os.getpid()}_{threading.get_ident()}.part')
+
+        digest, size = hashlib.sha256(), 0
+        try:
+            with self.session.get(url, stream=True, timeout=60) as res:
+                res.raise_for_status()
+                with open(temp_path, 'wb') as file:
+                    for chunk in res.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        file.write(chunk)
+                        size += len(chunk)
+
+            digest = digest.hexdigest()
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                return digest, size, False
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            return digest, size, True
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load_manifest(self, manifest_path):
+        mirrored = set()
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        mirrored.add(json.loads(line)['attachment_id'])
+                    except ValueError:
+                        # Partially written last line
+                        continue
+        return mirrored
+
+    def mirror(self, messages, manifest_path):
+        """
+        Mirror the attachments of `messages` (any iterable, consumed as
+        downloads are queued) and record them in `manifest_path`.
+        """
+        report = MirrorReport()
+        mirrored = self.load_manifest(manifest_path)
+        lock = threading.Lock()
+
+        with open(manifest_path, 'a', encoding='utf-8') as manifest:
+
+            def fetch(message, attachment):
+                try:
+                    digest, size, stored = self.download(attachment['url'])
+                except Exception as error:
+                    if self.logging is not None:
+                        self.logging.warning(f"[MIRROR] {attachment.get('filename')} ({attachment['id']}): {error!r}")
+                    with lock:
+                        report.failed += 1
+                    return
+
+                entry = {
+                    'attachment_id': attachment['id'],
+                    'message_id': message['id'],
+                    'filename': attachment.get('filename'),
+                    'size': size,
+                    'sha256': digest
+                }
+                with lock:
+                    manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                    manifest.flush()
+                    if stored:
+                        report.downloaded += 1
+                        report.bytes += size
+                    else:
+                        report.deduplicated += 1
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for message in messages:
+                    for attachment in message.get('attachments') or []:
+                        if attachment['id'] in mirrored or not attachment.get('url'):
+                            report.skipped += 1
+                            continue
+                        mirrored.add(attachment['id'])
+                        pool.submit(fetch, message, attachment)
+
+        return report
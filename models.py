@@ -0,0 +1,108 @@
+import json
+
+from snowflake import timestamp_ms, to_datetime
+from votes import emoji_matches
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def dumps_line(obj):
+    """
+    One JSONL line as UTF-8 bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+# Author fields kept without keep_raw
+AUTHOR_FIELDS = ('id', 'username', 'global_name', 'bot')
+
+class Reaction:
+    __slots__ = ('emoji_name', 'emoji_id', 'count', 'me')
+
+    def __init__(self, raw):
+        emoji = raw.get('emoji') or {}
+        self.emoji_name = emoji.get('name')
+        self.emoji_id = emoji.get('id')
+        self.count = raw.get('count', 0)
+        self.me = raw.get('me', False)
+
+    def matches(self, reaction):
+        return emoji_matches({'name': self.emoji_name, 'id': self.emoji_id}, reaction)
+
+    def __repr__(self):
+        return f'Reaction({self.emoji_name!r}, count={self.count})'
+
+class Message:
+    """
+    A message as decoded from the API, its commonly used fields held in
+    slots. With `keep_raw` the decoded payload stays available as `raw`
+    (e.g. for archiving); without it, only the slotted fields are kept and
+    the rest of the payload is freed with the page. Item access
+    (`message['author']['id']`) works as on the plain dict, for the
+    slotted fields at least.
+    """
+
+    __slots__ = ('id', 'channel_id', 'type', 'content', 'author', 'attachments', 'embeds', 'pinned',
+                 'reactions', 'raw')
+
+    # Readable as items without `raw`; reactions only as Reaction objects
+    FIELDS = frozenset(__slots__) - {'raw', 'reactions'}
+
+    def __init__(self, raw, keep_raw=True):
+        self.id = raw['id']
+        self.channel_id = raw.get('channel_id')
+        self.type = raw.get('type', 0)
+        self.content = raw.get('content') or ''
+        self.author = raw.get('author') or {}
+        if not keep_raw:
+            self.author = {key: self.author[key] for key in AUTHOR_FIELDS if key in self.author}
+        self.attachments = raw.get('attachments') or []
+        self.embeds = raw.get('embeds') or []
+        self.pinned = raw.get('pinned', False)
+        self.reactions = tuple(Reaction(reaction) for reaction in raw.get('reactions') or ())
+        self.raw = raw if keep_raw else None
+
+    @classmethod
+    def page(cls, data, keep_raw=True):
+        """
+        Messages of one response body, decoded in a single pass.
+        """
+        return [cls(raw, keep_raw) for raw in loads(data)]
+
+    @property
+    def author_id(self):
+        return self.author['id']
+
+    @property
+    def created_ms(self):
+        return timestamp_ms(self.id)
+
+    @property
+    def created_at(self):
+        return to_datetime(self.id)
+
+    # Plain-dict access
+
+    def __getitem__(self, key):
+        if self.raw is not None:
+            return self.raw[key]
+        if key not in self.FIELDS:
+            raise KeyError(f'{key!r} (not kept without keep_raw)')
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.raw if self.raw is not None else key in self.FIELDS
+
+    def get(self, key, default=None):
+        if self.raw is not None:
+            return self.raw.get(key, default)
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __repr__(self):
+        return f'Message({self.id}, type={self.type})'
@@ -0,0 +1,160 @@
+"""
+Queue file format, one entry per line ('#' starts a comment):
+
+start  <application_link> <applicant name>
+end    <application_link> <result>
+result <application_link> <result> [applicant name]
+"""
+
+import asyncio
+
+from utils import app_key
+
+ACTIONS = ('start', 'end', 'result')
+
+class QueueEntry:
+    def __init__(self, action, application_link, argument, line_no):
+        self.action = action
+        self.application_link = application_link
+        self.argument = argument
+        self.line_no = line_no
+
+    @property
+    def app_key(self):
+        return app_key(self.application_link)
+
+    def __repr__(self):
+        return f'{self.action} {self.application_link} {self.argument}'
+
+def load_queue(path):
+    entries = []
+    with open(path, 'r') as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+
+            parts = line.split(maxsplit=2)
+            if len(parts) < 3 or parts[0] not in ACTIONS:
+                raise ValueError(f'{path}:{line_no}: expected "<{"|".join(ACTIONS)}> <link> <argument>"')
+            entries.append(QueueEntry(parts[0], parts[1], parts[2], line_no))
+
+    return entries
+
+class Pipeline:
+    """
+    Runs queued start/end/result entries. Entries of one application run in
+    file order; different applications run concurrently, sharing the
+    Canopy (and so its rate limiter) of `act`. Application state lives in
+    the journal of `act`.
+
+    The members' channel holds one vote at a time, so a `start` waits while
+    another application's vote is open there and its `end` is still queued;
+    if that `end` is not queued, the `start` fails with VoteInProgress.
+    """
+
+    def __init__(self, act, max_concurrent=4):
+        self.act = act
+        self.max_concurrent = max_concurrent
+        self._semaphore = None
+        self._pending_ends = {}
+        self._vote_released = None
+
+    async def run(self, entries):
+        per_app = {}
+        for entry in entries:
+            per_app.setdefault(entry.app_key, []).append(entry)
+            if entry.action == 'end':
+                self._pending_ends[entry.app_key] = self._pending_ends.get(entry.app_key, 0) + 1
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        outcomes = await asyncio.gather(*(self.run_app(key, app_entries) for key, app_entries in per_app.items()))
+
+        failed = [key for key, ok in zip(per_app, outcomes) if not ok]
+        self.act.logging.info(f'Processed {len(per_app) - len(failed)}/{len(per_app)} applications')
+        return failed
+
+    async def run_app(self, app_key, entries):
+        state = self.act.journal.load_state(app_key)
+
+        try:
+            for entry in entries:
+                state['APPLICATION_LINK'] = entry.application_link
+                try:
+                    if entry.action == 'start':
+                        await self.wait_for_vote(app_key, state)
+
+                    self.act.logging.info(f'[QUEUE] {app_key}: {entry.action}')
+                    if self._semaphore is None:
+                        await self.run_entry(entry, state)
+                    else:
+                        # Held per entry, so applications waiting on a vote do not take a slot
+                        async with self._semaphore:
+                            await self.run_entry(entry, state)
+                except Exception as error:
+                    self.act.logging.error(f'[QUEUE] line {entry.line_no} ({entry}) failed: {error!r}')
+                    if entry.action == 'start' and not self.act.journal.has_progress(app_key, 'start'):
+                        # Nothing was posted, so the claimed vote is not held
+                        self.act.journal.release_vote(self.act.app_config(state)['MEMBER_CHANNEL'], app_key)
+                    return False
+                finally:
+                    self.act.journal.save_state(app_key, state)
+                    if entry.action == 'end' and app_key in self._pending_ends:
+                        self._pending_ends[app_key] -= 1
+                        await self.notify_vote()
+        finally:
+            # A failed application's remaining ends will not run
+            if self._pending_ends.pop(app_key, None):
+                await self.notify_vote()
+
+        return True
+
+    async def wait_for_vote(self, app_key, state):
+        """
+        Claim the members' channel for `app_key`, waiting while it holds
+        the vote of an application whose `end` is queued after this.
+        """
+        member_ch = self.act.app_config(state)['MEMBER_CHANNEL']
+        if self._vote_released is None:
+            self._vote_released = asyncio.Condition()
+
+        async with self._vote_released:
+            while True:
+                holder = self.act.journal.claim_vote(member_ch, app_key)
+                if holder == app_key or not self._pending_ends.get(holder):
+                    # Claimed, or never freed here: start_app raises VoteInProgress
+                    return None
+                self.act.logging.info(f'[QUEUE] {app_key}: waiting for the vote of {holder} to end')
+                await self._vote_released.wait()
+
+    async def notify_vote(self):
+        if self._vote_released is None:
+            return None
+        async with self._vote_released:
+            self._vote_released.notify_all()
+        return None
+
+    async def run_entry(self, entry, state):
+        act = self.act
+
+        if entry.action == 'start':
+            state['APPLICANT_NAME'] = entry.argument
+            await asyncio.to_thread(act.get_applicant_id, state)
+            await act.start_app_async(state)
+            return
+
+        if entry.action == 'end':
+            app_result = entry.argument
+        else:
+            app_result, _, name = entry.argument.partition(' ')
+            if name:
+                state['APPLICANT_NAME'] = name
+
+        if 'APPLICANT_ID' not in state or 'APPLICANT_NAME' not in state:
+            await asyncio.to_thread(act.get_applicant_id, state)
+
+        if entry.action == 'end':
+            await act.end_app_async(app_result, state)
+        else:
+            async with act.channel_lock(act.app_config(state)['APPLICANT_CHANNEL']):
+                await asyncio.to_thread(act.send_result, app_result, state)
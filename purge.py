@@ -0,0 +1,85 @@
+import time
+
+# Bulk delete refuses messages older than two weeks; keep a margin for clock skew
+BULK_MAX_AGE_MS = (14 * 24 * 60 * 60 - 60) * 1000
+BULK_MIN, BULK_MAX = 2, 100
+
+class PurgeReport:
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.pages = 0
+        self.bulk_requests = 0
+        self.bulk_deleted = 0
+        self.single_deleted = 0
+        self.kept = 0
+        self.elapsed = 0.0
+
+    @property
+    def deleted(self):
+        return self.bulk_deleted + self.single_deleted
+
+    @property
+    def requests(self):
+        return self.pages + self.bulk_requests + self.single_deleted
+
+    def __str__(self):
+        return (f'purged {self.deleted} messages from {self.channel_id} '
+                f'({self.bulk_deleted} in {self.bulk_requests} bulk requests, '
+                f'{self.single_deleted} single deletes, {self.kept} kept, '
+                f'{self.pages} pages) in {self.elapsed:.2f}s')
+
+class PurgeEngine:
+    """
+    Deletes every message of a channel, newest first, using bulk deletes for
+    messages younger than 14 days and single deletes for the rest.
+    """
+
+    def __init__(self, cano, page_size=100):
+        self.cano = cano
+        self.page_size = page_size
+
+    def purge(self, channel_id, keep=()):
+        keep = set(keep)
+        report = PurgeReport(channel_id)
+        start = time.perf_counter()
+
+        cutoff = time.time() * 1000 - BULK_MAX_AGE_MS
+        pending = []
+        before = None
+
+        while True:
+            params = {'before': before} if before is not None else None
+            # Only IDs are needed, so the pages' payloads are not kept
+            messages = self.cano.fetch_messages(channel_id, count=self.page_size, params=params, keep_raw=False)
+            report.pages += 1
+
+            for message in messages:
+                if message.id in keep:
+                    report.kept += 1
+                elif message.created_ms > cutoff:
+                    pending.append(message.id)
+                    if len(pending) == BULK_MAX:
+                        self._flush(channel_id, pending, report)
+                else:
+                    self.cano.delete_message(channel_id, message.id)
+                    report.single_deleted += 1
+
+            if len(messages) < self.page_size:
+                break
+            before = messages[-1].id
+
+        self._flush(channel_id, pending, report)
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _flush(self, channel_id, pending, report):
+        if len(pending) >= BULK_MIN:
+            self.cano.bulk_delete_messages(channel_id, pending)
+            report.bulk_requests += 1
+            report.bulk_deleted += len(pending)
+        else:
+            for message_id in pending:
+                self.cano.delete_message(channel_id, message_id)
+                report.single_deleted += 1
+        pending.clear()
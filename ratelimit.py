@@ -0,0 +1,149 @@
+import re
+import threading
+import time
+
+# Path segments that make up a route's "major parameter" keep their ID
+MAJOR_PARAMS = ('channels', 'guilds', 'webhooks')
+SNOWFLAKE_RE = re.compile(r'^\d{15,25}$')
+
+def route_key(method, url, base_url=''):
+    """
+    Reduce a request to the route it is rate limited under,
+    e.g. DELETE channels/123/messages/:id
+    """
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    path = path.split('?', 1)[0]
+
+    segments = path.strip('/').split('/')
+    for ix, segment in enumerate(segments):
+        if SNOWFLAKE_RE.match(segment) and (ix == 0 or segments[ix - 1] not in MAJOR_PARAMS):
+            segments[ix] = ':id'
+
+    # All reactions of a message share one bucket regardless of emoji
+    if 'reactions' in segments:
+        segments = segments[:segments.index('reactions') + 1]
+
+    return f"{method.upper()} {'/'.join(segments)}"
+
+def split_major(route):
+    """
+    Split a route key into its template and major parameter, e.g.
+    ('GET channels/:major/messages', '123'). Discord shares one bucket hash
+    across a template but limits each major parameter separately.
+    """
+    method, _, path = route.partition(' ')
+    segments = path.split('/')
+    for ix, segment in enumerate(segments[1:], start=1):
+        if segments[ix - 1] in MAJOR_PARAMS and SNOWFLAKE_RE.match(segment):
+            segments[ix] = ':major'
+            return f"{method} {'/'.join(segments)}", segment
+    return route, ''
+
+class Bucket:
+    __slots__ = ('remaining', 'reset_at', 'lock')
+
+    def __init__(self):
+        self.remaining = 1
+        self.reset_at = 0.0
+        self.lock = threading.Lock()
+
+class RateLimiter:
+    """
+    Spaces out requests per Discord rate-limit bucket.
+
+    Buckets are learned from the X-RateLimit-* response headers and kept
+    per (bucket hash, major parameter), so one channel's limit does not
+    throttle another's; routes that have not been seen yet are let through
+    immediately.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+
+        self.route_buckets = {}
+        self.buckets = {}
+        self.global_reset_at = 0.0
+        self.total_wait = 0.0
+
+        self._lock = threading.Lock()
+
+    def _bucket(self, route):
+        with self._lock:
+            key = self.route_buckets.get(route, route)
+            if key not in self.buckets:
+                self.buckets[key] = Bucket()
+            return self.buckets[key]
+
+    def _wait(self, seconds):
+        if seconds <= 0:
+            return 0.0
+        self.sleep(seconds)
+        with self._lock:
+            self.total_wait += seconds
+        return seconds
+
+    def acquire(self, route):
+        """
+        Block until a request on `route` may be sent. Returns seconds waited.
+        """
+        waited = self._wait(self.global_reset_at - self.clock())
+
+        bucket = self._bucket(route)
+        with bucket.lock:
+            now = self.clock()
+            if bucket.remaining <= 0 and bucket.reset_at > now:
+                waited += self._wait(bucket.reset_at - now)
+                bucket.remaining = 1
+            elif bucket.reset_at <= now:
+                # Window has passed, assume at least one request is free again
+                bucket.remaining = max(bucket.remaining, 1)
+            bucket.remaining -= 1
+
+        return waited
+
+    def update(self, route, res):
+        """
+        Learn bucket state from a response. Returns the delay to apply
+        before retrying if the response was a 429, else None.
+        """
+        headers = res.headers
+        bucket_id = headers.get('X-RateLimit-Bucket')
+        if bucket_id is not None:
+            key = (bucket_id, split_major(route)[1])
+            with self._lock:
+                if self.route_buckets.get(route) != key:
+                    self.route_buckets[route] = key
+                    # Carry over what was learned under the provisional key
+                    self.buckets.setdefault(key, self.buckets.pop(route, Bucket()))
+
+        bucket = self._bucket(route)
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        with bucket.lock:
+            if remaining is not None:
+                bucket.remaining = int(remaining)
+            if reset_after is not None:
+                bucket.reset_at = self.clock() + float(reset_after)
+
+        if res.status_code != 429:
+            return None
+
+        retry_after = headers.get('Retry-After')
+        is_global = headers.get('X-RateLimit-Global') == 'true'
+        try:
+            body = res.json()
+            retry_after = body.get('retry_after', retry_after)
+            is_global = body.get('global', is_global)
+        except ValueError:
+            pass
+
+        retry_after = float(retry_after) if retry_after is not None else 1.0
+        with self._lock:
+            if is_global:
+                self.global_reset_at = self.clock() + retry_after
+        with bucket.lock:
+            bucket.remaining = 0
+            bucket.reset_at = self.clock() + retry_after
+
+        return retry_after
@@ -0,0 +1,114 @@
+"""
+Guild profiles file (YAML), one entry per partner server. Each entry
+overrides keys of config.yaml and names the queue file to process:
+
+- name: partner_a
+  queue: queues/partner_a.txt
+  GUILD: '123'
+  OPERATOR_TOKEN: '...'
+  OPERATOR_ID: '...'
+  PING_ROLE: '...'
+  APPLICANT_CHANNEL: '...'
+  MEMBER_CHANNEL: '...'
+
+Storage paths (archive, transcripts, journal, cache, application index,
+vote series & attachment store) default to a per-guild directory, e.g.
+archive/partner_a/journal.sqlite3.
+"""
+
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Storage kept per guild, with the defaults used when config.yaml omits a key
+PER_GUILD_PATHS = {
+    'META_PATH': 'archive/meta',
+    'CONVERS_PATH': 'archive/convers',
+    'JOURNAL_PATH': 'archive/journal.sqlite3',
+    'CACHE_PATH': 'archive/cache.sqlite3',
+    'APP_INDEX_PATH': 'archive/app_index.sqlite3',
+    'VOTE_SERIES_PATH': 'archive/votes',
+    'ATTACHMENTS_PATH': 'archive/attachments',
+}
+
+def load_profiles(path):
+    import ruamel.yaml
+
+    with open(path, 'r') as file:
+        profiles = ruamel.yaml.YAML(typ='safe').load(file) or []
+
+    names = set()
+    for ix, profile in enumerate(profiles):
+        if not isinstance(profile, dict) or 'name' not in profile or 'queue' not in profile:
+            raise ValueError(f'{path}: entry {ix + 1} needs a name and a queue')
+        if profile['name'] in names:
+            raise ValueError(f'{path}: duplicate guild profile {profile["name"]!r}')
+        names.add(profile['name'])
+
+    return profiles
+
+def guild_overrides(profile, config):
+    """
+    Config keys overridden by `profile`, with per-guild storage paths.
+    """
+    overrides = {key: value for key, value in profile.items() if key not in ('name', 'queue')}
+    for key, default in PER_GUILD_PATHS.items():
+        if key not in overrides:
+            directory, base = os.path.split(config.get(key) or default)
+            overrides[key] = os.path.join(directory, str(profile['name']), base)
+    return overrides
+
+def run_shard(profile, config_path, max_concurrent, debug):
+    """
+    Process one guild's queue with its own Actions, and so its own token,
+    Canopy and rate limiter. Runs in a worker process.
+    """
+    import asyncio
+
+    from main import RESULT_OPT_PATH, Actions
+    from pipeline import Pipeline, load_queue
+    from snapshot import load_snapshot
+
+    start = time.perf_counter()
+    config, _, _ = load_snapshot(config_path, RESULT_OPT_PATH)
+    act = Actions(debug, resolve_applicant=False, config_path=config_path,
+                  overrides=guild_overrides(profile, config))
+
+    entries = load_queue(profile['queue'])
+    failed = asyncio.run(Pipeline(act, max_concurrent=max_concurrent).run(entries))
+
+    return {
+        'name': profile['name'],
+        'applications': len({entry.app_key for entry in entries}),
+        'failed': failed,
+        'requests': len(act.metrics.requests),
+        'rate_limit_wait_s': round(act.cano.limiter.total_wait, 3),
+        'elapsed_s': round(time.perf_counter() - start, 3)
+    }
+
+def run_shards(profiles, config_path, processes=None, max_concurrent=4, debug=False, logging=None):
+    """
+    Run every guild profile in a process pool. A slow, rate-limited or
+    failing guild only holds up its own worker.
+    """
+    summaries = []
+    with ProcessPoolExecutor(max_workers=processes or len(profiles) or 1) as pool:
+        futures = {pool.submit(run_shard, profile, config_path, max_concurrent, debug): profile['name']
+                   for profile in profiles}
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as error:
+                summary = {'name': name, 'error': repr(error)}
+                if logging is not None:
+                    logging.error(f'[SHARD] {name} failed: {error!r}')
+            else:
+                if logging is not None:
+                    logging.info(f"[SHARD] {name}: {summary['applications'] - len(summary['failed'])}/"
+                                 f"{summary['applications']} applications in {summary['elapsed_s']}s")
+            summaries.append(summary)
+
+    return summaries
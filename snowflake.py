@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+# Discord epoch (2015-01-01T00:00:00Z) in milliseconds
+DISCORD_EPOCH = 1420070400000
+
+# Bit layout below the 42-bit timestamp
+WORKER_SHIFT, PROCESS_SHIFT, TIMESTAMP_SHIFT = 17, 12, 22
+SEQUENCE_MASK = 0x3FFFFF
+
+def timestamp_ms(snowflake):
+    """
+    Unix time in milliseconds encoded in a snowflake ID.
+    """
+    return (int(snowflake) >> TIMESTAMP_SHIFT) + DISCORD_EPOCH
+
+def to_datetime(snowflake):
+    return datetime.fromtimestamp(timestamp_ms(snowflake) / 1000, tz=timezone.utc)
+
+def from_timestamp_ms(ms, sequence=0):
+    """
+    Snowflake for Unix time `ms`; `sequence` fills the low 22 bits.
+    """
+    return str(((int(ms) - DISCORD_EPOCH) << TIMESTAMP_SHIFT) | (sequence & SEQUENCE_MASK))
+
+def from_datetime(when, sequence=0):
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return from_timestamp_ms(when.timestamp() * 1000, sequence)
+
+def decode(snowflake):
+    """
+    Fields of a snowflake ID: timestamp (Unix ms), worker, process and
+    per-process increment.
+    """
+    value = int(snowflake)
+    return {
+        'timestamp_ms': timestamp_ms(value),
+        'worker_id': (value >> WORKER_SHIFT) & 0x1F,
+        'process_id': (value >> PROCESS_SHIFT) & 0x1F,
+        'increment': value & 0xFFF
+    }
+
+def next_id(snowflake):
+    """
+    Smallest ID after `snowflake`, e.g. for a `before` cursor that still
+    includes the message itself.
+    """
+    return str(int(snowflake) + 1)
+
+def previous_id(snowflake):
+    return str(int(snowflake) - 1)
+
+def after_cursor(since):
+    """
+    `after` cursor selecting messages created after `since`: an ID returned
+    by an earlier call, or a datetime (messages in that millisecond included).
+    """
+    if isinstance(since, datetime):
+        return previous_id(from_datetime(since))
+    return str(int(since))
+
+def before_cursor(until):
+    """
+    `before` cursor selecting messages created before `until`: an ID
+    returned by an earlier call, or a datetime.
+    """
+    if isinstance(until, datetime):
+        return from_datetime(until)
+    return str(int(until))
@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+
+from utils import parse_timedelta
+
+PERCENTILES = (50, 75, 90, 95, 99)
+COLUMNS_FILE = 'stats_columns.npz'
+
+def record_columns(records):
+    """
+    Turn metadata records into columnar arrays. Elapsed time is kept as raw
+    seconds; records written before `time_elapsed_s` existed are parsed
+    from their display string.
+    """
+    elapsed, accept, deny, results, dates = [], [], [], [], []
+    for record in records:
+        if record.get('time_elapsed_s') is not None:
+            elapsed.append(record['time_elapsed_s'])
+        elif record.get('time_elapsed'):
+            elapsed.append(parse_timedelta(record['time_elapsed']))
+        else:
+            elapsed.append(np.nan)
+        accept.append(record.get('accept_votes') or 0)
+        deny.append(record.get('deny_votes') or 0)
+        results.append(record.get('app_result') or 'none-default')
+        dates.append(record.get('start_date') or 'NaT')
+
+    return {
+        'elapsed_s': np.array(elapsed, dtype=np.float64),
+        'accept_votes': np.array(accept, dtype=np.int64),
+        'deny_votes': np.array(deny, dtype=np.int64),
+        'app_result': np.array(results, dtype=np.str_),
+        'start_date': np.array(dates, dtype='datetime64[D]'),
+    }
+
+def load_columns(meta_store):
+    """
+    Columns of every archived record. Decoded columns are cached next to the
+    archive, so only records appended since the last call are decompressed.
+    """
+    path = os.path.join(meta_store.root, COLUMNS_FILE)
+    total = meta_store.count()
+
+    columns, cached = None, 0
+    if os.path.exists(path):
+        with np.load(path) as data:
+            columns = {key: data[key] for key in data.files if key != 'count'}
+            cached = int(data['count'])
+        if cached > total:
+            columns, cached = None, 0
+
+    if columns is None or cached < total:
+        fresh = record_columns(meta_store.scan(start=cached))
+        if columns is None:
+            columns = fresh
+        else:
+            columns = {key: np.concatenate([columns[key], fresh[key]]) for key in columns}
+        np.savez(path, count=total, **columns)
+
+    return columns
+
+def compute_stats(columns, result_types):
+    """
+    Aggregate report over `columns`: time-to-decision percentiles, accept
+    ratio per result type and per-month trends.
+    """
+    elapsed = columns['elapsed_s']
+    accept, deny = columns['accept_votes'], columns['deny_votes']
+
+    report = {'applications': int(len(elapsed))}
+
+    # Time to decision
+    known = elapsed[~np.isnan(elapsed)]
+    report['time_to_decision_s'] = dict(zip(
+        (f'p{p}' for p in PERCENTILES),
+        (np.percentile(known, PERCENTILES) if len(known) else np.full(len(PERCENTILES), np.nan)).tolist()
+    ))
+
+    # Accept ratio per result type; anything not in result_options.ini is 'other'
+    labels = list(result_types) + ['other']
+    codes = np.full(len(elapsed), len(result_types), dtype=np.int64)
+    for ix, result_type in enumerate(result_types):
+        codes[columns['app_result'] == result_type] = ix
+
+    counts = np.bincount(codes, minlength=len(labels))
+    accept_sum = np.bincount(codes, weights=accept, minlength=len(labels))
+    deny_sum = np.bincount(codes, weights=deny, minlength=len(labels))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = accept_sum / (accept_sum + deny_sum)
+
+    report['by_result'] = {
+        label: {'count': int(counts[ix]), 'accept_ratio': float(ratio[ix])}
+        for ix, label in enumerate(labels) if counts[ix]
+    }
+
+    # Monthly trends
+    months = columns['start_date'].astype('datetime64[M]')
+    dated = ~np.isnat(months)
+    unique_months, month_ix = np.unique(months[dated], return_inverse=True)
+
+    month_counts = np.bincount(month_ix, minlength=len(unique_months))
+    accepted = np.char.startswith(columns['app_result'][dated], 'accept')
+    month_accepted = np.bincount(month_ix, weights=accepted, minlength=len(unique_months))
+
+    month_elapsed = elapsed[dated]
+    has_elapsed = ~np.isnan(month_elapsed)
+    elapsed_sum = np.bincount(month_ix[has_elapsed], weights=month_elapsed[has_elapsed], minlength=len(unique_months))
+    elapsed_count = np.bincount(month_ix[has_elapsed], minlength=len(unique_months))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_elapsed = elapsed_sum / elapsed_count
+
+    report['by_month'] = {
+        str(month): {
+            'count': int(month_counts[ix]),
+            'accepted': int(month_accepted[ix]),
+            'mean_time_to_decision_s': float(mean_elapsed[ix])
+        }
+        for ix, month in enumerate(unique_months)
+    }
+
+    return report
+
+def format_report(report):
+    def hours(seconds):
+        return 'n/a' if np.isnan(seconds) else f'{seconds / 3600:.1f}h'
+
+    lines = [f"Applications: {report['applications']}", '', 'Time to decision:']
+    lines += [f'  {key}: {hours(value)}' for key, value in report['time_to_decision_s'].items()]
+
+    lines += ['', 'Accept ratio by result:']
+    lines += [f"  {label}: {entry['accept_ratio']:.2f} over {entry['count']}"
+              for label, entry in report['by_result'].items()]
+
+    lines += ['', 'By month:']
+    lines += [f"  {month}: {entry['count']} applications, {entry['accepted']} accepted, "
+              f"{hours(entry['mean_time_to_decision_s'])} mean time to decision"
+              for month, entry in report['by_month'].items()]
+
+    return '\n'.join(lines)
@@ -0,0 +1,145 @@
+import asyncio
+
+class Step:
+    """
+    One numbered step of an action. `func` is a coroutine function taking
+    the results of previously finished steps (keyed by step number).
+
+    Steps sharing a `lock` key run as one critical section: the lock is taken
+    before the first of them starts and released after the last one ends.
+    """
+
+    def __init__(self, number, description, func, deps=(), lock=None):
+        self.number = str(number)
+        self.description = description
+        self.func = func
+        self.deps = tuple(str(dep) for dep in deps)
+        self.lock = lock
+
+    def __repr__(self):
+        return f'Step({self.number}, deps={self.deps})'
+
+def order_steps(steps):
+    """
+    Topologically sort steps, keeping the listed order where possible.
+    """
+    by_number = {step.number: step for step in steps}
+    ordered, state = [], {}
+
+    def visit(step):
+        if state.get(step.number) == 'done':
+            return
+        if state.get(step.number) == 'visiting':
+            raise ValueError(f'Step {step.number} is part of a dependency cycle')
+
+        state[step.number] = 'visiting'
+        for dep in step.deps:
+            if dep not in by_number:
+                raise ValueError(f'Step {step.number} depends on unknown step {dep}')
+            visit(by_number[dep])
+        state[step.number] = 'done'
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+class LockSpan:
+    """
+    Holds one lock across every step that names it.
+    """
+
+    def __init__(self, lock, count):
+        self.lock = lock
+        self.remaining = count
+        self._acquiring = None
+
+    async def enter(self):
+        if self._acquiring is None:
+            self._acquiring = asyncio.ensure_future(self.lock.acquire())
+        await asyncio.shield(self._acquiring)
+
+    def exit(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.release()
+
+    def release(self):
+        acquiring, self._acquiring = self._acquiring, None
+        if acquiring is None:
+            return
+        if not acquiring.done():
+            acquiring.cancel()
+        elif not acquiring.cancelled():
+            self.lock.release()
+
+async def run_steps(steps, logging, locks=None, journal=None, metrics=None, action=''):
+    """
+    Run a dependency graph of steps, starting each one as soon as the steps
+    it depends on have finished. Returns the results keyed by step number.
+
+    `locks` maps a step's lock key to an asyncio.Lock shared with other
+    concurrently running actions.
+
+    With a `journal` run, steps it already completed are skipped and their
+    recorded outputs reused; newly finished steps are recorded as they end.
+
+    With `metrics`, each step's span is recorded under `action`.
+    """
+    steps = order_steps(steps)
+    results = {}
+    tasks = {}
+
+    completed = journal.completed if journal is not None else {}
+
+    spans = {}
+    for step in steps:
+        if step.lock is not None and step.number not in completed:
+            if locks is None:
+                raise ValueError(f'Step {step.number} needs a lock but no locks were given')
+            if step.lock not in spans:
+                spans[step.lock] = LockSpan(locks(step.lock), 0)
+            spans[step.lock].remaining += 1
+
+    async def run(step):
+        if step.deps:
+            await asyncio.gather(*(tasks[dep] for dep in step.deps))
+
+        start = metrics.now() if metrics is not None else 0.0
+
+        if step.number in completed:
+            results[step.number] = completed[step.number]
+            logging.info(f'[SKIP] {step.number}. {step.description} (already done)')
+            if metrics is not None:
+                metrics.record_span(action, step.number, step.description, start, 0.0, skipped=True)
+            return
+
+        span = spans.get(step.lock)
+        if span is not None:
+            await span.enter()
+        try:
+            results[step.number] = await step.func(results)
+        finally:
+            if span is not None:
+                span.exit()
+            if metrics is not None:
+                metrics.record_span(action, step.number, step.description, start, metrics.now() - start)
+        if journal is not None:
+            journal.record(step.number, results[step.number])
+        logging.info(f'[SUCCESS] {step.number}. {step.description}')
+
+    for step in steps:
+        tasks[step.number] = asyncio.ensure_future(run(step))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    finally:
+        for span in spans.values():
+            span.release()
+
+    return results
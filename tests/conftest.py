@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fake_discord import FakeDiscord
+
+API_VERSION = 10
+
+@pytest.fixture
+def fake():
+    # Generous buckets and a quick bot keep the tests fast
+    fake = FakeDiscord(bucket_limit=1000, bot_delay=0.01).start()
+    yield fake
+    fake.stop()
+
+@pytest.fixture
+def cano(fake):
+    from api_depot import Canopy
+    headers = {'Authorization': 'fake-token', 'Content-Type': 'application/json'}
+    return Canopy(api_version=API_VERSION, headers=headers, api_root=fake.api_root)
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    """
+    bench.py's fake guild & working directory, with Actions' relative
+    paths resolving inside it.
+    """
+    import bench
+
+    opt = bench.parse_option(['--latency', '0', '--bucket_limit', '1000', '--bot_delay', '0.01',
+                              '--discussion', '10', '--thread_messages', '4', '--attachments', '3',
+                              '--attachment_kb', '4', '--voters', '6'])
+    sandbox = bench.Sandbox(opt)
+    monkeypatch.chdir(sandbox.workdir)
+    yield sandbox
+    sandbox.close()
+
+@pytest.fixture
+def act(sandbox):
+    from main import Actions
+    act = Actions(False, config_path=sandbox.config_path)
+    # Steps wait on the bot; no need for the full default timeout
+    act.waiter.timeout = 3.0
+    return act
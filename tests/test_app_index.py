@@ -0,0 +1,52 @@
+import pytest
+
+from app_index import ApplicationIndex
+
+@pytest.fixture
+def index(tmp_path):
+    index = ApplicationIndex(str(tmp_path / 'app_index.sqlite3'))
+    yield index
+    index.close()
+
+@pytest.fixture
+def channel(fake):
+    return fake.add_channel('applications')
+
+def sync(index, fake, cano, channel):
+    return index.sync(cano, channel['id'], ignore_ids={fake.operator['id']})
+
+def test_application_is_its_first_message(fake, cano, index, channel):
+    steve = fake.add_user('steve')
+    head = fake.add_message(channel['id'], steve, 'Age: 20\nWhy: building')
+    fake.add_message(channel['id'], fake.operator, 'thanks, looking at it')
+    fake.add_message(channel['id'], steve, 'IGN: Steve_Builds')
+
+    assert sync(index, fake, cano, channel) == 1
+    # Found by the name given in the follow-up, too
+    assert index.find('steve_builds') == [(head['id'], channel['id'], steve['id'])]
+    assert index.find(steve['id'], channel['id']) == [(head['id'], channel['id'], steve['id'])]
+
+def test_other_members_split_applications(fake, cano, index, channel):
+    steve, alex = fake.add_user('steve'), fake.add_user('alex')
+    first = fake.add_message(channel['id'], steve, 'IGN: steve')
+    fake.add_message(channel['id'], alex, 'IGN: alex')
+    second = fake.add_message(channel['id'], steve, 'any update?')
+
+    assert sync(index, fake, cano, channel) == 3
+    assert [match[0] for match in index.find('steve')] == [second['id'], first['id']]
+
+def test_sync_is_incremental_and_continues_a_run(fake, cano, index, channel):
+    steve = fake.add_user('steve')
+    head = fake.add_message(channel['id'], steve, 'first part')
+    assert sync(index, fake, cano, channel) == 1
+
+    fake.add_message(channel['id'], steve, 'IGN: later_name')
+    requests_before = fake.request_count
+    assert sync(index, fake, cano, channel) == 0
+    assert fake.request_count - requests_before == 1
+    assert [match[0] for match in index.find('later_name')] == [head['id']]
+
+def test_bots_and_operator_are_not_applicants(fake, cano, index, channel):
+    fake.add_message(channel['id'], fake.bot, 'IGN: bot')
+    fake.add_message(channel['id'], fake.operator, 'IGN: operator')
+    assert sync(index, fake, cano, channel) == 0
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from archiver import ThreadArchiver
+
+@pytest.fixture
+def thread(fake):
+    thread = fake.add_channel('interview', channel_type=11)
+    member = fake.add_user('member')
+    for ix in range(150):
+        fake.add_message(thread['id'], member, f'message {ix}')
+    return thread
+
+def lines(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+def test_archive_is_oldest_first_across_pages(fake, cano, thread, tmp_path):
+    path, count = ThreadArchiver(cano, str(tmp_path)).archive(thread['id'], 'thread.jsonl')
+    assert count == 150
+    assert [message['content'] for message in lines(path)] == [f'message {ix}' for ix in range(150)]
+
+def test_rerun_only_appends_new_messages(fake, cano, thread, tmp_path):
+    archiver = ThreadArchiver(cano, str(tmp_path))
+    archiver.archive(thread['id'], 'thread.jsonl')
+    fake.add_message(thread['id'], fake.operator, 'late reply')
+
+    requests_before = fake.request_count
+    path, count = archiver.archive(thread['id'], 'thread.jsonl')
+    assert count == 1 and fake.request_count - requests_before == 1
+    assert [message['content'] for message in lines(path)][-2:] == ['message 149', 'late reply']
+
+def test_partial_last_line_is_dropped_and_rewritten(fake, cano, thread, tmp_path):
+    archiver = ThreadArchiver(cano, str(tmp_path))
+    path, _ = archiver.archive(thread['id'], 'thread.jsonl')
+    archived = lines(path)
+
+    # Interrupted mid-write: the last message is cut short
+    with open(path, 'rb+') as file:
+        data = file.read()
+        file.seek(0)
+        file.truncate()
+        file.write(data[:-20])
+
+    assert archiver.last_archived_id(path) == archived[-2]['id']
+    _, count = archiver.archive(thread['id'], 'thread.jsonl')
+    assert count == 1
+    assert lines(path) == archived
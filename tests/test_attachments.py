@@ -0,0 +1,56 @@
+import gzip
+import io
+import os
+
+from attachments import FRAME_RESERVE, Attachment, MultipartBody, as_attachment, fit, plan_uploads
+
+def test_sources(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'hello')
+
+    for source in (b'hello', str(path), io.BytesIO(b'hello'), open(path, 'rb'), [b'hel', b'lo']):
+        attachment = Attachment('notes.txt', source)
+        assert (attachment.size, attachment.read()) == (5, b'hello')
+
+    assert as_attachment(str(path)).filename == 'notes.txt'
+    assert as_attachment(('other.txt', b'x')).filename == 'other.txt'
+
+def test_fit_keeps_small_files():
+    attachment = Attachment('a.json', b'{}')
+    assert fit(attachment, 100) == [attachment]
+
+def test_fit_compresses_large_files():
+    data = b'a' * 10000
+    [compressed] = fit(Attachment('a.log', data), 1000)
+    assert compressed.filename == 'a.log.gz'
+    assert gzip.decompress(compressed.read()) == data
+
+def test_fit_splits_incompressible_files():
+    data = os.urandom(5000)
+    parts = fit(Attachment('a.bin', data), 1000)
+
+    assert [part.filename for part in parts][:2] == ['a.bin.gz.001', 'a.bin.gz.002']
+    assert all(part.size <= 1000 for part in parts)
+    assert gzip.decompress(b''.join(part.read() for part in parts)) == data
+
+def test_plan_uploads_respects_file_count():
+    files = [Attachment(f'{ix}.txt', b'x') for ix in range(23)]
+    batches = plan_uploads(files, max_files=10)
+    assert [len(batch) for batch in batches] == [10, 10, 3]
+
+def test_plan_uploads_respects_size():
+    max_bytes = FRAME_RESERVE + 1000
+    files = [Attachment(f'{ix}.bin', os.urandom(400)) for ix in range(5)]
+    batches = plan_uploads(files, max_bytes=max_bytes)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert all(sum(part.size for part in batch) <= 1000 for batch in batches)
+
+def test_multipart_length_matches_body():
+    body = MultipartBody({'content': 'hi'}, [Attachment('a.txt', b'abc'), Attachment('b"c.txt', b'')])
+    data = b''.join(bytes(chunk) for chunk in body)
+
+    assert len(body) == len(data)
+    assert b'name="files[1]"; filename="b\\"c.txt"' in data
+    # Iterable again, for retries
+    assert b''.join(bytes(chunk) for chunk in body) == data
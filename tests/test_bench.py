@@ -0,0 +1,15 @@
+import json
+import os
+
+import bench
+
+BASELINE = os.path.join(bench.REPO_DIR, 'bench_baseline.json')
+
+def test_api_calls_match_the_baseline():
+    with open(BASELINE, 'r') as file:
+        baseline = json.load(file)
+    # Same options the baseline was saved with. Wall times, polls and 429s depend on the
+    # machine's load; the requests each action needs besides those do not
+    results = bench.run(bench.parse_option(['--latency', '0.05', '--discussion', '400']))
+    assert [entry['action'] for entry in results] == [entry['action'] for entry in baseline]
+    assert bench.compare(results, baseline, tolerance=0, metrics=('api_calls',)) == []
@@ -0,0 +1,55 @@
+import itertools
+
+import pytest
+
+import cache as cache_module
+from cache import LookupCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Distinct use times, so recency does not depend on the clock's resolution
+    ticks = itertools.count(1)
+    monkeypatch.setattr(cache_module.time, 'time', lambda: next(ticks))
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put('user', 1, {'id': '1'})
+    cache.put('user', 2, {'id': '2'})
+    assert cache.get('user', 1) == {'id': '1'}
+
+    cache.put('user', 3, {'id': '3'})
+    assert cache.get('user', 2) is None
+    assert cache.get('user', 1) == {'id': '1'} and cache.get('user', 3) == {'id': '3'}
+
+def test_update_does_not_count_twice(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put('user', 1, {'name': 'old'})
+    cache.put('user', 1, {'name': 'new'})
+    cache.put('channel', 1, {'id': '1'})
+    assert cache.get('user', 1) == {'name': 'new'}
+    assert cache.get('channel', 1) == {'id': '1'}
+
+def test_entries_persist(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = LookupCache(path)
+    cache.put('message_author', '9', {'id': '5'})
+    cache.close()
+
+    reopened = LookupCache(path, max_entries=1)
+    assert reopened.get('message_author', '9') == {'id': '5'}
+    reopened.put('user', '5', {'id': '5'})
+    assert reopened.get('message_author', '9') is None
+
+def test_repeat_lookups_are_served_locally(fake, tmp_path):
+    from api_depot import Canopy
+
+    channel = fake.add_channel('applications')
+    author = fake.add_user('steve')
+    message = fake.add_message(channel['id'], author, 'IGN: steve')
+    cano = Canopy(api_version=10, headers={'Authorization': 'fake-token'}, api_root=fake.api_root,
+                  cache=LookupCache(str(tmp_path / 'cache.sqlite3')))
+
+    assert cano.lookup_message_author(channel['id'], message['id'])['id'] == author['id']
+    requests_before = fake.request_count
+    assert cano.lookup_message_author(channel['id'], message['id'])['username'] == 'steve'
+    assert fake.request_count == requests_before
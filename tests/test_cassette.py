@@ -0,0 +1,93 @@
+import gzip
+
+import pytest
+import requests
+
+from cassette import RecordingSession, ReplaySession, request_key
+
+def record(fake, path, calls):
+    session = RecordingSession(requests.Session(), str(path), fake.api_root, secrets=['fake-token'])
+    headers = {'Authorization': 'fake-token'}
+    try:
+        for method, url, params in calls:
+            session.request(method, fake.api_root + url, params=params, headers=headers)
+    finally:
+        session.close()
+
+@pytest.fixture
+def recorded(fake, tmp_path):
+    channel = fake.add_channel('general')
+    author = fake.add_user('member')
+    first = fake.add_message(channel['id'], author, 'first')
+    path = tmp_path / 'run.cassette.gz'
+    record(fake, path, [
+        ('GET', f'/v10/channels/{channel["id"]}/messages?limit=1', None),
+        ('GET', f'/v10/channels/{channel["id"]}/messages', {'after': first['id']}),
+    ])
+    fake.add_message(channel['id'], author, 'second')
+    record(fake, tmp_path / 'poll.cassette.gz', [
+        ('GET', f'/v10/channels/{channel["id"]}/messages', {'after': first['id']}),
+    ])
+    return path, channel, first
+
+def test_request_key_normalizes_query():
+    assert request_key('GET', 'channels/1/messages?limit=5', {'after': 3}) == \
+           request_key('GET', 'channels/1/messages?after=3&limit=5')
+
+def test_token_is_never_written(recorded):
+    path, _, _ = recorded
+    with gzip.open(path, 'rt') as file:
+        assert 'fake-token' not in file.read()
+
+def test_replay_serves_recorded_responses(recorded):
+    path, channel, first = recorded
+    sleeps = []
+    replay = ReplaySession(str(path), 'http://elsewhere/api', scale=0.5, sleep=sleeps.append)
+
+    res = replay.request('GET', f'http://elsewhere/api/v10/channels/{channel["id"]}/messages?limit=1')
+    assert res.status_code == 200
+    assert [message['content'] for message in res.json()] == ['first']
+    assert res.headers['X-RateLimit-Bucket']
+    assert len(sleeps) == 1 and sleeps[0] >= 0
+
+    res = replay.get(f'http://elsewhere/api/v10/channels/{channel["id"]}/messages',
+                     params={'after': first['id']}, stream=True)
+    with res:
+        assert res.json() == []
+
+def test_repeated_requests_reuse_the_last_response(recorded):
+    path, channel, first = recorded
+    replay = ReplaySession(str(path), 'http://x/api', scale=0)
+    url = f'http://x/api/v10/channels/{channel["id"]}/messages'
+    for _ in range(3):
+        assert replay.request('GET', url, params={'after': first['id']}).json() == []
+    assert (replay.served, replay.missed) == (3, 0)
+
+def test_unseen_query_falls_back_to_the_route(recorded):
+    path, channel, _ = recorded
+    replay = ReplaySession(str(path), 'http://x/api', scale=0)
+    res = replay.request('GET', f'http://x/api/v10/channels/{channel["id"]}/messages', params={'after': '1'})
+    assert res.status_code == 200
+
+def test_unknown_route_is_a_404(recorded):
+    path, _, _ = recorded
+    replay = ReplaySession(str(path), 'http://x/api', scale=0)
+    res = replay.request('DELETE', 'http://x/api/v10/channels/1/messages/2')
+    assert res.status_code == 404
+    assert replay.missed == 1
+
+def test_cdn_downloads_stream_past_the_cassette(fake, tmp_path):
+    channel = fake.add_channel('thread')
+    attachment = fake.add_attachment(channel['id'], 'build.png', b'\x89PNG' * 4096)
+    path = tmp_path / 'mirror.cassette.gz'
+    session = RecordingSession(requests.Session(), str(path), fake.api_root)
+    try:
+        with session.get(attachment['url'], stream=True) as res:
+            # Not read yet: the body is still on the wire
+            assert res.raw is not None and not res._content_consumed
+            assert b''.join(res.iter_content(1024)) == b'\x89PNG' * 4096
+    finally:
+        session.close()
+
+    with gzip.open(path, 'rt') as file:
+        assert len(file.readlines()) == 1
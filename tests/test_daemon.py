@@ -0,0 +1,78 @@
+import asyncio
+import io
+import logging
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from client import send_command
+from daemon import Daemon
+
+@pytest.fixture
+def daemon(act, tmp_path):
+    path = str(tmp_path / 'daemon.sock')
+    server = Daemon(act, socket_path=path)
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield path
+
+    if thread.is_alive():
+        send_command({'action': 'shutdown'}, path)
+    thread.join(5)
+    assert not thread.is_alive() and not os.path.exists(path)
+
+def command(path, **request):
+    out = io.StringIO()
+    reply = send_command(request, path, out=out)
+    return reply, out.getvalue()
+
+def test_commands_run_with_their_logs_relayed(sandbox, daemon, caplog):
+    # Under pytest, create_log's basicConfig leaves the root logger at WARNING
+    caplog.set_level(logging.INFO)
+    assert command(daemon, action='ping')[0]['ok']
+
+    # Down to the last line logged before the reply
+    reply, log = command(daemon, action='start')
+    assert reply['ok'] and log.rstrip().endswith('Successfully started application process')
+
+    reply, _ = command(daemon, action='tally')
+    assert reply['ok'] and reply['output'].startswith('No tally recorded yet')
+
+    reply, log = command(daemon, action='end', app_result='accept-default')
+    assert reply['ok'] and 'Successfully closed application' in log
+
+    never_started = sandbox.config['APPLICATION_LINK'].rsplit('/', 1)[0] + '/1'
+    reply, _ = command(daemon, action='tally', link=never_started)
+    assert not reply['ok'] and 'start it first' in reply['error']
+    assert command(daemon, action='bogus')[0] == {'ok': False, 'error': 'Invalid action: bogus',
+                                                  'elapsed_s': pytest.approx(0, abs=1)}
+
+def test_result_for_another_link_names_its_own_applicant(sandbox, daemon):
+    fake = sandbox.fake
+    member = fake.add_user('zed')
+    message = fake.add_message(sandbox.applicant_ch, member, 'IGN: zed')
+    link = sandbox.config['APPLICATION_LINK'].rsplit('/', 1)[0] + '/' + message['id']
+
+    reply, _ = command(daemon, action='result_only', app_result='deny-default', link=link)
+    assert reply['ok']
+    [embed] = [message['embeds'][0] for message in fake.channels[sandbox.applicant_ch]['messages'].values()
+               if message['embeds']]
+    assert f"<@{member['id']}> [zed]" in embed['description']
+
+def test_second_daemon_is_refused(act, daemon):
+    with pytest.raises(RuntimeError):
+        Daemon(act, socket_path=daemon).clear_stale_socket()
+
+def test_stale_socket_is_removed(act, tmp_path):
+    path = str(tmp_path / 'stale.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+    Daemon(act, socket_path=path).clear_stale_socket()
+    assert not os.path.exists(path)
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from journal import Journal
+from steps import Step, run_steps
+
+class Log:
+    def __init__(self):
+        self.lines = []
+
+    def info(self, message):
+        self.lines.append(message)
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / 'journal.sqlite3'))
+    yield journal
+    journal.close()
+
+def test_unfinished_run_is_resumed(journal):
+    run = journal.open_run('app', 'start')
+    assert not run.resumed
+    run.record('1', {'thread': '42'})
+
+    resumed = journal.open_run('app', 'start')
+    assert resumed.run_id == run.run_id
+    assert resumed.completed == {'1': {'thread': '42'}}
+
+    resumed.finish()
+    assert not journal.open_run('app', 'start').resumed
+
+def test_state_round_trip(journal):
+    assert journal.load_state('app') == {}
+    journal.save_state('app', {'VOTE_MESSAGE_ID': '7'})
+    assert journal.load_state('app') == {'VOTE_MESSAGE_ID': '7'}
+
+def test_one_vote_per_members_channel(journal):
+    assert journal.claim_vote('members', 'a') == 'a'
+    assert journal.claim_vote('members', 'a') == 'a'
+    assert journal.claim_vote('members', 'b') == 'a'
+    assert journal.claim_vote('other members', 'b') == 'b'
+
+    # Only the holder releases the vote
+    journal.release_vote('members', 'b')
+    assert journal.vote_holder('members') == 'a'
+    journal.release_vote('members', 'a')
+    assert journal.claim_vote('members', 'b') == 'b'
+
+def test_has_progress(journal):
+    run = journal.open_run('app', 'start')
+    assert not journal.has_progress('app', 'start')
+    run.record('1', None)
+    assert journal.has_progress('app', 'start')
+    assert not journal.has_progress('app', 'end')
+
+def test_run_steps_skips_recorded_steps(journal):
+    calls = []
+
+    def step(number, output):
+        async def func(results):
+            calls.append(number)
+            if number == 3:
+                raise RuntimeError('interrupted')
+            return output
+        return func
+
+    steps = [
+        Step(1, 'first', step(1, 'a')),
+        Step(2, 'second', step(2, 'b'), deps=[1]),
+        Step(3, 'third', step(3, 'c'), deps=[2]),
+    ]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_steps(steps, Log(), journal=journal.open_run('app', 'start')))
+    assert calls == [1, 2, 3]
+
+    # The retry reuses the recorded outputs of 1 & 2 and only runs 3 again
+    calls.clear()
+    steps[2] = Step(3, 'third', lambda results: asyncio.sleep(0, result=results['1'] + results['2']), deps=[2])
+    results = asyncio.run(run_steps(steps, Log(), journal=journal.open_run('app', 'start')))
+    assert calls == []
+    assert results == {'1': 'a', '2': 'b', '3': 'ab'}
+
+def test_lock_span_serializes_steps():
+    order = []
+
+    def step(name):
+        async def func(results):
+            order.append(f'{name} in')
+            await asyncio.sleep(0.01)
+            order.append(f'{name} out')
+        return func
+
+    async def main():
+        locks = {}
+
+        def lock(key):
+            return locks.setdefault(key, asyncio.Lock())
+
+        first = [Step(1, 'a1', step('a1'), lock='ch'), Step(2, 'a2', step('a2'), deps=[1], lock='ch')]
+        second = [Step(1, 'b1', step('b1'), lock='ch')]
+        await asyncio.gather(run_steps(first, Log(), locks=lock), run_steps(second, Log(), locks=lock))
+
+    asyncio.run(main())
+    # b1 cannot slip in between a1 and a2
+    assert order in (['a1 in', 'a1 out', 'a2 in', 'a2 out', 'b1 in', 'b1 out'],
+                     ['b1 in', 'b1 out', 'a1 in', 'a1 out', 'a2 in', 'a2 out'])
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from meta_store import MetaStore
+
+RECORDS = [
+    {'applicant_id': '1', 'applicant_name': 'Alex', 'start_date': '2024-01-05', 'app_result': 'accept-default',
+     'accept_votes': 9, 'deny_votes': 1},
+    {'applicant_id': '2', 'applicant_name': 'Sam', 'start_date': '2024-02-10', 'app_result': 'deny-default',
+     'accept_votes': 2, 'deny_votes': 8},
+    {'applicant_id': '1', 'applicant_name': 'Alex', 'start_date': '2024-03-15', 'app_result': 'reject-default',
+     'accept_votes': 4, 'deny_votes': 4},
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetaStore(str(tmp_path))
+    for record in RECORDS:
+        store.append(record)
+    yield store
+    store.close()
+
+def ids(records):
+    return [(record['applicant_id'], record['start_date']) for record in records]
+
+def test_query_filters(store):
+    assert ids(store.query(applicant='alex')) == [('1', '2024-01-05'), ('1', '2024-03-15')]
+    assert ids(store.query(applicant='2')) == [('2', '2024-02-10')]
+    assert ids(store.query(since='2024-02-01', until='2024-02-28')) == [('2', '2024-02-10')]
+    assert ids(store.query(decision='reject')) == [('1', '2024-03-15')]
+    assert ids(store.query(min_accept=4)) == [('1', '2024-01-05'), ('1', '2024-03-15')]
+    assert ids(store.query(min_deny=4, applicant='Alex')) == [('1', '2024-03-15')]
+    assert len(store.query(limit=2)) == 2
+
+def test_vote_queries_use_the_index(store):
+    plan = store.conn.execute('EXPLAIN QUERY PLAN SELECT id FROM records WHERE deny_votes >= 4').fetchall()
+    assert 'records_deny_votes' in str(plan)
+
+def test_records_round_trip_and_persist(store, tmp_path):
+    assert list(store.scan()) == RECORDS
+    store.close()
+
+    reopened = MetaStore(str(tmp_path))
+    assert reopened.count() == 3
+    assert list(reopened.scan(start=2)) == RECORDS[2:]
+
+def test_small_segments(tmp_path):
+    store = MetaStore(str(tmp_path), segment_size=1)
+    for record in RECORDS:
+        store.append(record)
+    assert len(list((tmp_path / 'segments').iterdir())) == 3
+    assert list(store.scan()) == RECORDS
+
+def test_legacy_json_is_imported(tmp_path):
+    (tmp_path / 'old.json').write_text(json.dumps(RECORDS[0]))
+    assert ids(MetaStore(str(tmp_path)).query()) == [('1', '2024-01-05')]
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+import requests
+
+from archiver import ThreadArchiver
+from mirror import AttachmentMirror
+
+@pytest.fixture
+def thread(fake):
+    thread = fake.add_channel('interview', channel_type=11)
+    applicant = fake.add_user('applicant')
+    for ix, data in enumerate([b'a' * 5000, b'b' * 3000, b'a' * 5000]):
+        attachment = fake.add_attachment(thread['id'], f'build_{ix}.png', data)
+        fake.add_message(thread['id'], applicant, f'screenshot {ix}', attachments=[attachment])
+    return thread
+
+@pytest.fixture
+def mirror(tmp_path):
+    with requests.Session() as session:
+        yield AttachmentMirror(session, str(tmp_path / 'attachments'), max_workers=1)
+
+def blobs(root):
+    return sorted(name for _, _, names in os.walk(root) for name in names)
+
+def test_reposted_files_are_stored_once(fake, cano, thread, mirror, tmp_path):
+    archiver = ThreadArchiver(cano, str(tmp_path / 'convers'), mirror=mirror)
+    path, _ = archiver.archive(thread['id'], 'thread.jsonl')
+
+    report = archiver.mirror_report
+    assert (report.downloaded, report.deduplicated, report.failed, report.bytes) == (2, 1, 0, 8000)
+    assert len(blobs(mirror.root)) == 2
+
+    with open(f'{path}.attachments.jsonl', 'r') as file:
+        manifest = [json.loads(line) for line in file]
+    assert [entry['filename'] for entry in manifest] == ['build_0.png', 'build_1.png', 'build_2.png']
+    assert manifest[0]['sha256'] == manifest[2]['sha256'] != manifest[1]['sha256']
+
+def test_rerun_skips_mirrored_attachments(fake, cano, thread, mirror, tmp_path):
+    archiver = ThreadArchiver(cano, str(tmp_path / 'convers'), mirror=mirror)
+    archiver.archive(thread['id'], 'thread.jsonl')
+    downloads = fake.download_count
+
+    # An interrupted run may have archived messages whose files were not mirrored yet
+    path = os.path.join(archiver.convers_path, 'thread.jsonl')
+    with open(f'{path}.attachments.jsonl', 'r') as file:
+        _, *rest = file.readlines()
+    with open(f'{path}.attachments.jsonl', 'w') as file:
+        file.writelines(rest)
+
+    archiver.archive(thread['id'], 'thread.jsonl')
+    assert archiver.mirror_report.skipped == 2
+    assert fake.download_count == downloads + 1
+
+def test_failed_download_leaves_no_partial_file(fake, mirror):
+    report = mirror.mirror([{'id': '1', 'attachments': [
+        {'id': '2', 'filename': 'gone.png', 'url': f'{fake.cdn_root}/1/2/gone.png'}]}], os.devnull)
+    assert report.failed == 1
+    assert blobs(mirror.root) == []
@@ -0,0 +1,47 @@
+import json
+import tracemalloc
+
+import pytest
+
+from models import Message
+
+def payload(ix):
+    # Shaped like a real page entry: most of it is never read back
+    author = {'id': str(1000 + ix), 'username': f'member{ix}', 'global_name': None, 'avatar': 'a' * 32,
+              'discriminator': '0', 'public_flags': 0, 'flags': 0, 'banner': None, 'accent_color': None,
+              'avatar_decoration_data': None, 'banner_color': None, 'clan': None}
+    return {
+        'id': str(1200000000000000000 + ix), 'type': 0, 'channel_id': '5', 'author': author,
+        'content': f'discussion message number {ix} ' * 3, 'timestamp': '2024-05-01T12:00:00.000000+00:00',
+        'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [author],
+        'mention_roles': ['7'], 'attachments': [], 'embeds': [], 'pinned': False, 'flags': 0,
+        'components': [], 'reactions': [{'emoji': {'id': None, 'name': 'thumbsup'}, 'count': 2, 'me': False,
+                                         'count_details': {'burst': 0, 'normal': 2}, 'burst_colors': []}],
+    }
+
+PAGE = json.dumps([payload(ix) for ix in range(100)]).encode()
+
+def retained(keep_raw):
+    tracemalloc.start()
+    try:
+        messages = Message.page(PAGE, keep_raw)
+        return tracemalloc.get_traced_memory()[0], messages
+    finally:
+        tracemalloc.stop()
+
+def test_compact_pages_keep_far_less():
+    full, _ = retained(True)
+    compact, messages = retained(False)
+    assert compact < full / 3
+    assert messages[3].author_id == '1003' and messages[3].reactions[0].count == 2
+
+def test_item_access():
+    message = Message(payload(1))
+    assert message['timestamp'] and message.get('tts') is False
+
+    compact = Message(payload(1), keep_raw=False)
+    assert compact['author']['username'] == 'member1'
+    assert compact.get('embeds') == [] and compact.get('timestamp') is None
+    assert 'content' in compact and 'timestamp' not in compact
+    with pytest.raises(KeyError):
+        compact['timestamp']
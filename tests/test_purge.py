@@ -0,0 +1,61 @@
+import pytest
+
+from purge import BULK_MAX, PurgeEngine
+
+DAY = 24 * 3600
+
+def fill(fake, count, age_s=0.0):
+    channel = fake.add_channel('members')
+    author = fake.add_user('member')
+    ids = [fake.add_message(channel['id'], author, f'message {ix}', age_s=age_s)['id'] for ix in range(count)]
+    return channel, ids
+
+def purge(cano, channel, keep=()):
+    report = PurgeEngine(cano).purge(channel['id'], keep=keep)
+    return report, sorted(channel['messages'])
+
+def test_single_recent_message_is_deleted_alone(fake, cano):
+    channel, _ = fill(fake, 1)
+    report, remaining = purge(cano, channel)
+    # Bulk delete needs at least two messages
+    assert (report.bulk_requests, report.single_deleted, remaining) == (0, 1, [])
+
+def test_two_recent_messages_take_one_bulk_request(fake, cano):
+    channel, _ = fill(fake, 2)
+    report, remaining = purge(cano, channel)
+    assert (report.bulk_requests, report.bulk_deleted, report.single_deleted, remaining) == (1, 2, 0, [])
+
+@pytest.mark.parametrize('count, bulk_requests, single_deleted', [
+    (BULK_MAX, 1, 0),
+    (BULK_MAX + 1, 1, 1),
+    (BULK_MAX + 2, 2, 0),
+])
+def test_bulk_requests_hold_at_most_100(fake, cano, count, bulk_requests, single_deleted):
+    channel, _ = fill(fake, count)
+    report, remaining = purge(cano, channel)
+    assert (report.bulk_requests, report.single_deleted, remaining) == (bulk_requests, single_deleted, [])
+    assert report.pages == 2
+
+def test_messages_older_than_14_days_are_deleted_one_by_one(fake, cano):
+    channel, _ = fill(fake, 3, age_s=15 * DAY)
+    report, remaining = purge(cano, channel)
+    assert (report.bulk_requests, report.single_deleted, remaining) == (0, 3, [])
+
+def test_messages_just_under_14_days_are_bulk_deleted(fake, cano):
+    channel, _ = fill(fake, 3, age_s=13.9 * DAY)
+    report, remaining = purge(cano, channel)
+    assert (report.bulk_requests, report.bulk_deleted, remaining) == (1, 3, [])
+
+def test_mixed_ages(fake, cano):
+    channel, _ = fill(fake, 2, age_s=20 * DAY)
+    author = fake.add_user('other')
+    for ix in range(5):
+        fake.add_message(channel['id'], author, f'recent {ix}')
+
+    report, remaining = purge(cano, channel)
+    assert (report.bulk_deleted, report.single_deleted, remaining) == (5, 2, [])
+
+def test_kept_messages_survive(fake, cano):
+    channel, ids = fill(fake, 5)
+    report, remaining = purge(cano, channel, keep=[ids[2]])
+    assert (report.kept, report.deleted, remaining) == (1, 4, [ids[2]])
@@ -0,0 +1,103 @@
+from ratelimit import RateLimiter, route_key, split_major
+
+CHANNEL_A = '111111111111111111'
+CHANNEL_B = '222222222222222222'
+MESSAGE = '333333333333333333'
+
+class Response:
+    def __init__(self, headers, status_code=200, body=None):
+        self.headers = headers
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError('no body')
+        return self.body
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def limiter():
+    clock = Clock()
+    return RateLimiter(clock=clock, sleep=clock.sleep), clock
+
+def exhausted(bucket='abc', reset_after='2.0'):
+    return Response({'X-RateLimit-Bucket': bucket, 'X-RateLimit-Remaining': '0',
+                     'X-RateLimit-Reset-After': reset_after})
+
+def test_route_key_keeps_major_parameter_only():
+    url = f'https://discord.com/api/v10/channels/{CHANNEL_A}/messages/{MESSAGE}?limit=5'
+    assert route_key('delete', url, 'https://discord.com/api/v10/') == f'DELETE channels/{CHANNEL_A}/messages/:id'
+
+def test_route_key_groups_reactions():
+    url = f'channels/{CHANNEL_A}/messages/{MESSAGE}/reactions/%E2%9C%85/%40me'
+    assert route_key('PUT', url) == f'PUT channels/{CHANNEL_A}/messages/:id/reactions'
+
+def test_split_major():
+    assert split_major(f'POST channels/{CHANNEL_A}/messages') == ('POST channels/:major/messages', CHANNEL_A)
+    assert split_major('GET users/:id') == ('GET users/:id', '')
+
+def test_unseen_route_is_not_delayed():
+    rate_limiter, _ = limiter()
+    assert rate_limiter.acquire(route_key('GET', f'channels/{CHANNEL_A}/messages')) == 0.0
+
+def test_exhausted_bucket_waits_for_reset():
+    rate_limiter, clock = limiter()
+    route = route_key('POST', f'channels/{CHANNEL_A}/messages')
+    rate_limiter.acquire(route)
+    assert rate_limiter.update(route, exhausted()) is None
+
+    assert rate_limiter.acquire(route) == 2.0
+    assert clock.now == 2.0
+    assert rate_limiter.total_wait == 2.0
+
+def test_shared_hash_is_limited_per_major_parameter():
+    rate_limiter, _ = limiter()
+    route_a = route_key('POST', f'channels/{CHANNEL_A}/messages')
+    route_b = route_key('POST', f'channels/{CHANNEL_B}/messages')
+
+    rate_limiter.acquire(route_a)
+    rate_limiter.update(route_a, exhausted(bucket='shared'))
+    rate_limiter.acquire(route_b)
+    rate_limiter.update(route_b, Response({'X-RateLimit-Bucket': 'shared', 'X-RateLimit-Remaining': '4',
+                                           'X-RateLimit-Reset-After': '2.0'}))
+
+    # Channel B's headers must not refill channel A's bucket, nor A's throttle B
+    assert rate_limiter.acquire(route_b) == 0.0
+    assert rate_limiter.acquire(route_a) == 2.0
+
+def test_routes_with_one_bucket_share_state():
+    rate_limiter, _ = limiter()
+    get_route = route_key('GET', f'channels/{CHANNEL_A}/messages/{MESSAGE}')
+    delete_route = route_key('DELETE', f'channels/{CHANNEL_A}/messages/{MESSAGE}')
+
+    rate_limiter.acquire(get_route)
+    rate_limiter.update(get_route, exhausted(bucket='same'))
+    rate_limiter.acquire(delete_route)
+    rate_limiter.update(delete_route, exhausted(bucket='same', reset_after='1.0'))
+    assert rate_limiter.acquire(get_route) == 1.0
+
+def test_429_returns_retry_after():
+    rate_limiter, _ = limiter()
+    route = route_key('GET', f'channels/{CHANNEL_A}/messages')
+    rate_limiter.acquire(route)
+    res = Response({'X-RateLimit-Bucket': 'abc'}, status_code=429, body={'retry_after': 0.5, 'global': False})
+
+    assert rate_limiter.update(route, res) == 0.5
+    assert rate_limiter.acquire(route) == 0.5
+
+def test_global_429_delays_every_route():
+    rate_limiter, _ = limiter()
+    route = route_key('GET', f'channels/{CHANNEL_A}/messages')
+    rate_limiter.acquire(route)
+    rate_limiter.update(route, Response({}, status_code=429, body={'retry_after': 3.0, 'global': True}))
+
+    assert rate_limiter.acquire(route_key('GET', 'users/:id')) == 3.0
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from shard import PER_GUILD_PATHS, guild_overrides, load_profiles, run_shards
+
+def test_storage_is_kept_per_guild():
+    config = {'META_PATH': 'data/meta', 'JOURNAL_PATH': 'data/journal.sqlite3'}
+    overrides = guild_overrides({'name': 'partner', 'queue': 'q.txt', 'GUILD': '7',
+                                 'CACHE_PATH': '/srv/partner_cache.sqlite3'}, config)
+
+    assert overrides['GUILD'] == '7' and 'queue' not in overrides
+    assert overrides['META_PATH'] == os.path.join('data', 'partner', 'meta')
+    assert overrides['JOURNAL_PATH'] == os.path.join('data', 'partner', 'journal.sqlite3')
+    # The profile's own path wins; keys config.yaml omits get the usual default
+    assert overrides['CACHE_PATH'] == '/srv/partner_cache.sqlite3'
+    assert overrides['VOTE_SERIES_PATH'] == os.path.join('archive', 'partner', 'votes')
+    assert set(PER_GUILD_PATHS) <= set(overrides)
+
+@pytest.mark.parametrize('profiles, error', [
+    ("- name: a\n", 'needs a name and a queue'),
+    ("- name: a\n  queue: a.txt\n- name: a\n  queue: b.txt\n", 'duplicate'),
+])
+def test_invalid_profiles(tmp_path, profiles, error):
+    path = tmp_path / 'guilds.yaml'
+    path.write_text(profiles)
+    with pytest.raises(ValueError, match=error):
+        load_profiles(str(path))
+
+def test_guilds_run_in_worker_processes(sandbox):
+    fake = sandbox.fake
+    guilds = {}
+    for name in ('alpha', 'beta'):
+        applicants, members = fake.add_channel(f'{name}-applications'), fake.add_channel(f'{name}-members')
+        applicant = fake.add_user(f'{name}_applicant')
+        message = fake.add_message(applicants['id'], applicant, f'IGN: {name}')
+        queue = os.path.join(sandbox.workdir, f'{name}.txt')
+        with open(queue, 'w') as file:
+            file.write(f"result https://discord.com/channels/1/{applicants['id']}/{message['id']} accept-default\n")
+        guilds[name] = {'name': name, 'queue': queue, 'APPLICANT_CHANNEL': applicants['id'],
+                        'MEMBER_CHANNEL': members['id']}
+
+    summaries = run_shards(list(guilds.values()), sandbox.config_path, processes=2)
+    assert sorted((summary['name'], summary['applications'], summary['failed']) for summary in summaries) == \
+           [('alpha', 1, []), ('beta', 1, [])]
+
+    for name, profile in guilds.items():
+        embeds = [message['embeds'] for message in fake.channels[profile['APPLICANT_CHANNEL']]['messages'].values()
+                  if message['embeds']]
+        assert len(embeds) == 1 and f'[{name}_applicant]' in embeds[0][0]['description']
+        journal = os.path.join(os.path.dirname(sandbox.config['JOURNAL_PATH']), name, 'journal.sqlite3')
+        assert os.path.exists(journal)
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pytest
+
+import snapshot as snapshot_module
+from snapshot import SNAPSHOT_FILE, load_snapshot
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def sources(tmp_path):
+    config_path, result_opt_path = tmp_path / 'config.yaml', tmp_path / 'result_options.ini'
+    shutil.copy(os.path.join(REPO_DIR, 'config.yaml'), config_path)
+    shutil.copy(os.path.join(REPO_DIR, 'result_options.ini'), result_opt_path)
+    return str(config_path), str(result_opt_path)
+
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+    parse_config = snapshot_module.parse_config
+
+    def counted(path):
+        calls.append(path)
+        return parse_config(path)
+
+    monkeypatch.setattr(snapshot_module, 'parse_config', counted)
+    return calls
+
+def test_unchanged_files_reuse_the_snapshot(sources, parses):
+    config, result_opt, reused = load_snapshot(*sources)
+    assert not reused and config['GUILD'] == 'GUILD_ID_HERE' and result_opt
+
+    assert load_snapshot(*sources) == (config, result_opt, True)
+    assert len(parses) == 1
+
+def test_edit_invalidates(sources, parses):
+    config_path, _ = sources
+    load_snapshot(*sources)
+    with open(config_path, 'r') as file:
+        text = file.read()
+    with open(config_path, 'w') as file:
+        file.write(text.replace("GUILD: 'GUILD_ID_HERE'", "GUILD: '42'"))
+
+    config, _, reused = load_snapshot(*sources)
+    assert not reused and config['GUILD'] == '42'
+
+def test_touch_keeps_the_snapshot(sources, parses):
+    config_path, _ = sources
+    load_snapshot(*sources)
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert load_snapshot(*sources)[2]
+    assert len(parses) == 1
+
+def test_corrupt_snapshot_is_rebuilt(sources):
+    config_path, _ = sources
+    load_snapshot(*sources)
+    with open(os.path.join(os.path.dirname(config_path), SNAPSHOT_FILE), 'w') as file:
+        file.write('{"version": 1, "pa')
+    assert not load_snapshot(*sources)[2]
+
+def test_missing_keys_are_reported(sources):
+    config_path, _ = sources
+    with open(config_path, 'w') as file:
+        file.write("GUILD: '1'\n")
+    with pytest.raises(ValueError, match='OPERATOR_TOKEN'):
+        load_snapshot(*sources)
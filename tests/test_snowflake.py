@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from snowflake import (DISCORD_EPOCH, after_cursor, before_cursor, decode, from_datetime, from_timestamp_ms,
+                       next_id, previous_id, timestamp_ms, to_datetime)
+
+# Example from Discord's API reference
+SNOWFLAKE = '175928847299117063'
+
+def test_decode_reference_snowflake():
+    assert decode(SNOWFLAKE) == {
+        'timestamp_ms': 1462015105796,
+        'worker_id': 1,
+        'process_id': 0,
+        'increment': 7
+    }
+
+def test_timestamp_round_trip():
+    ms = 1700000000123
+    assert timestamp_ms(from_timestamp_ms(ms)) == ms
+    assert timestamp_ms(from_timestamp_ms(ms, sequence=12345)) == ms
+
+def test_epoch_is_zero():
+    assert from_timestamp_ms(DISCORD_EPOCH) == '0'
+
+def test_datetimes():
+    when = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert to_datetime(from_datetime(when)) == when
+    # Naive datetimes are taken as UTC
+    assert from_datetime(when.replace(tzinfo=None)) == from_datetime(when)
+
+def test_neighbours_are_exact():
+    assert next_id(SNOWFLAKE) == '175928847299117064'
+    assert previous_id(SNOWFLAKE) == '175928847299117062'
+    # No float rounding on 64-bit IDs
+    assert next_id('9223372036854775806') == '9223372036854775807'
+
+def test_after_cursor_includes_the_millisecond():
+    when = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    first_of_ms = from_datetime(when)
+    assert int(after_cursor(when)) < int(first_of_ms)
+    assert after_cursor(SNOWFLAKE) == SNOWFLAKE
+
+def test_before_cursor_excludes_later_messages():
+    when = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert before_cursor(when) == from_datetime(when)
+    assert before_cursor(int(SNOWFLAKE)) == SNOWFLAKE
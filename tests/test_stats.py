@@ -0,0 +1,58 @@
+import math
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from meta_store import MetaStore
+from stats import COLUMNS_FILE, compute_stats, format_report, load_columns
+
+RECORDS = [
+    {'start_date': '2024-01-05', 'app_result': 'accept-default', 'accept_votes': 9, 'deny_votes': 1,
+     'time_elapsed_s': 3600},
+    {'start_date': '2024-01-20', 'app_result': 'deny-default', 'accept_votes': 2, 'deny_votes': 8,
+     'time_elapsed_s': 7200},
+    # Written before time_elapsed_s existed
+    {'start_date': '2024-02-10', 'app_result': 'accept-default', 'accept_votes': 6, 'deny_votes': 2,
+     'time_elapsed': '0d 3h 0m 0s'},
+    {'start_date': None, 'app_result': 'legacy-type', 'accept_votes': 1, 'deny_votes': 1},
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetaStore(str(tmp_path))
+    for record in RECORDS:
+        store.append(record)
+    yield store
+    store.close()
+
+def test_report(store):
+    report = compute_stats(load_columns(store), ['accept-default', 'deny-default'])
+
+    assert report['applications'] == 4
+    assert report['time_to_decision_s']['p50'] == 7200
+    assert report['by_result']['accept-default'] == {'count': 2, 'accept_ratio': 15 / 18}
+    assert report['by_result']['other'] == {'count': 1, 'accept_ratio': 0.5}
+    assert report['by_month']['2024-01'] == {'count': 2, 'accepted': 1, 'mean_time_to_decision_s': 5400}
+    assert report['by_month']['2024-02']['accepted'] == 1
+    assert 'Applications: 4' in format_report(report)
+
+def test_columns_are_cached_and_extended(store, monkeypatch):
+    assert len(load_columns(store)['elapsed_s']) == 4
+    assert os.path.exists(os.path.join(store.root, COLUMNS_FILE))
+
+    store.append({'start_date': '2024-03-01', 'app_result': 'deny-default', 'accept_votes': 0, 'deny_votes': 5})
+    scans = []
+    scan = store.scan
+    monkeypatch.setattr(store, 'scan', lambda start=0: scans.append(start) or scan(start=start))
+
+    columns = load_columns(store)
+    assert scans == [4]
+    assert columns['deny_votes'].tolist() == [1, 8, 2, 1, 5]
+    assert math.isnan(columns['elapsed_s'][3])
+
+def test_empty_archive(tmp_path):
+    report = compute_stats(load_columns(MetaStore(str(tmp_path))), ['accept-default'])
+    assert report['applications'] == 0 and report['by_month'] == {}
+    assert 'n/a' in format_report(report)
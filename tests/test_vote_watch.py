@@ -0,0 +1,70 @@
+import pytest
+
+from vote_watch import VoteSeries, VoteWatcher, format_tally
+
+REACTIONS = ['thumbsup', 'thumbsdown']
+
+@pytest.fixture
+def series(tmp_path):
+    return VoteSeries(str(tmp_path), '42', REACTIONS)
+
+@pytest.fixture
+def vote(fake):
+    channel = fake.add_channel('members')
+    message = fake.add_message(channel['id'], fake.operator, 'vote')
+    fake.add_reaction(channel['id'], message['id'], 'thumbsup', fake.add_user('alex'))
+    fake.add_reaction(channel['id'], message['id'], 'thumbsdown', fake.add_user('sam'))
+    return channel, message
+
+def watcher(cano, series, vote, **kwargs):
+    channel, message = vote
+    return VoteWatcher(cano, series, channel['id'], message['id'], **kwargs)
+
+def test_series_round_trip(series, tmp_path):
+    assert series.latest() is None
+    series.append([1, 0], at_ms=1000)
+    series.append([2, 1], at_ms=2000)
+
+    reopened = VoteSeries(str(tmp_path), '42', REACTIONS)
+    assert reopened.history() == [(1000, [1, 0]), (2000, [2, 1])]
+    assert reopened.latest() == (2000, [2, 1])
+    assert 'thumbsup: 2, thumbsdown: 1' in format_tally(reopened)
+
+def test_torn_record_is_dropped_on_append(series):
+    series.append([1, 0], at_ms=1000)
+    with open(series.path, 'ab') as file:
+        file.write(b'\x01\x02\x03')
+
+    assert series.latest() == (1000, [1, 0])
+    series.append([4, 1], at_ms=2000)
+    assert series.history() == [(1000, [1, 0]), (2000, [4, 1])]
+
+def test_series_for_other_reactions_is_rejected(series, tmp_path):
+    with pytest.raises(ValueError):
+        VoteSeries(str(tmp_path), '42', REACTIONS + ['shrug'])
+
+def test_watcher_records_changes_only(fake, cano, series, vote):
+    watch = watcher(cano, series, vote)
+    assert watch.sync() and watch.sync()
+    assert [counts for _, counts in series.history()] == [[1, 1]]
+
+    channel, message = vote
+    watch.on_reaction('MESSAGE_REACTION_ADD', {'message_id': message['id'], 'emoji': {'name': 'thumbsup'}})
+    watch.on_reaction('MESSAGE_REACTION_REMOVE', {'message_id': 'other', 'emoji': {'name': 'thumbsup'}})
+    assert series.latest()[1] == [2, 1]
+
+def test_watcher_stops_once_the_vote_is_deleted(fake, cano, series, vote):
+    channel, message = vote
+    del channel['messages'][message['id']]
+    watcher(cano, series, vote, poll_interval=0.01).run(duration=5)
+    assert series.latest() is None
+
+def test_transient_errors_do_not_end_the_watch(fake, cano, series, vote, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise AssertionError('Status Code: 503')
+
+    watch = watcher(cano, series, vote)
+    assert watch.sync()
+    monkeypatch.setattr(cano, 'get_message', unavailable)
+    assert watch.sync()
+    assert watch.counts == [1, 1]
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from gateway import FakeGateway
+from waiter import EventHub, Waiter
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def polling_waiter(clock, **kwargs):
+    return Waiter(None, clock=clock, sleep=clock.sleep, **kwargs)
+
+def test_polls_back_off_exponentially():
+    clock = Clock()
+    results = iter([None, None, None, 'done'])
+    waiter = polling_waiter(clock)
+
+    assert waiter.expect('MESSAGE_CREATE', poll=lambda: next(results)).wait() == 'done'
+    assert clock.sleeps == [0.1, 0.2, 0.4]
+    assert waiter.polls == 4 and waiter.total_wait == pytest.approx(0.7)
+
+def test_backoff_is_capped_and_stops_at_the_timeout():
+    clock = Clock()
+    waiter = polling_waiter(clock, max_delay=0.5, timeout=2.0)
+
+    assert waiter.expect('MESSAGE_CREATE', poll=lambda: None).wait() is None
+    assert clock.sleeps[:4] == [0.1, 0.2, 0.4, 0.5]
+    assert max(clock.sleeps) == 0.5 and clock.now == 2.0
+
+def test_events_resolve_without_polling():
+    hub = EventHub()
+    FakeGateway(hub).start()
+    waiter = Waiter(hub, timeout=5.0)
+    polls = []
+
+    pending = waiter.expect('MESSAGE_CREATE', lambda message: message['id'] == '2', poll=polls.append)
+    # Delivered before `wait`, and among events that do not match
+    hub.dispatch('MESSAGE_CREATE', {'id': '1'})
+    hub.dispatch('CHANNEL_UPDATE', {'id': '2'})
+    hub.dispatch('MESSAGE_CREATE', {'id': '2'})
+    assert pending.wait() == {'id': '2'}
+    assert polls == [] and waiter.polls == 0
+
+def test_event_from_another_thread_wakes_the_wait():
+    hub = EventHub()
+    FakeGateway(hub).start()
+    pending = Waiter(hub, timeout=5.0).expect('CHANNEL_UPDATE')
+    threading.Timer(0.05, hub.dispatch, ('CHANNEL_UPDATE', {'id': '3'})).start()
+    assert pending.wait() == {'id': '3'}
+
+def test_disconnected_gateway_falls_back_to_polling():
+    clock = Clock()
+    waiter = Waiter(EventHub(), clock=clock, sleep=clock.sleep)
+    assert waiter.expect('MESSAGE_CREATE', poll=lambda: 'polled').wait() == 'polled'
+
+def test_workflow_over_the_fake_gateway(sandbox, act):
+    gateway = FakeGateway(act.hub)
+    sandbox.fake.gateway = gateway
+    gateway.start()
+
+    # The bot is fast enough to answer before the result command's ID is returned
+    act.start_app()
+    act.send_result('accept-default')
+    # Every wait was resolved by an event
+    assert act.waiter.polls == 0
+    assert act.waiter.total_wait < act.waiter.timeout
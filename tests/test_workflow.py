@@ -0,0 +1,191 @@
+import asyncio
+import os
+
+import pytest
+
+from journal import VoteInProgress
+from utils import SEND_MESSAGES, app_key, is_locked
+
+def state_of(act):
+    return act.journal.load_state(app_key(act.app['APPLICATION_LINK']))
+
+def threads(fake):
+    return [channel for channel in fake.channels.values() if channel['type'] == 11]
+
+def contents(channel):
+    return [message['content'] for _, message in sorted(channel['messages'].items(), key=lambda item: int(item[0]))]
+
+def second_application(sandbox, name='second'):
+    fake = sandbox.fake
+    member = fake.add_user(name)
+    message = fake.add_message(sandbox.applicant_ch, member, f'IGN: {name}')
+    link = sandbox.config['APPLICATION_LINK'].rsplit('/', 1)[0] + '/' + message['id']
+    return link, member
+
+def test_start_end_and_result(sandbox, act):
+    fake, config = sandbox.fake, sandbox.config
+    members = fake.channels[sandbox.member_ch]
+    applicants = fake.channels[sandbox.applicant_ch]
+
+    act.start_app()
+    state = state_of(act)
+    [thread] = threads(fake)
+    vote = members['messages'][state['VOTE_MESSAGE_ID']]
+
+    assert state['APP_THREAD_ID'] == thread['id']
+    assert vote['pinned'] and set(vote['_reactors']) == {config['ACCEPT_EMOJI'], config['DENY_EMOJI']}
+    # Pin notification & thread creation message are cleaned up
+    assert not [message for message in members['messages'].values() if message['type'] == 6]
+    assert str(config['APPLICANT_NAME']) not in contents(applicants)
+    assert act.journal.vote_holder(sandbox.member_ch) == app_key(config['APPLICATION_LINK'])
+
+    sandbox.simulate_vote(state['VOTE_MESSAGE_ID'], state['APP_THREAD_ID'])
+    accept = len(vote['_reactors'][config['ACCEPT_EMOJI']])
+    deny = len(vote['_reactors'][config['DENY_EMOJI']])
+    act.end_app('accept-default')
+
+    [record] = act.meta_store.query()
+    assert (record['accept_votes'], record['deny_votes'], record['app_result']) == (accept, deny, 'accept-default')
+    assert is_locked(members, fake.guild_id)
+    assert len(members['messages']) == 2
+    assert thread['locked'] and thread['archived']
+    assert act.journal.vote_holder(sandbox.member_ch) is None
+
+    # The bot's result embed stays, the command that produced it does not
+    assert any(message['embeds'] for message in applicants['messages'].values())
+    assert not [content for content in contents(applicants) if content.startswith('2embed')]
+
+def test_interrupted_start_resumes(sandbox, act, monkeypatch):
+    fake = sandbox.fake
+    pin_message = act.cano.pin_message
+
+    def fail_once(*args, **kwargs):
+        monkeypatch.setattr(act.cano, 'pin_message', pin_message)
+        raise AssertionError('Status Code: 500')
+
+    monkeypatch.setattr(act.cano, 'pin_message', fail_once)
+    with pytest.raises(AssertionError):
+        act.start_app()
+
+    act.start_app()
+    votes = [message for message in fake.channels[sandbox.member_ch]['messages'].values()
+             if message['author']['id'] == fake.operator['id'] and message['pinned']]
+    assert len(threads(fake)) == 1
+    assert [message['id'] for message in votes] == [state_of(act)['VOTE_MESSAGE_ID']]
+
+def test_second_vote_is_rejected(sandbox, act):
+    act.start_app()
+    link, member = second_application(sandbox)
+    members_before = set(sandbox.fake.channels[sandbox.member_ch]['messages'])
+
+    app = {'APPLICATION_LINK': link, 'APPLICANT_NAME': 'second', 'APPLICANT_ID': member['id']}
+    with pytest.raises(VoteInProgress):
+        asyncio.run(act.start_app_async(app))
+    assert set(sandbox.fake.channels[sandbox.member_ch]['messages']) == members_before
+
+def test_queue_runs_one_vote_at_a_time(sandbox, act):
+    from pipeline import Pipeline, QueueEntry
+
+    first = sandbox.config['APPLICATION_LINK']
+    second, _ = second_application(sandbox)
+    entries = [QueueEntry(action, link, argument, line_no) for line_no, (action, link, argument) in enumerate([
+        ('start', first, 'First'),
+        ('start', second, 'Second'),
+        ('end', first, 'accept-default'),
+        ('end', second, 'deny-default'),
+    ], 1)]
+
+    assert asyncio.run(Pipeline(act, max_concurrent=1).run(entries)) == []
+    records = act.meta_store.query()
+    assert sorted(record['app_result'] for record in records) == ['accept-default', 'deny-default']
+
+def test_end_by_applicant_finds_the_started_application(sandbox, act):
+    from main import Actions
+
+    act.start_app()
+    started = act.app['APPLICATION_LINK']
+    sandbox.fake.add_message(sandbox.applicant_ch, sandbox.members[0], 'IGN: someone_else')
+    sandbox.fake.add_message(sandbox.applicant_ch, sandbox.applicant, 'any update?')
+
+    later = Actions(False, resolve_applicant=False, config_path=sandbox.config_path)
+    later.use_application(sandbox.applicant['id'], started=True)
+    assert later.app['APPLICATION_LINK'] == started
+    assert later.app['VOTE_MESSAGE_ID'] == state_of(act)['VOTE_MESSAGE_ID']
+
+def test_offline_actions_do_not_create_the_api_client(sandbox):
+    from main import Actions
+
+    act = Actions(False, resolve_applicant=False, config_path=sandbox.config_path)
+    act.query()
+    assert act._cano is None
+
+def test_queued_result_names_its_own_applicant(sandbox, act):
+    from pipeline import Pipeline, QueueEntry
+
+    link, member = second_application(sandbox, name='zed')
+    entry = QueueEntry('result', link, 'deny-default', 1)
+    assert asyncio.run(Pipeline(act).run([entry])) == []
+
+    [embed] = [message['embeds'][0] for message in sandbox.fake.channels[sandbox.applicant_ch]['messages'].values()
+               if message['embeds']]
+    assert f"<@{member['id']}> [zed]" in embed['description']
+    assert str(sandbox.config['APPLICANT_NAME']) not in embed['description']
+
+def test_result_waits_for_the_bot_embed(sandbox, act, monkeypatch):
+    fake = sandbox.fake
+    applicants = fake.channels[sandbox.applicant_ch]
+    send_message = act.cano.send_message
+    fake.bot_delay = 0.3
+
+    def send_and_reply(channel_id, content, *args, **kwargs):
+        res = send_message(channel_id, content, *args, **kwargs)
+        # The applicant answering right away is not the bot's reply
+        fake.add_message(channel_id, sandbox.applicant, 'thank you!')
+        return res
+
+    monkeypatch.setattr(act.cano, 'send_message', send_and_reply)
+    act.send_result('accept-default')
+    assert any(message['embeds'] for message in applicants['messages'].values())
+    assert not [content for content in contents(applicants) if content.startswith('2embed')]
+
+def test_other_overwrites_do_not_count_as_locked(sandbox, act):
+    fake = sandbox.fake
+    members = fake.channels[sandbox.member_ch]
+    # e.g. a muted role, denied sending regardless of the lock
+    members['permission_overwrites'].append({'id': '99', 'type': 0, 'allow': '0', 'deny': str(SEND_MESSAGES)})
+
+    act.start_app()
+    assert act.waiter.total_wait < act.waiter.timeout
+    assert not is_locked(members, fake.guild_id)
+
+    act.end_app('deny-default')
+    assert is_locked(members, fake.guild_id)
+    assert {overwrite['id'] for overwrite in members['permission_overwrites']} == {'99', fake.guild_id}
+
+def without_keys(sandbox, *keys):
+    import ruamel.yaml
+
+    yaml = ruamel.yaml.YAML()
+    with open(sandbox.config_path, 'r') as file:
+        config = yaml.load(file)
+    for key in keys:
+        del config[key]
+    with open(sandbox.config_path, 'w') as file:
+        yaml.dump(config, file)
+
+def test_journal_path_defaults(sandbox):
+    from main import Actions
+
+    # Configs from before the journal have no JOURNAL_PATH
+    without_keys(sandbox, 'JOURNAL_PATH')
+    act = Actions(False, resolve_applicant=False, config_path=sandbox.config_path)
+    act.journal.save_state('app', {'VOTE_MESSAGE_ID': '1'})
+    assert os.path.exists(os.path.join(sandbox.workdir, 'archive', 'journal.sqlite3'))
+
+def test_cache_path_defaults(sandbox):
+    from main import Actions
+
+    without_keys(sandbox, 'CACHE_PATH', 'CACHE_SIZE')
+    act = Actions(False, config_path=sandbox.config_path)
+    assert act.app['APPLICANT_ID'] == sandbox.applicant['id']
+    assert os.path.exists(os.path.join(sandbox.workdir, 'archive', 'cache.sqlite3'))
@@ -1,26 +1,25 @@
-from datetime import timedelta
-
-def add_one(string):
-
-    digits = list(string)
+import re
 
-    # Start from the rightmost digit and iterate backward
-    carry = 1
-    for i in range(len(digits)-1, -1, -1):
-        digit = int(digits[i]) + carry
+from datetime import timedelta
 
-        # Update the current digit and check for carry
-        digits[i] = str(digit % 10)
-        carry = digit // 10
+class NotFound(AssertionError):
+    """
+    Discord answered 404, or a message is confirmed absent. Unlike other
+    failed requests, retrying does not help.
+    """
 
-    # If there's a remaining carry, prepend it to the result
-    if carry:
-        digits.insert(0, str(carry))
+# Permission bit the lock/unlock bot commands deny & restore
+SEND_MESSAGES = 1 << 11
 
-    # Join the digits back into a string
-    result = ''.join(digits)
+def is_locked(channel, role_id):
+    # Locked: the overwrite of the role the bot toggles denies sending messages. Other
+    # overwrites, e.g. of a muted role, deny it regardless of the lock
+    return any(overwrite['id'] == role_id and int(overwrite.get('deny') or 0) & SEND_MESSAGES
+               for overwrite in channel.get('permission_overwrites') or [])
 
-    return result
+def app_key(application_link):
+    # An application is identified by the ID of its first message
+    return application_link.rstrip('/').split('/')[-1]
 
 def format_timedelta(timedelta_obj):
     # Extract the individual components from the timedelta object
@@ -33,3 +32,12 @@ def format_timedelta(timedelta_obj):
     formatted_str = f"{days}d {hours}h {minutes}m {seconds}s"
 
     return formatted_str
+
+def parse_timedelta(formatted_str):
+    # Inverse of format_timedelta, in seconds
+    match = re.fullmatch(r'(-?\d+)d (\d+)h (\d+)m (\d+)s', formatted_str.strip())
+    if match is None:
+        raise ValueError(f'Not a formatted timedelta: {formatted_str!r}')
+
+    days, hours, minutes, seconds = (int(group) for group in match.groups())
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
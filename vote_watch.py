@@ -0,0 +1,190 @@
+import os
+import struct
+import threading
+import time
+
+from datetime import datetime, timezone
+
+from utils import NotFound
+from votes import emoji_matches, tally_votes
+
+MAGIC = b'VTS1'
+HEADER = struct.Struct('<4sH')
+
+class NoVoteRecorded(KeyError):
+    """
+    The application has no vote message (not started, or already ended).
+    """
+
+    def __str__(self):
+        return self.args[0] if self.args else 'No vote recorded'
+
+class VoteSeries:
+    """
+    Append-only tally history of one vote message: a header holding the
+    number of counted reactions, then one fixed-size record (Unix ms, one
+    uint32 count per reaction) per change. The last record is the current
+    tally, readable without touching the API.
+    """
+
+    def __init__(self, root, message_id, reactions):
+        self.path = os.path.join(root, f'{message_id}.bin')
+        self.reactions = list(reactions)
+        self.record = struct.Struct('<q' + 'I' * len(self.reactions))
+
+        os.makedirs(root, exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            with open(self.path, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, len(self.reactions)))
+
+        with open(self.path, 'rb') as file:
+            magic, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or count != len(self.reactions):
+            raise ValueError(f'{self.path}: not a tally series for {len(self.reactions)} reactions')
+
+    def append(self, counts, at_ms=None):
+        at_ms = int(time.time() * 1000) if at_ms is None else at_ms
+        with open(self.path, 'r+b') as file:
+            # Drop a record cut short by a crash mid-write, or every later one is misaligned
+            size = file.seek(0, os.SEEK_END)
+            torn = (size - HEADER.size) % self.record.size
+            if torn:
+                file.truncate(size - torn)
+                file.seek(size - torn)
+            file.write(self.record.pack(at_ms, *(max(count, 0) for count in counts)))
+        return None
+
+    def _records(self, data):
+        # A record cut short by a crash mid-write is ignored
+        usable = len(data) - len(data) % self.record.size
+        return [(at_ms, list(counts)) for at_ms, *counts in self.record.iter_unpack(data[:usable])]
+
+    def latest(self):
+        """
+        (Unix ms, counts) of the last recorded tally, or None.
+        """
+        size = os.path.getsize(self.path) - HEADER.size
+        if size < self.record.size:
+            return None
+
+        with open(self.path, 'rb') as file:
+            file.seek(HEADER.size + (size // self.record.size - 1) * self.record.size)
+            return self._records(file.read(self.record.size))[0]
+
+    def history(self):
+        with open(self.path, 'rb') as file:
+            file.seek(HEADER.size)
+            return self._records(file.read())
+
+class VoteWatcher:
+    """
+    Follows the reactions on a vote message and records every change of the
+    tally in a VoteSeries. Reaction events from the gateway adjust the
+    counts in place; without a gateway session the message is re-read
+    every `poll_interval` seconds (one single-message request). Counts are
+    re-synced from the API every `resync_interval` seconds either way.
+    """
+
+    def __init__(self, cano, series, channel_id, message_id, hub=None,
+                 poll_interval=30.0, resync_interval=600.0, logging=None):
+        self.cano = cano
+        self.series = series
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.hub = hub
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.logging = logging
+
+        self.counts = None
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Read the tally from the API. Returns False once the vote message is
+        gone (the application was closed). Other failures, e.g. a 5xx or
+        a 429 after retries, keep the last tally until the next sync.
+        """
+        try:
+            message = self.cano.get_message(self.channel_id, self.message_id, keep_raw=False)
+        except NotFound:
+            return False
+        except (AssertionError, OSError) as error:
+            if self.logging is not None:
+                self.logging.warning(f'[VOTES] Could not read the vote message, retrying next sync: {error}')
+            return True
+
+        votes = tally_votes(message, self.series.reactions)
+        self.update([votes[reaction] for reaction in self.series.reactions])
+        return True
+
+    def update(self, counts):
+        with self._lock:
+            if counts == self.counts:
+                return None
+            self.counts = counts
+            self.series.append(counts)
+
+        if self.logging is not None:
+            self.logging.debug(f'[VOTES] {dict(zip(self.series.reactions, counts))}')
+        return None
+
+    def on_reaction(self, event, data):
+        if data.get('message_id') != self.message_id:
+            return None
+
+        step = 1 if event == 'MESSAGE_REACTION_ADD' else -1
+        with self._lock:
+            if self.counts is None:
+                return None
+            counts = [count + step if emoji_matches(data['emoji'], reaction) else count
+                      for count, reaction in zip(self.counts, self.series.reactions)]
+        self.update(counts)
+        return None
+
+    def run(self, duration=None):
+        deadline = None if duration is None else time.monotonic() + duration
+        listener = None
+        if self.hub is not None:
+            listener = self.hub.listen(('MESSAGE_REACTION_ADD', 'MESSAGE_REACTION_REMOVE'), self.on_reaction)
+
+        try:
+            last_sync = time.monotonic()
+            if not self.sync():
+                return None
+
+            while not self.stopped.is_set():
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+
+                live = self.hub is not None and self.hub.connected
+                interval = self.resync_interval if live else self.poll_interval
+                if now - last_sync >= interval:
+                    last_sync = now
+                    if not self.sync():
+                        break
+
+                wait = interval - (now - last_sync)
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                self.stopped.wait(max(wait, 0))
+        finally:
+            if listener is not None:
+                self.hub.unlisten(listener)
+
+        return None
+
+    def stop(self):
+        self.stopped.set()
+
+def format_tally(series):
+    latest = series.latest()
+    if latest is None:
+        return 'No tally recorded yet (run: python3 main.py -act watch)'
+
+    at_ms, counts = latest
+    when = datetime.fromtimestamp(at_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    votes = ', '.join(f'{reaction}: {count}' for reaction, count in zip(series.reactions, counts))
+    return f'{votes} (as of {when})'
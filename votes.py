@@ -0,0 +1,30 @@
+from urllib.parse import unquote
+
+def emoji_matches(emoji, reaction):
+    """
+    Whether a message's reaction emoji object is the one addressed by
+    `reaction`, given in the URL form used by the reaction endpoints
+    (a unicode emoji, possibly percent-encoded, or `name:id`).
+    """
+    reaction = unquote(reaction)
+    if emoji.get('id'):
+        return reaction in (f"{emoji['name']}:{emoji['id']}", emoji['id'])
+    return reaction == emoji.get('name')
+
+def tally_votes(vote_message, reactions):
+    """
+    Count votes for each of `reactions` from the reactions of an already
+    fetched vote Message. No extra requests, no page-size cap.
+    """
+    counts = {reaction: 0 for reaction in reactions}
+    for entry in vote_message.reactions:
+        for reaction in reactions:
+            if entry.matches(reaction):
+                counts[reaction] = entry.count
+    return counts
+
+def reaction_voters(cano, channel_id, message_id, reaction):
+    """
+    IDs of every user who reacted with `reaction`, paged 100 at a time.
+    """
+    return [user['id'] for user in cano.iter_reaction_users(channel_id, message_id, reaction)]
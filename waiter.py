@@ -0,0 +1,152 @@
+import threading
+import time
+
+class Subscription:
+    __slots__ = ('events', 'predicate', 'done', 'data')
+
+    def __init__(self, events, predicate):
+        self.events = events
+        self.predicate = predicate
+        self.done = threading.Event()
+        self.data = None
+
+class EventHub:
+    """
+    Fan-out point for gateway events. A gateway client calls `dispatch` for
+    every event it receives and flips `connected` while its session is live.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self._subscriptions = []
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, events, predicate=None):
+        sub = Subscription(frozenset(events), predicate)
+        with self._lock:
+            self._subscriptions.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscriptions:
+                self._subscriptions.remove(sub)
+
+    def listen(self, events, callback):
+        """
+        Call `callback(event, data)` for every one of `events` until
+        `unlisten`, unlike one-shot subscriptions.
+        """
+        listener = (frozenset(events), callback)
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unlisten(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def dispatch(self, event, data):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+
+        for events, callback in listeners:
+            if event in events:
+                callback(event, data)
+
+        for sub in subscriptions:
+            if sub.done.is_set() or event not in sub.events:
+                continue
+            if sub.predicate is None or sub.predicate(data):
+                sub.data = data
+                sub.done.set()
+                self.unsubscribe(sub)
+
+class Pending:
+    """
+    A condition registered before the action that triggers it, so an event
+    arriving in between cannot be missed. `wait` returns the matching event
+    payload (or the truthy result of `poll`), or None on timeout.
+    """
+
+    def __init__(self, waiter, sub, poll, timeout):
+        self.waiter = waiter
+        self.sub = sub
+        self.poll = poll
+        self.timeout = timeout
+
+    def cancel(self):
+        """
+        Stop listening, e.g. when the condition was met some other way.
+        """
+        if self.sub is not None:
+            self.waiter.hub.unsubscribe(self.sub)
+        return None
+
+    def wait(self):
+        start = self.waiter.clock()
+        try:
+            return self._wait()
+        finally:
+            with self.waiter._lock:
+                self.waiter.total_wait += self.waiter.clock() - start
+
+    def _wait(self):
+        waiter = self.waiter
+        deadline = waiter.clock() + self.timeout
+
+        if self.sub is not None:
+            if waiter.hub.connected and self.sub.done.wait(self.timeout):
+                return self.sub.data
+            waiter.hub.unsubscribe(self.sub)
+            if self.sub.done.is_set():
+                return self.sub.data
+
+        if self.poll is None:
+            return None
+
+        # Adaptive backoff: check quickly first, then back off towards max_delay
+        delay = waiter.initial_delay
+        while True:
+            with waiter._lock:
+                waiter.polls += 1
+            result = self.poll()
+            if result:
+                return result
+
+            remaining = deadline - waiter.clock()
+            if remaining <= 0:
+                return None
+            waiter.sleep(min(delay, remaining))
+            delay = min(delay * 2, waiter.max_delay)
+
+class Waiter:
+    """
+    Waits for Discord-side conditions such as a bot reacting to a command.
+    Driven by gateway events when `hub` is connected, otherwise falls back
+    to polling with exponential backoff.
+    """
+
+    def __init__(self, hub=None, initial_delay=0.1, max_delay=2.0, timeout=10.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.hub = hub
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+
+        # Seconds spent waiting on conditions & polls made, for benchmarks
+        self.total_wait = 0.0
+        self.polls = 0
+        self._lock = threading.Lock()
+
+    def expect(self, events, predicate=None, poll=None, timeout=None):
+        if isinstance(events, str):
+            events = [events]
+
+        sub = self.hub.subscribe(events, predicate) if self.hub is not None else None
+        return Pending(self, sub, poll, self.timeout if timeout is None else timeout)